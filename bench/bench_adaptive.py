@@ -0,0 +1,102 @@
+"""自适应并发（IKUUU_CONCURRENCY=auto）的基准和校验
+
+在进程内启动替身服务器，在子进程中按固定并发和自适应并发各执行一次签到，从导出的运行汇总中读取并发上限：
+站点正常时自适应上限应增长到默认并发数以上、总耗时更短；注入 503/429/连接重置/反爬虫页面时上限应降低。
+
+  python bench/bench_adaptive.py
+  python bench/bench_adaptive.py --accounts 200 --latency-ms 80 --fault-rate 0.3 --fault-kind 429
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+from server import FAULT_KINDS, StandinConfig, StandinServer  # noqa: E402
+from main import DEFAULT_CONCURRENCY  # noqa: E402
+
+
+def run_checkin(url, accounts, concurrency):
+    """在子进程中执行一次签到，返回 (耗时秒, 退出码, 运行汇总)"""
+    cache_dir = tempfile.mkdtemp(prefix='ikuuu-adaptive-')
+    metrics_path = os.path.join(cache_dir, 'metrics.jsonl')
+    env = dict(os.environ,
+               IKUUU_DOMAIN=url, IKUUU_DOMAINS='', IKUUU_CACHE_DIR=cache_dir,
+               IKUUU_SESSION_CACHE='0', IKUUU_HISTORY='0', IKUUU_RATE_LIMIT='0', IKUUU_LEDGER='0',
+               IKUUU_CONCURRENCY=str(concurrency), IKUUU_METRICS_JSONL=metrics_path, IKUUU_WEBHOOK_URL='',
+               IKUUU_ACCOUNTS='\n'.join(f'bench{i:05d}@example.com:password{i}' for i in range(accounts)))
+    env.pop('IKUUU_ACCOUNTS_FILE', None)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(REPO_DIR, 'main.py'), '--force'],
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - start
+    summary = {}
+    try:
+        with open(metrics_path, encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get('type') == 'run':
+                    summary = record
+    except OSError:
+        pass
+    return elapsed, result.returncode, summary
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='自适应并发基准')
+    parser.add_argument('--accounts', type=int, default=100, help='模拟账号数量')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='替身服务器每个请求的延迟（毫秒）')
+    parser.add_argument('--fault-rate', type=float, default=0.2, help='异常站点场景注入故障的概率')
+    parser.add_argument('--fault-kind', choices=FAULT_KINDS, default='503', help='异常站点场景的故障类型')
+    args = parser.parse_args()
+
+    config = StandinConfig(latency_ms=args.latency_ms, encoding='br-bom')
+    failures = 0
+    rows = []
+    with StandinServer(config) as server:
+        # 降低并发时客户端会关闭空闲连接，服务器端的连接重置不影响结果，不输出
+        server.httpd.handle_error = lambda request, client_address: None
+        for scenario, fault_rate in (('正常', 0.0), (f'{args.fault_kind} {args.fault_rate:.0%}', args.fault_rate)):
+            config.fault_rate, config.fault_kind = fault_rate, args.fault_kind
+            for concurrency in (DEFAULT_CONCURRENCY, 'auto'):
+                with server.state.lock:
+                    server.state.checked_in.clear()
+                elapsed, returncode, summary = run_checkin(server.url, args.accounts, concurrency)
+                rows.append((scenario, concurrency, elapsed, returncode, summary))
+
+    print(f"{args.accounts} 个账号  每个请求 {args.latency_ms:.0f} ms  默认并发 {DEFAULT_CONCURRENCY}")
+    print(f"{'场景':<14}{'并发':<8}{'耗时s':>8}{'签到成功':>10}{'最终上限':>10}{'最低':>6}{'最高':>6}{'降低次数':>10}")
+    for scenario, concurrency, elapsed, returncode, summary in rows:
+        print(f"{scenario:<14}{concurrency!s:<8}{elapsed:>8.2f}"
+              f"{summary.get('checkin_succeeded', '-')!s:>10}{summary.get('concurrency_limit', '-')!s:>10}"
+              f"{summary.get('concurrency_limit_lowest', '-')!s:>6}{summary.get('concurrency_limit_highest', '-')!s:>6}"
+              f"{summary.get('concurrency_decreases', '-')!s:>10}")
+        if 'concurrency_limit' not in summary:
+            failures += 1
+            print('✗ 运行汇总中缺少并发上限')
+
+    (_, _, fixed_s, fixed_rc, _), (_, _, auto_s, auto_rc, auto), _, (_, _, _, _, faulty) = rows
+    if fixed_rc or auto_rc:
+        failures += 1
+        print('✗ 正常站点场景存在签到失败的账号')
+    if auto.get('concurrency_limit_highest', 0) <= DEFAULT_CONCURRENCY:
+        failures += 1
+        print('✗ 站点正常时自适应上限没有增长')
+    elif auto_s >= fixed_s:
+        print('提示：自适应并发没有缩短耗时（CPU 核数少或替身服务器延迟过低时常见）')
+    if args.fault_rate > 0 and faulty.get('concurrency_decreases', 0) == 0:
+        failures += 1
+        print('✗ 站点异常时自适应上限没有降低')
+    print('正确性校验:', '通过' if failures == 0 else f'{failures} 项失败')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,74 @@
+"""批量模式（python main.py batch）多进程扩展性基准
+
+启动本地替身服务器，用不同的进程数跑同一批账号，统计吞吐量（账号/秒）和相对单进程的扩展效率。
+页面填充越大，账户信息解析越占 CPU，多进程的收益越明显；替身服务器本身是单进程，
+进程数接近 CPU 核数时服务器也会成为瓶颈。
+
+  python bench/bench_batch.py
+  python bench/bench_batch.py --accounts 400 --workers 1 2 4 8 --padding-kb 128
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, BENCH_DIR)
+from run_bench import start_server, stop_server  # noqa: E402
+from server import add_config_arguments  # noqa: E402
+
+
+def run_batch(url, accounts, workers, shard_size, concurrency):
+    """在子进程中执行一次批量签到，返回 (耗时秒, 退出码)"""
+    env = dict(os.environ,
+               IKUUU_DOMAIN=url, IKUUU_DOMAINS='', IKUUU_CACHE_DIR=tempfile.mkdtemp(prefix='ikuuu-batch-'),
+               IKUUU_SESSION_CACHE='0', IKUUU_HISTORY='0', IKUUU_RATE_LIMIT='0',
+               IKUUU_CONCURRENCY=str(concurrency),
+               IKUUU_ACCOUNTS='\n'.join(f'bench{i:05d}@example.com:password{i}' for i in range(accounts)))
+    env.pop('IKUUU_ACCOUNTS_FILE', None)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(REPO_DIR, 'main.py'), 'batch', '--restart',
+                             '--workers', str(workers), '--shard-size', str(shard_size)],
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start, result.returncode
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='批量模式多进程扩展性基准')
+    parser.add_argument('--accounts', type=int, default=200, help='模拟账号数量')
+    parser.add_argument('--workers', type=int, nargs='+', help='要测试的进程数（默认 1、2、4… 直到 CPU 核数）')
+    parser.add_argument('--shard-size', type=int, default=25, help='每个分片的账号数')
+    parser.add_argument('--concurrency', type=int, default=5, help='每个进程内的并发账号数')
+    add_config_arguments(parser)
+    parser.set_defaults(padding_kb=64, latency_ms=5.0)
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    workers_list = args.workers or sorted({1, *(2 ** i for i in range(1, cpus.bit_length()) if 2 ** i <= cpus), cpus})
+    process, url = start_server(args)
+    failures = 0
+    try:
+        print(f"{args.accounts} 个账号  分片 {args.shard_size}  进程内并发 {args.concurrency}  "
+              f"页面填充 {args.padding_kb} KB  CPU {cpus} 核")
+        print(f"{'进程数':<8}{'耗时s':>10}{'账号/秒':>12}{'扩展效率':>12}")
+        baseline = None
+        for workers in workers_list:
+            elapsed, returncode = run_batch(url, args.accounts, workers, args.shard_size, args.concurrency)
+            if returncode != 0:
+                failures += 1
+            throughput = args.accounts / elapsed
+            baseline = baseline or throughput
+            efficiency = throughput / (baseline * workers)
+            print(f"{workers:<8}{elapsed:>10.2f}{throughput:>12.1f}{efficiency:>11.0%}"
+                  f"{'' if returncode == 0 else '  ✗ 存在失败的账号'}")
+    finally:
+        stop_server(process)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main_cli()
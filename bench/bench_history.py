@@ -0,0 +1,86 @@
+"""运行历史存储的基准
+
+在临时数据库中生成 N 个账号、D 天（每天一次运行）的模拟历史，统计每次运行追加一批结果的耗时、
+单账号时间序列和全部账号概况的查询耗时，并校验查询结果。
+
+  python bench/bench_history.py
+  python bench/bench_history.py --accounts 500 --days 365
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main  # noqa: E402
+
+
+def fake_results(accounts, day_index, rng):
+    """模拟一次运行的结果：剩余流量随天数递减，今日用量随机"""
+    results = []
+    for index, email in enumerate(accounts):
+        today = round(rng.uniform(0.1, 3.0), 2)
+        info = main.AccountInfo(
+            membership=main.parse_quantity(f'{365 - day_index % 365} 天'),
+            traffic_left=main.parse_quantity(f'{max(0.0, 500 - day_index * 1.5 - index % 7):.2f}GB'),
+            traffic_today=main.parse_quantity(f'{today} GB'),
+            devices=main.parse_quantity(f'{index % 5} / 5'),
+            balance=main.parse_quantity(f'¥ {index % 50}.00'),
+        )
+        results.append({'account': main.mask_email(email), 'key': main.account_key(email),
+                        'login': True, 'checkin': rng.random() > 0.02, 'info': True,
+                        'account_info': info, 'elapsed': 0.5})
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='运行历史存储基准')
+    parser.add_argument('--accounts', type=int, default=300, help='账号数量')
+    parser.add_argument('--days', type=int, default=365, help='模拟的天数')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    accounts = [f'user{i:05d}@example.com' for i in range(args.accounts)]
+    path = os.path.join(tempfile.mkdtemp(prefix='ikuuu-history-'), 'history.sqlite3')
+    start_ts = time.time() - args.days * 86400
+    failures = 0
+
+    append_times = []
+    with main.HistoryStore(path) as store:
+        for day_index in range(args.days):
+            results = fake_results(accounts, day_index, rng)
+            begin = time.perf_counter()
+            store.append(results, timestamp=start_ts + day_index * 86400)
+            append_times.append(time.perf_counter() - begin)
+
+        series_s = min(timeit.repeat(lambda: store.series(main.account_key(accounts[0]), 30), number=1, repeat=5))
+        summary_s = min(timeit.repeat(lambda: store.summary(7), number=1, repeat=5))
+        year_series = store.series(main.account_key(accounts[0]), args.days)
+        summary = store.summary(7)
+
+    rows = args.accounts * args.days
+    size_kb = sum(os.path.getsize(path + suffix) for suffix in ('', '-wal') if os.path.exists(path + suffix)) // 1024
+    print(f"{args.accounts} 个账号 × {args.days} 天 = {rows} 行，数据库 {size_kb} KB（{size_kb * 1024 / rows:.0f} 字节/行）")
+    print(f"每次运行追加 {args.accounts} 行: 平均 {sum(append_times) / len(append_times) * 1000:.2f} ms，"
+          f"最大 {max(append_times) * 1000:.2f} ms")
+    print(f"单账号 30 天序列查询: {series_s * 1000:.2f} ms")
+    print(f"全部账号 7 天概况查询: {summary_s * 1000:.2f} ms")
+
+    if len(year_series) < args.days - 1:
+        failures += 1
+        print(f'✗ 单账号序列应有约 {args.days} 天，实际 {len(year_series)}')
+    if len(summary) != args.accounts:
+        failures += 1
+        print(f'✗ 概况应包含 {args.accounts} 个账号，实际 {len(summary)}')
+    if any(row['traffic_left_gb'] is None for row in summary):
+        failures += 1
+        print('✗ 概况中缺少剩余流量')
+    print('正确性校验:', '通过' if failures == 0 else f'{failures} 项失败')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main_cli()
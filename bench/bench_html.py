@@ -0,0 +1,106 @@
+"""HTML 快速扫描路径的基准和一致性校验
+
+对登录页和用户中心页的各种写法，分别用快速扫描（默认）和 BeautifulSoup（IKUUU_HTML_PARSER=soup）
+查找 CSRF 令牌、页面标题和 originBody，校验两者结果一致，并对比耗时；
+同时按不同块大小把页面交给流式读取用户页的 UserPageReader，校验找到的 originBody 与 soup 一致。
+
+  python bench/bench_html.py
+  python bench/bench_html.py --number 200
+"""
+import argparse
+import base64
+import os
+import sys
+import timeit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+import main  # noqa: E402
+from server import LOGIN_PAGE, USER_PAGE  # noqa: E402
+
+FINDERS = (('token', main.find_csrf_token), ('title', main.find_page_title), ('origin', main.find_origin_body))
+CHUNK_SIZES = (1, 7, 64, main.STREAM_CHUNK_SIZE)
+
+
+def build_cases():
+    origin = base64.b64encode('<div class="card">剩余流量 10 GB</div>'.encode('utf-8')).decode('ascii')
+    return [
+        # 名称, 页面
+        ('login_page', LOGIN_PAGE.format(token='a' * 32, padding='')),
+        ('user_page', USER_PAGE.format(origin_body=origin, padding='', subscribe_quoted='')),
+        ('user_page_64k', USER_PAGE.format(origin_body=origin, subscribe_quoted='',
+                                           padding='<div class="nav-item">菜单项</div>\n' * 2000)),
+        ('attr_order', '<input value="v1" type="hidden" NAME="_token"><title> A &amp; B </title>'),
+        ('duplicate_attr', '<input name="_token" value="first" value="second">'),
+        # 注释中旧的令牌不是真正的 input
+        ('commented_input', '<!-- <input name="_token" value="old"> --><form><input name="_token" value="real"></form>'),
+        # 脚本字符串中的 <title> 不是页面标题，误认会被当成登录页
+        ('title_in_script', '<script>var t="<title>Login</title>"</script><title>用户中心</title>'),
+        ('title_in_style', '<style>/* <title>Login</title> */</style><title>用户中心</title>'),
+        ('origin_in_comment', f'<!-- <script>var originBody = "b2xk"; decodeBase64(originBody)</script> -->'
+                              f'<script>var originBody = "{origin}"; decodeBase64(originBody)</script>'),
+        # 注释掉的旧脚本在真正的脚本之前，只有注释中的脚本
+        ('origin_commented_first', f'<!-- var originBody = "b2xk"; -->\n'
+                                   f'<script>var originBody = "{origin}"; decodeBase64(originBody)</script>'),
+        ('origin_only_in_comment', '<!-- <script>var originBody = "b2xk"; decodeBase64(originBody)</script> -->'),
+        # 没有调用 decodeBase64 的脚本中的 originBody 不是页面内容
+        ('origin_without_decode', f'<script>var originBody = "b2xk";</script>'
+                                  f'<SCRIPT type="text/javascript">var originBody = "{origin}";\n'
+                                  f'decodeBase64(originBody)</script >'),
+        ('origin_in_style', f'<style>/* <script>var originBody = "b2xk"; decodeBase64(originBody)</script> */</style>'
+                            f'<script>var originBody = "{origin}"; decodeBase64(originBody)</script>'),
+        ('scripts_tag_name', f'<scripts>var originBody = "b2xk"; decodeBase64(originBody)</scripts>'
+                             f'<script>var originBody = "{origin}"; decodeBase64(originBody)</script>'),
+        ('no_match', '<html><body>nothing here</body></html>'),
+    ]
+
+
+def find_all(page, mode):
+    os.environ['IKUUU_HTML_PARSER'] = mode
+    return {name: finder(page) for name, finder in FINDERS}
+
+
+def read_origin(page, chunk_size):
+    """按 chunk_size 分块把页面交给 UserPageReader，返回找到的 originBody"""
+    reader = main.UserPageReader()
+    data = page.encode('utf-8')
+    for start in range(0, len(data), chunk_size):
+        if reader.feed(data[start:start + chunk_size]):
+            break
+    return reader.encoded_content()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='HTML 快速扫描基准')
+    parser.add_argument('--number', type=int, default=50, help='每个用例的重复次数')
+    args = parser.parse_args()
+
+    cases = build_cases()
+    failures = 0
+    for name, page in cases:
+        fast, soup = find_all(page, 'fast'), find_all(page, 'soup')
+        for key in fast:
+            if fast[key] != soup[key]:
+                failures += 1
+                print(f'✗ {name} {key}: 快速扫描 {fast[key]!r}，soup {soup[key]!r}')
+        for chunk_size in CHUNK_SIZES:
+            streamed = read_origin(page, chunk_size)
+            if streamed != soup['origin']:
+                failures += 1
+                print(f'✗ {name} origin: 流式读取（每块 {chunk_size} 字节）{streamed!r}，soup {soup["origin"]!r}')
+    print('一致性校验:', '通过' if failures == 0 else f'{failures} 项不一致')
+
+    print(f"{'用例':<24}{'字节':>10}{'soup µs':>14}{'快速 µs':>14}{'加速':>10}")
+    for name, page in cases:
+        timings = {}
+        for mode in ('soup', 'fast'):
+            timings[mode] = min(timeit.repeat(lambda: find_all(page, mode), number=args.number, repeat=3)) / args.number
+        print(f"{name:<24}{len(page.encode('utf-8')):>10}{timings['soup'] * 1e6:>14.1f}{timings['fast'] * 1e6:>14.1f}"
+              f"{timings['soup'] / timings['fast']:>9.1f}x")
+    os.environ.pop('IKUUU_HTML_PARSER', None)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,80 @@
+"""parse_json_response 恢复路径的微基准
+
+对比旧版（整体解码 + 正则找 { + 逐字符数花括号）与 main.recover_json 在
+大响应体、前导垃圾、BOM 污染等情况下的耗时。recover_json 的正确性测试在 tests/test_recover_json.py。
+
+  python bench/bench_json.py
+  python bench/bench_json.py --number 200
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main  # noqa: E402
+
+
+def legacy_recover(content):
+    """旧版 parse_json_response 的清理逻辑（不含解压），用于对比"""
+    text = content.decode('utf-8', errors='replace')
+    if text.startswith('\ufeff'):
+        text = text[1:]
+    match = re.search(r'\{', text)
+    text = text[match.start():] if match else text.strip()
+    brace_count = 0
+    json_end = -1
+    for i, char in enumerate(text):
+        if char == '{':
+            brace_count += 1
+        elif char == '}':
+            brace_count -= 1
+            if brace_count == 0:
+                json_end = i + 1
+                break
+    if json_end > 0:
+        text = text[:json_end]
+    return json.loads(text)
+
+
+def build_cases():
+    small = {'ret': 1, 'msg': '你获得了 512 MB流量'}
+    boundary = {'ret': 1, 'msg': 'a' * 4066, 'ok': True, 'data': {'inner': 1}}
+    large = {'ret': 1, 'msg': 'ok', 'data': [{'id': i, 'name': f'节点{i}', 'remark': '{x}'} for i in range(4000)]}
+    return [
+        # 名称, 输入, 期望结果
+        ('bom_small', b'\xef\xbb\xbf\r\n  ' + json.dumps(small, ensure_ascii=False).encode('utf-8'), small),
+        ('garbage_prefix_64k', b'\x00\x1b<!-- noise -->' * 4096 + json.dumps(small).encode('utf-8'), small),
+        ('large_200k', json.dumps(large, ensure_ascii=False).encode('utf-8') + b'\n<html>trailer</html>', large),
+        ('braces_in_string', b'\xef\xbb\xbf{"ret": 0, "msg": "\\"}{ \xe5\xb7\xb2\xe7\xbb\x8f\xe7\xad\xbe\xe5\x88\xb0 }"} }}',
+         {'ret': 0, 'msg': '"}{ 已经签到 }'}),
+        # 4096 字节的首个窗口截断在 true 中间，不能退而解析内层对象
+        ('window_literal', b'\xef\xbb\xbf' + json.dumps(boundary).encode('utf-8'), boundary),
+        ('trailing_garbage', b'{"ret": 1, "msg": "ok"}' + b'}' * 10000, {'ret': 1, 'msg': 'ok'}),
+    ]
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='JSON 恢复路径微基准')
+    parser.add_argument('--number', type=int, default=50, help='每个用例的重复次数')
+    args = parser.parse_args()
+
+    cases = build_cases()
+    print(f"{'用例':<22}{'字节':>10}{'旧版 µs':>14}{'新版 µs':>14}{'加速':>10}  旧版结果")
+    for name, data, expected in cases:
+        new_time = min(timeit.repeat(lambda: main.recover_json(data), number=args.number, repeat=3)) / args.number
+        try:
+            legacy_ok = legacy_recover(data) == expected
+            old_time = min(timeit.repeat(lambda: legacy_recover(data), number=args.number, repeat=3)) / args.number
+        except ValueError:
+            legacy_ok = False
+            old_time = float('nan')
+        speedup = old_time / new_time if new_time else float('nan')
+        print(f'{name:<22}{len(data):>10}{old_time * 1e6:>14.1f}{new_time * 1e6:>14.1f}{speedup:>9.1f}x  '
+              f"{'正确' if legacy_ok else '错误'}")
+
+
+if __name__ == '__main__':
+    main_cli()
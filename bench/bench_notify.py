@@ -0,0 +1,105 @@
+"""Webhook 通知的基准和校验
+
+在进程内启动替身服务器（同时作为通知接收方，前 N 次通知请求返回 503），在子进程中执行签到，
+校验每次运行只收到一条汇总消息、标题为实际使用的域名、包含全部账号及其流量和余额；并对比未配置通知时的耗时，
+确认通知由后台线程发送，没有拖慢签到。
+
+  python bench/bench_notify.py
+  python bench/bench_notify.py --accounts 20 --webhook-fail 2 --runs 3
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, BENCH_DIR)
+from server import StandinConfig, StandinServer  # noqa: E402
+
+
+def run_checkin(url, accounts, webhook_url=''):
+    """在子进程中执行一次签到，返回 (耗时秒, 退出码)"""
+    env = dict(os.environ,
+               IKUUU_DOMAIN=url, IKUUU_DOMAINS='', IKUUU_CACHE_DIR=tempfile.mkdtemp(prefix='ikuuu-notify-'),
+               IKUUU_SESSION_CACHE='0', IKUUU_HISTORY='0', IKUUU_RATE_LIMIT='0', IKUUU_LEDGER='0',
+               IKUUU_WEBHOOK_URL=webhook_url,
+               IKUUU_ACCOUNTS='\n'.join(f'bench{i:05d}@example.com:password{i}' for i in range(accounts)))
+    env.pop('IKUUU_ACCOUNTS_FILE', None)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(REPO_DIR, 'main.py'), '--force'],
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start, result.returncode
+
+
+def check_digest(payload, accounts, host):
+    """校验汇总消息的内容，返回失败项"""
+    problems = []
+    if not payload.get('title', '').startswith(host.upper()):
+        problems.append(f"标题应以实际使用的域名 {host.upper()} 开头，实际 {payload.get('title')!r}")
+    if payload.get('total') != accounts or len(payload.get('accounts', [])) != accounts:
+        problems.append(f"应包含 {accounts} 个账号，实际 {payload.get('total')}")
+    if payload.get('succeeded') != accounts:
+        problems.append(f"成功数应为 {accounts}，实际 {payload.get('succeeded')}")
+    missing = [entry['account'] for entry in payload.get('accounts', [])
+               if entry.get('traffic_left_gb') is None or entry.get('balance') is None]
+    if missing:
+        problems.append(f"{len(missing)} 个账号缺少剩余流量或余额")
+    if not payload.get('text'):
+        problems.append('缺少文本内容')
+    return problems
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Webhook 通知基准')
+    parser.add_argument('--accounts', type=int, default=10, help='模拟账号数量')
+    parser.add_argument('--webhook-fail', type=int, default=1, help='每次运行中通知接收方先返回 503 的次数')
+    parser.add_argument('--runs', type=int, default=3, help='重复次数，取最小耗时')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='替身服务器每个请求的延迟（毫秒）')
+    args = parser.parse_args()
+
+    config = StandinConfig(latency_ms=args.latency_ms, encoding='br-bom')
+    failures = 0
+    with StandinServer(config) as server:
+        webhook_url = f'{server.url}/webhook'
+        baseline = min(run_checkin(server.url, args.accounts)[0] for _ in range(args.runs))
+
+        notified = []
+        for _ in range(args.runs):
+            with server.state.lock:
+                server.state.webhooks.clear()
+                server.state.webhook_attempts = 0
+            config.webhook_fail = args.webhook_fail
+            elapsed, returncode = run_checkin(server.url, args.accounts, webhook_url)
+            notified.append(elapsed)
+            with server.state.lock:
+                payloads = list(server.state.webhooks)
+                attempts = server.state.webhook_attempts
+            if returncode != 0:
+                failures += 1
+                print(f'✗ 签到退出码 {returncode}')
+            if len(payloads) != 1:
+                failures += 1
+                print(f'✗ 应收到 1 条汇总消息，实际 {len(payloads)} 条（请求 {attempts} 次）')
+                continue
+            for problem in check_digest(payloads[0], args.accounts, urlsplit(server.url).hostname):
+                failures += 1
+                print(f'✗ {problem}')
+
+    best = min(notified)
+    print(f"{args.accounts} 个账号  通知接收方前 {args.webhook_fail} 次返回 503  {args.runs} 次取最小值")
+    print(f"未配置通知: {baseline:.2f} s")
+    print(f"配置通知:   {best:.2f} s（{best - baseline:+.2f} s，含失败重试的退避等待）")
+    if payloads:
+        print('消息示例:')
+        print(payloads[0]['text'])
+    print('正确性校验:', '通过' if failures == 0 else f'{failures} 项失败')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main_cli()
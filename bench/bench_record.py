@@ -0,0 +1,124 @@
+"""录制与回放的校验
+
+对本地替身服务器执行一次录制（IKUUU_RECORD），检查录制文件中没有残留账号信息：邮箱（含 URL 编码形式）、
+密码、登录 Cookie、订阅链接令牌（含 URL 编码形式和 originBody 中的 Base64 内容）、CSRF 令牌和邀请码；
+然后不访问网络回放该文件（IKUUU_REPLAY），确认签到和信息获取仍然成功。
+
+  python bench/bench_record.py
+  python bench/bench_record.py --accounts 5 --encoding br
+"""
+import argparse
+import base64
+import gzip
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from urllib.parse import quote
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, BENCH_DIR)
+from server import ENCODINGS, StandinConfig, StandinServer, account_secrets, brotli  # noqa: E402
+
+ORIGIN_BODY_RE = re.compile(rb'var originBody = "([^"]+)"')
+
+
+def run_checkin(accounts, cache_dir, **env_overrides):
+    """在子进程中执行一次签到，返回 (耗时秒, 退出码)"""
+    env = dict(os.environ, IKUUU_DOMAINS='', IKUUU_CACHE_DIR=cache_dir,
+               IKUUU_SESSION_CACHE='0', IKUUU_HISTORY='0', IKUUU_RATE_LIMIT='0', IKUUU_LEDGER='0',
+               IKUUU_WEBHOOK_URL='', IKUUU_RECORD='', IKUUU_REPLAY='',
+               IKUUU_ACCOUNTS='\n'.join(f'{email}:{password}' for email, password in accounts))
+    env.update(env_overrides)
+    env.pop('IKUUU_ACCOUNTS_FILE', None)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(REPO_DIR, 'main.py'), '--force'],
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start, result.returncode
+
+
+def decode_body(body, encoding):
+    encoding = (encoding or 'identity').lower()
+    if encoding == 'gzip':
+        return zlib.decompress(body, 47)
+    if encoding == 'br':
+        return brotli.decompress(body)
+    return body
+
+
+def fixture_texts(path):
+    """录制文件中所有可能包含账号信息的内容：每条记录的 JSON、解压后的响应体和 originBody 解码后的内容"""
+    texts = []
+    with gzip.open(path, 'rb') as f:
+        for line in f:
+            texts.append(line)
+            entry = json.loads(line)
+            encoding = next((value for name, value in entry['headers'] if name.lower() == 'content-encoding'), None)
+            body = decode_body(base64.b64decode(entry['body']), encoding)
+            texts.append(body)
+            texts.extend(base64.b64decode(match.group(1)) for match in ORIGIN_BODY_RE.finditer(body))
+    return texts
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='录制文件脱敏和回放校验')
+    parser.add_argument('--accounts', type=int, default=3, help='模拟账号数量')
+    parser.add_argument('--encoding', choices=ENCODINGS, default='gzip', help='替身服务器的响应编码方式')
+    args = parser.parse_args()
+    if args.encoding.startswith('br') and brotli is None:
+        parser.error('--encoding br 需要安装 brotli')
+
+    accounts = [(f'bench{i:05d}@example.com', f'password{i}') for i in range(args.accounts)]
+    cache_dir = tempfile.mkdtemp(prefix='ikuuu-record-')
+    fixture = os.path.join(cache_dir, 'fixtures.jsonl.gz')
+    failures = 0
+
+    with StandinServer(StandinConfig(encoding=args.encoding)) as server:
+        record_s, returncode = run_checkin(accounts, cache_dir, IKUUU_DOMAIN=server.url, IKUUU_RECORD=fixture)
+        with server.state.lock:
+            csrf_tokens = list(server.state.csrf_tokens)
+            session_keys = list(server.state.sessions)
+    if returncode != 0:
+        failures += 1
+        print(f'✗ 录制运行退出码 {returncode}')
+
+    secrets = {}
+    for email, password in accounts:
+        subscribe, invite = account_secrets(email)
+        token = subscribe.rsplit('/', 1)[1]
+        secrets.update({email: '邮箱', quote(email, safe=''): 'URL 编码的邮箱', password: '密码',
+                        token: '订阅令牌', invite: '邀请码'})
+    secrets.update({token: 'CSRF 令牌' for token in csrf_tokens})
+    secrets.update({key: '登录 Cookie' for key in session_keys})
+
+    texts = fixture_texts(fixture)
+    for secret, label in secrets.items():
+        needle = secret.encode('utf-8').lower()
+        if any(needle in text.lower() for text in texts):
+            failures += 1
+            print(f'✗ 录制文件中残留{label}: {secret}')
+    for placeholder in (b'/link/REDACTED', b'code=REDACTED', b'%2Flink%2FREDACTED', b'value="REDACTED"'):
+        if not any(placeholder in text for text in texts):
+            failures += 1
+            print(f'✗ 录制文件中没有找到 {placeholder.decode()}，页面内容可能没有被录制')
+
+    replay_s, returncode = run_checkin(accounts, cache_dir, IKUUU_DOMAIN='http://replay.invalid', IKUUU_REPLAY=fixture)
+    if returncode != 0:
+        failures += 1
+        print(f'✗ 回放运行退出码 {returncode}')
+
+    print(f"{args.accounts} 个账号  编码 {args.encoding}  录制 {len(texts)} 段内容，"
+          f"{os.path.getsize(fixture)} 字节，检查 {len(secrets)} 项账号信息")
+    print(f"录制运行 {record_s:.2f} s，回放运行 {replay_s:.2f} s")
+    print('正确性校验:', '通过' if failures == 0 else f'{failures} 项失败')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,102 @@
+"""冷启动耗时基准
+
+每次 GitHub Actions 运行都是全新的解释器，导入耗时直接计入总耗时。
+本脚本在子进程中多次执行 python -X importtime -c "import main"，统计 main 的累计导入耗时
+（取中位数）和耗时最多的模块，并校验按需加载的模块没有在启动时被导入。
+
+  python bench/bench_startup.py
+  python bench/bench_startup.py --runs 20 --top 15 --max-ms 200
+  python bench/bench_startup.py --save
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+# 启动时不应导入的模块：只在解析HTML时才需要
+LAZY_MODULES = ('bs4', 'lxml')
+
+
+def importtime_once():
+    """执行一次 -X importtime，返回 {模块名: 累计耗时微秒}"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'],
+                            cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue  # 表头
+        name = parts[2].strip()
+        cumulative[name] = max(cumulative.get(name, 0), int(parts[1]))
+    return cumulative
+
+
+def eagerly_loaded():
+    """导入 main 后已经加载的按需模块"""
+    code = ('import json, sys, main; '
+            f'print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))')
+    result = subprocess.run([sys.executable, '-c', code], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='main.py 冷启动导入耗时基准')
+    parser.add_argument('--runs', type=int, default=10, help='重复次数，取中位数')
+    parser.add_argument('--top', type=int, default=10, help='显示累计耗时最多的模块数')
+    parser.add_argument('--max-ms', type=float, default=0, help='main 导入耗时中位数上限（毫秒），超出时以 1 退出')
+    parser.add_argument('--save', action='store_true', help='保存结果到 bench/results/')
+    args = parser.parse_args()
+
+    runs = [importtime_once() for _ in range(args.runs)]
+    modules = set().union(*runs)
+    medians = {name: statistics.median(run.get(name, 0) for run in runs) for name in modules}
+    main_ms = medians.get('main', 0) / 1000
+
+    print(f"import main 累计耗时中位数: {main_ms:.1f} ms（{args.runs} 次）")
+    print(f"{'模块':<36}{'累计ms':>10}")
+    top = sorted((item for item in medians.items() if item[0] != 'main'), key=lambda item: -item[1])[:args.top]
+    for name, micros in top:
+        print(f"{name:<36}{micros / 1000:>10.1f}")
+
+    failures = 0
+    loaded = eagerly_loaded()
+    if loaded:
+        failures += 1
+        print(f"✗ 启动时导入了应按需加载的模块: {', '.join(loaded)}")
+    else:
+        print(f"按需加载校验: 通过（{', '.join(LAZY_MODULES)} 未在启动时导入）")
+    if args.max_ms and main_ms > args.max_ms:
+        failures += 1
+        print(f"✗ 导入耗时 {main_ms:.1f} ms 超过上限 {args.max_ms} ms")
+
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{git_revision()}-startup.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'revision': git_revision(), 'runs': args.runs, 'main_ms': round(main_ms, 2),
+                       'top': {name: round(micros / 1000, 2) for name, micros in top},
+                       'eagerly_loaded': loaded}, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存: {path}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,82 @@
+"""流式读取响应体的连接复用校验
+
+在进程内启动替身服务器，按各种响应编码、Content-Length 和分块传输，用同一个会话反复签到和获取用户信息，
+校验提前停止读取后连接仍回到连接池（整个过程只建立一个 TCP 连接、没有中止的流），且传输字节数有记录。
+
+  python bench/bench_stream.py
+  python bench/bench_stream.py --rounds 10 --padding-kb 64
+"""
+import argparse
+import os
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+from server import ENCODINGS, StandinConfig, StandinServer, brotli  # noqa: E402
+
+
+def counter_total(main, name, phase):
+    return sum(value for (metric, labels), value in main.METRICS.counters.items()
+               if metric == name and dict(labels).get('phase') == phase)
+
+
+def run_case(main, config, rounds):
+    """用一个会话登录后反复签到和获取用户信息，返回 (TCP 连接数, 中止的流, 签到传输字节, 用户页传输字节, 失败次数)"""
+    main.METRICS.counters.clear()
+    main.close_connection_pool()
+    with StandinServer(config) as server:
+        os.environ['IKUUU_DOMAIN'] = server.url
+        main._domain_pool = None
+        session = main.create_session()
+        errors = 0 if main.login_and_get_cookie('bench@example.com', 'password', session) else 1
+        for _ in range(rounds):
+            with server.state.lock:
+                server.state.checked_in.clear()
+            errors += 0 if main.checkin(session) else 1
+            errors += 0 if main.get_user_info(session) else 1
+        with server.state.lock:
+            connections = server.state.connections
+        main.close_connection_pool()
+    aborted = sum(value for (metric, _), value in main.METRICS.counters.items() if metric == 'stream_aborted_total')
+    return (connections, aborted, counter_total(main, 'bytes_received_total', 'checkin'),
+            counter_total(main, 'bytes_received_total', 'user_page'), errors)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='流式读取的连接复用校验')
+    parser.add_argument('--rounds', type=int, default=5, help='每种情况签到和获取用户信息的次数')
+    parser.add_argument('--padding-kb', type=int, default=16, help='页面填充大小（KB）')
+    args = parser.parse_args()
+
+    # 只输出校验结果，不输出签到日志
+    os.environ.update(IKUUU_DOMAINS='', IKUUU_RATE_LIMIT='0', IKUUU_SESSION_CACHE='0', IKUUU_LEDGER='0',
+                      IKUUU_RECORD='', IKUUU_REPLAY='', IKUUU_LOG_LEVEL='ERROR')
+    import main
+
+    failures = 0
+    print(f"{'编码':<10}{'传输':<10}{'连接数':>8}{'中止':>6}{'签到字节':>10}{'用户页字节':>12}")
+    for encoding in ENCODINGS:
+        if encoding.startswith('br') and brotli is None:
+            continue
+        for chunked in (False, True):
+            config = StandinConfig(encoding=encoding, padding_kb=args.padding_kb, chunked=chunked)
+            connections, aborted, checkin_bytes, user_bytes, errors = run_case(main, config, args.rounds)
+            transfer = 'chunked' if chunked else 'length'
+            print(f"{encoding:<10}{transfer:<10}{connections:>8}{aborted:>6}{checkin_bytes:>10}{user_bytes:>12}")
+            problems = []
+            if errors:
+                problems.append(f'{errors} 次请求失败')
+            if connections != 1 or aborted:
+                problems.append('提前停止读取后连接没有回到连接池')
+            if not checkin_bytes or not user_bytes:
+                problems.append('没有记录传输字节数')
+            for problem in problems:
+                failures += 1
+                print(f'✗ {encoding} {transfer}: {problem}')
+    print('正确性校验:', '通过' if failures == 0 else f'{failures} 项失败')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,293 @@
+"""离线端到端性能测试
+
+在子进程中启动本地替身服务器（bench/server.py），用 main.py 的多账号流程跑完指定数量的账号，
+统计端到端和各阶段耗时、吞吐量（账号/秒）和峰值内存，结果保存到 bench/results/ 以便跨提交对比。
+
+示例：
+  python bench/run_bench.py --accounts 100 --concurrency 20 --latency-ms 30
+  python bench/run_bench.py --accounts 50 --fault-rate 0.05 --fault-kind reset --label faults
+  python bench/run_bench.py --replay fixtures.jsonl.gz --accounts 50 --label replay
+  python bench/run_bench.py --compare bench/results/A.json bench/results/B.json
+
+--replay 不启动替身服务器，回放 IKUUU_RECORD 录制的真实响应（见 README），不需要网络。
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+sys.path.insert(0, BENCH_DIR)
+from server import add_config_arguments  # noqa: E402
+
+PHASES = ('login', 'checkin', 'user_info', 'account')
+
+
+def git_revision():
+    """当前提交的短哈希，工作区有改动时加上 -dirty"""
+    try:
+        sha = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_DIR,
+                               capture_output=True, text=True).stdout.strip()
+        return f'{sha}-dirty' if dirty else sha
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(durations):
+    """单个阶段的耗时统计（毫秒）"""
+    return {
+        'count': len(durations),
+        'mean_ms': round(sum(durations) / len(durations) * 1000, 2) if durations else 0.0,
+        'p50_ms': round(percentile(durations, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(durations, 0.95) * 1000, 2),
+        'max_ms': round(max(durations) * 1000, 2) if durations else 0.0,
+    }
+
+
+def start_server(args):
+    """在子进程中启动替身服务器，返回进程和服务地址"""
+    command = [sys.executable, os.path.join(BENCH_DIR, 'server.py'), '--port', '0',
+               '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+               '--fault-rate', str(args.fault_rate), '--fault-kind', args.fault_kind,
+               '--encoding', args.encoding, '--login-mode', args.login_mode,
+               '--padding-kb', str(args.padding_kb)] + (['--etag'] if args.etag else [])
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    url = process.stdout.readline().strip()
+    if not url:
+        process.kill()
+        raise RuntimeError(f'替身服务器启动失败: {process.stderr.read()}')
+    return process, url
+
+
+def stop_server(process):
+    """停止替身服务器并读取其请求统计"""
+    process.send_signal(signal.SIGINT)
+    try:
+        _, stderr = process.communicate(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        return {}
+    for line in reversed(stderr.strip().splitlines()):
+        try:
+            return json.loads(line)
+        except ValueError:
+            continue
+    return {}
+
+
+def instrument(main_module, durations, lock):
+    """包装流水线各阶段函数以记录耗时"""
+    def timed(phase, func):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with lock:
+                    durations[phase].append(elapsed)
+        return wrapper
+
+    main_module.login_and_get_cookie = timed('login', main_module.login_and_get_cookie)
+    main_module.checkin = timed('checkin', main_module.checkin)
+    main_module.get_user_info = timed('user_info', main_module.get_user_info)
+    main_module.run_account = timed('account', main_module.run_account)
+
+
+def run_benchmark(args):
+    if args.replay:
+        process, url = None, 'http://replay.invalid'
+        os.environ.update({'IKUUU_REPLAY': args.replay, 'IKUUU_REPLAY_LATENCY': str(args.replay_latency)})
+    else:
+        process, url = start_server(args)
+    os.environ.pop('IKUUU_RECORD', None)
+    cache_dir = tempfile.mkdtemp(prefix='ikuuu-bench-')
+    os.environ.update({
+        'IKUUU_DOMAIN': url,
+        'IKUUU_DOMAINS': '',
+        'IKUUU_CACHE_DIR': cache_dir,
+        'IKUUU_SESSION_CACHE': '1' if args.session_cache else '0',
+        'IKUUU_RATE_LIMIT': str(args.rate_limit),
+    })
+    os.environ.pop('IKUUU_ACCOUNTS', None)
+    os.environ.pop('IKUUU_ACCOUNTS_FILE', None)
+
+    sys.path.insert(0, REPO_DIR)
+    import main as main_module
+
+    durations = {phase: [] for phase in PHASES}
+    instrument(main_module, durations, threading.Lock())
+    accounts = [(f'bench{i:05d}@example.com', f'password{i}') for i in range(args.accounts)]
+
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    output = io.StringIO() if not args.verbose else sys.stdout
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(output):
+            main_module.configure_connection_pool(args.concurrency)
+            main_module.configure_concurrency_limit(args.concurrency)
+            main_module.init_domain_pool()
+            results = main_module.run_accounts(accounts, args.concurrency)
+            main_module.close_connection_pool()
+            main_module.LOGGER.flush()
+    finally:
+        wall = time.perf_counter() - start
+        server_stats = stop_server(process) if process else {}
+
+    tracemalloc_peak = None
+    if args.tracemalloc:
+        tracemalloc_peak = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+
+    return {
+        'label': args.label,
+        'revision': git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': {
+            'accounts': args.accounts,
+            'concurrency': args.concurrency,
+            'latency_ms': args.latency_ms,
+            'jitter_ms': args.jitter_ms,
+            'fault_rate': args.fault_rate,
+            'fault_kind': args.fault_kind,
+            'encoding': args.encoding,
+            'login_mode': args.login_mode,
+            'padding_kb': args.padding_kb,
+            'etag': args.etag,
+            'session_cache': args.session_cache,
+            'rate_limit': args.rate_limit,
+            'replay': args.replay,
+            'replay_latency': args.replay_latency,
+        },
+        'wall_s': round(wall, 3),
+        'throughput_aps': round(args.accounts / wall, 3) if wall > 0 else 0.0,
+        'succeeded': sum(1 for result in results if result['checkin']),
+        'info_succeeded': sum(1 for result in results if result['info']),
+        'phases': {phase: summarize(values) for phase, values in durations.items()},
+        'memory': {
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'tracemalloc_peak_kb': tracemalloc_peak,
+        },
+        'server': server_stats,
+        'metrics': main_module.METRICS.snapshot(),
+    }
+
+
+def print_report(report):
+    config = report['config']
+    print(f"版本 {report['revision']}  标签 {report['label'] or '-'}  Python {report['python']}")
+    if config.get('replay'):
+        print(f"账号 {config['accounts']}  并发 {config['concurrency']}  回放 {config['replay']}  "
+              f"延迟系数 {config['replay_latency']}")
+    else:
+        print(f"账号 {config['accounts']}  并发 {config['concurrency']}  延迟 {config['latency_ms']}ms  "
+              f"故障 {config['fault_rate']}({config['fault_kind']})  编码 {config['encoding']}")
+    print(f"总耗时 {report['wall_s']} s  吞吐 {report['throughput_aps']} 账号/秒  "
+          f"签到成功 {report['succeeded']}/{config['accounts']}  信息成功 {report['info_succeeded']}/{config['accounts']}")
+    print(f"{'阶段':<12}{'次数':>8}{'平均ms':>12}{'p50ms':>12}{'p95ms':>12}{'最大ms':>12}")
+    for phase, stats in report['phases'].items():
+        print(f"{phase:<12}{stats['count']:>8}{stats['mean_ms']:>12}{stats['p50_ms']:>12}"
+              f"{stats['p95_ms']:>12}{stats['max_ms']:>12}")
+    detail = report.get('metrics', {}).get('phases', {})
+    if detail:
+        print('细分阶段（main.METRICS）:')
+        for phase, stats in sorted(detail.items(), key=lambda item: -item[1]['total_s']):
+            mean_ms = stats['total_s'] / stats['count'] * 1000 if stats['count'] else 0.0
+            print(f"  {phase:<14}{stats['count']:>8}{mean_ms:>12.2f}{stats['max_s'] * 1000:>12.2f}")
+    memory = report['memory']
+    traced = f"  tracemalloc峰值 {memory['tracemalloc_peak_kb']} KB" if memory['tracemalloc_peak_kb'] is not None else ''
+    print(f"峰值RSS {memory['peak_rss_kb']} KB{traced}")
+
+
+def save_report(report):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    suffix = f"-{report['label']}" if report['label'] else ''
+    path = os.path.join(RESULTS_DIR, f"{stamp}-{report['revision']}{suffix}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def compare(old_path, new_path):
+    """对比两次测试结果，输出关键指标的变化"""
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+
+    def row(name, before, after, lower_is_better=True):
+        if before in (None, 0) or after is None:
+            change = '-'
+        else:
+            delta = (after - before) / before * 100
+            better = delta < 0 if lower_is_better else delta > 0
+            change = f"{delta:+.1f}% {'✓' if better else '✗' if delta else ''}"
+        print(f"{name:<24}{before!s:>14}{after!s:>14}{change:>14}")
+
+    print(f"{'指标':<24}{old['revision']:>14}{new['revision']:>14}{'变化':>14}")
+    row('wall_s', old['wall_s'], new['wall_s'])
+    row('throughput_aps', old['throughput_aps'], new['throughput_aps'], lower_is_better=False)
+    for phase in PHASES:
+        for key in ('p50_ms', 'p95_ms'):
+            row(f'{phase}.{key}', old['phases'].get(phase, {}).get(key), new['phases'].get(phase, {}).get(key))
+    row('peak_rss_kb', old['memory']['peak_rss_kb'], new['memory']['peak_rss_kb'])
+    if old['config'] != new['config']:
+        print('⚠️  两次测试的配置不同，对比结果仅供参考')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='IKUUU 签到流程离线性能测试')
+    parser.add_argument('--accounts', type=int, default=20, help='模拟账号数量')
+    parser.add_argument('--concurrency', type=int, default=5, help='并发账号数')
+    parser.add_argument('--session-cache', action='store_true', help='启用登录状态缓存（默认关闭以测量完整登录）')
+    parser.add_argument('--rate-limit', type=float, default=0, help='每个域名每秒请求数（默认 0 不限速，以测量代码本身的吞吐）')
+    parser.add_argument('--tracemalloc', action='store_true', help='使用 tracemalloc 统计Python对象峰值内存（有额外开销）')
+    parser.add_argument('--label', default='', help='结果文件的附加标签')
+    parser.add_argument('--no-save', action='store_true', help='不保存结果文件')
+    parser.add_argument('--verbose', action='store_true', help='显示 main.py 的日志输出')
+    parser.add_argument('--replay', metavar='FIXTURE', help='回放录制文件而不是启动替身服务器')
+    parser.add_argument('--replay-latency', type=float, default=0, help='回放时按录制耗时乘以该系数等待（默认 0）')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='对比两个结果文件')
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run_benchmark(args)
+    print_report(report)
+    if not args.no_save:
+        print(f"结果已保存: {save_report(report)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,479 @@
+"""本地 SSPanel 替身服务器
+
+模拟 main.py 用到的接口，用于离线性能测试：
+  GET  /auth/login    返回带 CSRF 令牌的登录页
+  POST /auth/login    返回 JSON 或 302 重定向，并下发登录 Cookie
+  POST /user/checkin  返回签到 JSON（当天重复签到返回“已经签到”）
+  GET  /user          返回包含 Base64 编码 originBody 的用户中心页面（--etag 时支持 If-None-Match）
+  POST /webhook       接收通知消息（--webhook-fail N 时前 N 次返回 503），GET /webhook 返回已收到的消息
+
+支持注入延迟和故障，并可选择 Brotli/gzip/BOM 污染等响应编码，以及分块传输（Transfer-Encoding: chunked）。
+
+单独运行：
+  python bench/server.py --port 8080 --latency-ms 50 --encoding br-bom
+"""
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import random
+import secrets
+import socket
+import ssl
+import sys
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENCODINGS = ('identity', 'gzip', 'br', 'bom', 'br-bom')
+FAULT_KINDS = ('503', '429', 'reset', 'hang', 'antibot')
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head><meta charset="UTF-8"><title>登录 &mdash; iKuuu VPN</title></head>
+<body>
+<form action="/auth/login" method="post">
+  <input type="hidden" name="_token" value="{token}">
+  <input type="email" name="email"><input type="password" name="passwd">
+</form>
+{padding}
+</body>
+</html>
+"""
+
+USER_PAGE = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head><meta charset="UTF-8"><title>用户中心 &mdash; iKuuu VPN</title>
+<script src="/assets/js/app.js"></script></head>
+<body>
+<a class="btn" href="clash://install-config?url={subscribe_quoted}">一键导入 Clash</a>
+{padding}
+<script>
+function decodeBase64(s) {{ return decodeURIComponent(escape(atob(s))); }}
+var originBody = "{origin_body}";
+document.getElementById('app').innerHTML = decodeBase64(originBody);
+</script>
+</body>
+</html>
+"""
+
+ACCOUNT_CARDS = """<div id="app">
+<div class="subscribe">
+  <input type="text" class="form-control" value="{subscribe}">
+  <a href="/auth/register?code={invite}">邀请链接</a>
+</div>
+<div class="card card-statistic-2">
+  <div class="card-stats"><div class="card-stats-title">会员时长</div></div>
+  <div class="card-wrap">
+    <div class="card-header"><h4>会员时长</h4></div>
+    <div class="card-body">{days} 天</div>
+  </div>
+</div>
+<div class="card card-statistic-2">
+  <div class="card-stats"><div class="card-stats-title">今日已用: {today} GB</div></div>
+  <div class="card-wrap">
+    <div class="card-header"><h4>剩余流量</h4></div>
+    <div class="card-body">{remaining} <span>GB</span></div>
+  </div>
+</div>
+<div class="card card-statistic-2">
+  <div class="card-wrap">
+    <div class="card-header"><h4>在线设备</h4></div>
+    <div class="card-body">{devices} / 5</div>
+  </div>
+</div>
+<div class="card card-statistic-2">
+  <div class="card-stats"><div class="card-stats-title">累计获得返利金额: ¥ {rebate}</div></div>
+  <div class="card-wrap">
+    <div class="card-header"><h4>钱包余额</h4></div>
+    <div class="card-body">¥ {balance}</div>
+  </div>
+</div>
+</div>
+"""
+
+
+class StandinConfig:
+    """替身服务器的行为配置，运行中可直接修改属性"""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, fault_rate=0.0, fault_kind='503',
+                 encoding='br-bom', login_mode='json', padding_kb=0, hang_seconds=15.0, etag=False,
+                 webhook_fail=0, chunked=False):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.fault_rate = fault_rate
+        self.fault_kind = fault_kind
+        self.encoding = encoding
+        self.login_mode = login_mode
+        self.padding_kb = padding_kb
+        self.hang_seconds = hang_seconds
+        self.etag = etag
+        self.webhook_fail = webhook_fail
+        self.chunked = chunked
+
+
+class StandinState:
+    """会话、签到记录和请求计数，所有处理线程共享"""
+
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.sessions = {}      # key Cookie -> 邮箱
+        self.checked_in = set()
+        self.counters = {}      # 路径 -> 请求次数
+        self.bytes_sent = 0
+        self.faults = 0
+        self.webhooks = []      # 收到的通知消息
+        self.csrf_tokens = []   # 登录页下发的 CSRF 令牌
+        self.webhook_attempts = 0
+        self.connections = 0    # 接受的 TCP 连接数
+
+    def count(self, path, sent=0):
+        with self.lock:
+            self.counters[path] = self.counters.get(path, 0) + 1
+            self.bytes_sent += sent
+
+    def snapshot(self):
+        with self.lock:
+            return {'requests': dict(self.counters), 'bytes_sent': self.bytes_sent, 'faults': self.faults,
+                    'webhooks': len(self.webhooks), 'connections': self.connections}
+
+
+def account_secrets(email):
+    """账号的订阅链接和邀请码，由邮箱确定，便于校验录制文件中没有残留"""
+    digest = hashlib.sha1(email.encode('utf-8')).hexdigest()
+    return f'https://sub.example.com/link/{digest[:24]}', digest[24:32]
+
+
+def _padding(kb):
+    """生成指定大小的填充内容，模拟真实页面中的样式和脚本"""
+    if kb <= 0:
+        return ''
+    line = '<div class="nav-item"><a class="nav-link" href="#">菜单项</a></div>\n'
+    return line * (kb * 1024 // len(line.encode('utf-8')) + 1)
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """替身服务器请求处理"""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'nginx'
+    sys_version = ''
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.state.lock:
+            self.state.connections += 1
+
+    # 响应工具
+
+    def _encode_json(self, payload):
+        """按配置的编码方式生成 JSON 响应体和 Content-Encoding"""
+        raw = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        encoding = self.state.config.encoding
+        if encoding in ('bom', 'br-bom'):
+            # 模拟站点返回的 BOM 和前导不可见字符
+            raw = b'\xef\xbb\xbf\r\n  ' + raw + b'\n'
+        return self._compress(raw, encoding)
+
+    def _compress(self, raw, encoding):
+        if encoding in ('br', 'br-bom') and brotli is not None:
+            return brotli.compress(raw), 'br'
+        if encoding == 'gzip':
+            return gzip.compress(raw), 'gzip'
+        return raw, None
+
+    def _send(self, status, body=b'', content_type='text/html; charset=UTF-8',
+              content_encoding=None, headers=()):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Date', formatdate(usegmt=True))
+        self.send_header('Content-Type', content_type)
+        # 动态页面常以分块传输返回，没有 Content-Length
+        chunked = self.state.config.chunked and body
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            self.send_header('Content-Length', str(len(body)))
+        if content_encoding:
+            self.send_header('Content-Encoding', content_encoding)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD' and chunked:
+            for start in range(0, len(body), 4096):
+                piece = body[start:start + 4096]
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(piece), piece))
+            self.wfile.write(b'0\r\n\r\n')
+        elif self.command != 'HEAD':
+            self.wfile.write(body)
+        self.state.count(urlsplit(self.path).path, len(body))
+
+    def _send_html(self, status, html_text, headers=()):
+        encoding = self.state.config.encoding
+        body, content_encoding = self._compress(html_text.encode('utf-8'),
+                                                'identity' if encoding == 'bom' else encoding)
+        self._send(status, body, content_encoding=content_encoding, headers=headers)
+
+    def _session_email(self):
+        cookie_header = self.headers.get('Cookie', '')
+        for part in cookie_header.split(';'):
+            name, _, value = part.strip().partition('=')
+            if name == 'key':
+                with self.state.lock:
+                    return self.state.sessions.get(value)
+        return None
+
+    # 延迟与故障注入
+
+    def _inject(self):
+        """注入延迟和故障，返回 True 表示已经以故障结束本次请求"""
+        config = self.state.config
+        delay = config.latency_ms + random.uniform(0, config.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        if config.fault_rate <= 0 or random.random() >= config.fault_rate:
+            return False
+
+        with self.state.lock:
+            self.state.faults += 1
+        kind = config.fault_kind
+        if kind == '503':
+            self._send(503, '<html><body>503 Service Temporarily Unavailable</body></html>')
+        elif kind == '429':
+            self._send(429, 'Too Many Requests', headers=[('Retry-After', '1')])
+        elif kind == 'reset':
+            # 直接断开连接，客户端收到 ConnectionError
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, b'\x01\x00\x00\x00\x00\x00\x00\x00')
+            self.close_connection = True
+            self.connection.close()
+        elif kind == 'hang':
+            time.sleep(config.hang_seconds)
+            self.close_connection = True
+        elif kind == 'antibot':
+            # 返回登录页，模拟反爬虫拦截或会话失效
+            self._send_html(200, LOGIN_PAGE.format(token=secrets.token_hex(16), padding=''))
+        return True
+
+    # 路由
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/webhook':
+            with self.state.lock:
+                payloads = list(self.state.webhooks)
+            self._send(200, json.dumps(payloads, ensure_ascii=False), 'application/json')
+            return
+        if self._inject():
+            return
+        if path == '/auth/login':
+            token = secrets.token_hex(16)
+            with self.state.lock:
+                self.state.csrf_tokens.append(token)
+            page = LOGIN_PAGE.format(token=token, padding=_padding(self.state.config.padding_kb))
+            self._send_html(200, page)
+        elif path == '/user':
+            email = self._session_email()
+            if not email:
+                self._send(302, headers=[('Location', '/auth/login')])
+                return
+            page = self._user_page(email)
+            if not self.state.config.etag:
+                self._send_html(200, page)
+                return
+            etag = f'"{hashlib.sha1(page.encode("utf-8")).hexdigest()[:16]}"'
+            if self.headers.get('If-None-Match') == etag:
+                self._send(304, headers=[('ETag', etag)])
+            else:
+                self._send_html(200, page, headers=[('ETag', etag)])
+        else:
+            self._send(404, 'Not Found')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length)
+        path = urlsplit(self.path).path
+        if path == '/webhook':
+            # 通知接收方不参与站点的延迟和故障注入
+            self._webhook(raw)
+            return
+        form = parse_qs(raw.decode('utf-8', 'replace'))
+        if self._inject():
+            return
+        if path == '/auth/login':
+            self._login(form)
+        elif path == '/user/checkin':
+            self._checkin()
+        else:
+            self._send(404, 'Not Found')
+
+    def _webhook(self, raw):
+        with self.state.lock:
+            self.state.webhook_attempts += 1
+            failing = self.state.webhook_attempts <= self.state.config.webhook_fail
+        if failing:
+            self._send(503, 'Service Unavailable')
+            return
+        try:
+            payload = json.loads(raw.decode('utf-8'))
+        except ValueError:
+            self._send(400, 'Bad Request')
+            return
+        with self.state.lock:
+            self.state.webhooks.append(payload)
+        self._send(204)
+
+    def _login(self, form):
+        email = form.get('email', [''])[0]
+        if not email or not form.get('passwd', [''])[0] or not form.get('_token', [''])[0]:
+            body, content_encoding = self._encode_json({'ret': 0, 'msg': '邮箱或者密码错误'})
+            self._send(200, body, 'application/json', content_encoding)
+            return
+
+        key = secrets.token_hex(16)
+        with self.state.lock:
+            self.state.sessions[key] = email
+        expires = formatdate(time.time() + 7 * 86400, usegmt=True)
+        cookies = [
+            ('Set-Cookie', f'uid={abs(hash(email)) % 100000}; expires={expires}; Max-Age=604800; path=/'),
+            ('Set-Cookie', f'email={email.replace("@", "%40")}; expires={expires}; Max-Age=604800; path=/'),
+            ('Set-Cookie', f'key={key}; expires={expires}; Max-Age=604800; path=/'),
+        ]
+        if self.state.config.login_mode == 'redirect':
+            self._send(302, headers=[('Location', '/user')] + cookies)
+        else:
+            body, content_encoding = self._encode_json({'ret': 1, 'msg': '登录成功'})
+            self._send(200, body, 'application/json', content_encoding, cookies)
+
+    def _checkin(self):
+        email = self._session_email()
+        if not email:
+            self._send(302, headers=[('Location', '/auth/login')])
+            return
+        with self.state.lock:
+            already = email in self.state.checked_in
+            self.state.checked_in.add(email)
+        if already:
+            payload = {'ret': 0, 'msg': '您似乎已经签到过了...'}
+        else:
+            payload = {'ret': 1, 'msg': f'你获得了 {random.randint(100, 2000)} MB流量'}
+        body, content_encoding = self._encode_json(payload)
+        self._send(200, body, 'application/json', content_encoding)
+
+    def _user_page(self, email):
+        rng = random.Random(email)
+        subscribe, invite = account_secrets(email)
+        cards = ACCOUNT_CARDS.format(
+            subscribe=subscribe,
+            invite=invite,
+            days=rng.randint(1, 365),
+            today=round(rng.uniform(0, 5), 2),
+            remaining=round(rng.uniform(0, 500), 2),
+            devices=rng.randint(0, 5),
+            rebate=f'{rng.uniform(0, 10):.2f}',
+            balance=f'{rng.uniform(0, 50):.2f}',
+        )
+        origin_body = base64.b64encode(cards.encode('utf-8')).decode('ascii')
+        return USER_PAGE.format(origin_body=origin_body, padding=_padding(self.state.config.padding_kb),
+                                subscribe_quoted=quote(subscribe + '?clash=1', safe=''))
+
+
+class StandinServer:
+    """在后台线程运行替身服务器"""
+
+    def __init__(self, config=None, host='127.0.0.1', port=0, certfile=None, keyfile=None):
+        self.config = config or StandinConfig()
+        self.state = StandinState(self.config)
+        handler = type('BoundStandinHandler', (StandinHandler,), {'state': self.state})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.scheme = 'http'
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True)
+            self.scheme = 'https'
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'{self.scheme}://{host}:{port}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='standin', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def add_config_arguments(parser):
+    """添加替身服务器的命令行参数，供 run_bench.py 复用"""
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='每个请求的固定延迟（毫秒）')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='额外的随机延迟上限（毫秒）')
+    parser.add_argument('--fault-rate', type=float, default=0.0, help='注入故障的概率（0~1）')
+    parser.add_argument('--fault-kind', choices=FAULT_KINDS, default='503', help='故障类型')
+    parser.add_argument('--encoding', choices=ENCODINGS, default='br-bom', help='响应编码方式')
+    parser.add_argument('--login-mode', choices=('json', 'redirect'), default='json', help='登录成功的响应方式')
+    parser.add_argument('--padding-kb', type=int, default=0, help='页面填充大小（KB），模拟大页面')
+    parser.add_argument('--etag', action='store_true', help='用户中心页面返回 ETag 并支持条件请求')
+    parser.add_argument('--webhook-fail', type=int, default=0, help='通知接收接口前 N 次请求返回 503')
+    parser.add_argument('--chunked', action='store_true', help='以分块传输返回响应体，不带 Content-Length')
+
+
+def config_from_args(args):
+    return StandinConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, fault_rate=args.fault_rate,
+                         fault_kind=args.fault_kind, encoding=args.encoding, login_mode=args.login_mode,
+                         padding_kb=args.padding_kb, etag=args.etag, webhook_fail=args.webhook_fail,
+                         chunked=args.chunked)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地 SSPanel 替身服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0, help='监听端口，0 表示随机端口')
+    parser.add_argument('--certfile', help='TLS 证书，提供时以 HTTPS 提供服务')
+    parser.add_argument('--keyfile', help='TLS 私钥')
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = StandinServer(config_from_args(args), args.host, args.port, args.certfile, args.keyfile)
+    # 第一行输出服务地址，便于其他进程读取随机端口
+    print(server.url, flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(json.dumps(server.state.snapshot(), ensure_ascii=False), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,36 +1,62 @@
 import requests
-from bs4 import BeautifulSoup
 import os
-from datetime import datetime
 import re
 import base64
+import codecs
 import time
+import calendar
+import random
+import zlib
+import sys
+import json
+import hashlib
+import hmac
+import html
+import importlib.util
+import tempfile
+import io
+import http.client
+import atexit
+import threading
+import queue
+import socket
+import ssl
 import urllib3
+import urllib3.util.connection
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from urllib.parse import urlsplit, quote
+from email.utils import parsedate_to_datetime, formatdate
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.connection import allowed_gai_family
+from urllib3.util.wait import wait_for_read
 
 # 禁用SSL警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # 检查必需的库
+# 依赖名 -> (pip 包名, 可替代的模块名)，只查找模块元数据，不真正导入
+REQUIRED_MODULES = {
+    'brotli': ('brotli', ('brotli', 'brotlicffi')),
+    'bs4': ('beautifulsoup4', ('bs4',)),
+}
+
 def check_dependencies():
     """检查并提示安装必需的依赖"""
-    missing = []
-    try:
-        import brotli
-    except ImportError:
-        try:
-            import brotlicffi
-        except ImportError:
-            missing.append("brotli")
+    missing = [package for package, modules in REQUIRED_MODULES.values()
+               if not any(importlib.util.find_spec(module) for module in modules)]
     
     if missing:
-        print("⚠️  检测到缺少必需的依赖库:")
+        print_line("⚠️  检测到缺少必需的依赖库:", "ERROR")
         for lib in missing:
-            print(f"   - {lib}")
-        print("\n请运行以下命令安装:")
-        print("   pip install brotli")
-        print("\n或者安装所有依赖:")
-        print("   pip install -r requirements.txt")
-        print("")
+            print_line(f"   - {lib}", "ERROR")
+        print_line("\n请运行以下命令安装:", "ERROR")
+        print_line(f"   pip install {' '.join(missing)}", "ERROR")
+        print_line("\n或者安装所有依赖:", "ERROR")
+        print_line("   pip install -r requirements.txt", "ERROR")
+        print_line("", "ERROR")
         return False
     return True
 
@@ -42,129 +68,1337 @@ DEFAULT_DOMAIN = "ikuuu.ch"           # 默认域名
 
 # 按优先级获取域名：环境变量 > 本地变量 > 默认值
 BASE_DOMAIN = os.getenv('IKUUU_DOMAIN') or LOCAL_DOMAIN or DEFAULT_DOMAIN
-BASE_URL = f"https://{BASE_DOMAIN}"
+
+# 备用域名配置
+# 支持环境变量 IKUUU_DOMAINS（逗号或空白分隔），与上面的主域名一起作为候选域名
+# 多个候选域名时并行测速选出最快的可用域名，运行中连续失败时自动切换到下一个
+LOCAL_DOMAINS = []            # 本地测试时可填入备用域名，如：["ikuuu.org", "ikuuu.pw"]
+PROBE_TIMEOUT = 4             # 域名测速超时时间（秒）
+DOMAIN_CACHE_TTL = 6 * 3600   # 域名测速结果缓存有效期（秒）
+FAILOVER_THRESHOLD = 2        # 当前域名连续失败多少次后切换
 
 # 本地测试变量，本地测试时可以在这里设置，环境变量优先级更高
 LOCAL_EMAIL = ""     # 本地测试时填入邮箱
 LOCAL_PASSWORD = ""  # 本地测试时填入密码
 
+# 多账号配置
+# 支持环境变量 IKUUU_ACCOUNTS（每行一个 邮箱:密码）
+# 或 IKUUU_ACCOUNTS_FILE 指定账号文件（每行一个 邮箱:密码，# 开头为注释）
+LOCAL_ACCOUNTS_FILE = ""  # 本地测试时可填入账号文件路径
+DEFAULT_CONCURRENCY = 5   # 默认并发账号数，可通过环境变量 IKUUU_CONCURRENCY 覆盖
+
+# 会话缓存配置
+# 登录后的 Cookie 加密保存在本地，有效期内跳过登录直接签到
+# 可通过环境变量 IKUUU_CACHE_DIR 指定缓存目录，IKUUU_SESSION_CACHE=0 关闭会话缓存
+LOCAL_CACHE_DIR = ""          # 本地测试时可填入缓存目录，默认为脚本目录下的 .ikuuu_cache
+DEFAULT_SESSION_TTL = 86400   # Cookie 未声明过期时间时的默认有效期（秒）
+SESSION_EXPIRY_MARGIN = 300   # 距离过期不足该秒数的缓存视为失效
+
+# HTML解析配置
+# 可通过环境变量 IKUUU_HTML_PARSER 选择解析方式：
+#   auto  - 登录页/用户页用快速扫描，账户信息用 lxml（已安装时）或 html.parser 解析（默认）
+#   fast  - 同 auto
+#   soup  - 全部使用 BeautifulSoup + html.parser（与旧版本完全一致）
+LOCAL_HTML_PARSER = ""  # 本地测试时可填入解析方式
+
+# 流式读取配置
+# 用户页和签到响应边读边解压（gzip / brotli 由 urllib3 按 Content-Encoding 增量解压），找到所需内容后停止读取
+USER_PAGE_MAX_BYTES = 8 * 1024 * 1024    # 用户页解压后最多读取的字节数
+USER_PAGE_RETAIN_BYTES = 512 * 1024      # 用户页保留的开头字节数，用于标题检查和没有 originBody 时直接解析
+STREAM_CHUNK_SIZE = 16 * 1024            # 每次读取的字节数
+STREAM_DRAIN_LIMIT = 64 * 1024           # 提前停止时剩余未读的传输字节不超过该值则读完丢弃，连接可以回到连接池
+
+# 连接池配置
+# 所有账号共享同一组长连接，连接池大小随并发数调整
+POOL_HOSTS = 4  # 连接池缓存的主机（域名）数量
+DNS_CACHE_TTL = 300  # 进程内DNS缓存有效期（秒）
+PREWARM_CONNECTIONS = 4  # 启动时后台预先建立的连接数上限，0 表示不预热
+
+# 重试策略配置
+# 每个账号整个流程共享一个时间预算，预算用尽后不再发起新请求，避免故障时超时层层叠加
+# 可通过环境变量 IKUUU_ACCOUNT_DEADLINE 覆盖单账号时间预算（秒）
+REQUEST_TIMEOUT = 8             # 单次请求超时时间（秒）
+MAX_ATTEMPTS = 3                # 单个请求最多尝试次数（含首次）
+ACCOUNT_DEADLINE = 90           # 单账号时间预算（秒）
+RETRY_BASE_DELAY = 0.5          # 指数退避的基础等待时间（秒）
+RETRY_MAX_DELAY = 8             # 单次退避等待上限（秒）
+BREAKER_FAILURE_THRESHOLD = 5   # 同一域名连续失败多少次后熔断
+BREAKER_COOLDOWN = 30           # 熔断后多少秒放行一个探测请求
+
+# 请求限速配置
+# 同一域名的所有请求（所有账号、所有步骤）共享一个令牌桶，取代每步之间的固定等待
+# 可通过环境变量 IKUUU_RATE_LIMIT（每秒请求数，0 表示不限速）和 IKUUU_RATE_BURST（突发数）覆盖
+DEFAULT_RATE_LIMIT = 5   # 每个域名每秒请求数
+DEFAULT_RATE_BURST = 10  # 令牌桶容量，允许的短时突发请求数
+
+# 自适应并发配置
+# 同时在途的请求数由 AIMD 控制：请求耗时正常时缓慢增加上限，遇到超时、连接错误、429/5xx 或反爬虫页面时减半
+# 默认上限为固定并发数，只在站点异常时降低；IKUUU_CONCURRENCY=auto 时从默认并发数开始，最高增加到 ADAPTIVE_MAX_CONCURRENCY
+ADAPTIVE_MAX_CONCURRENCY = 20   # IKUUU_CONCURRENCY=auto 时的并发上限
+ADAPTIVE_MIN_CONCURRENCY = 1    # 并发上限的下限
+ADAPTIVE_LATENCY_TARGET = 2.0   # 请求耗时（到收到响应头）不超过该秒数时才增加上限
+ADAPTIVE_DECREASE_FACTOR = 0.5  # 遇到过载信号时上限乘以该系数
+
+# 签到记录配置
+# 本地记录各账号最近一次成功签到的服务器日期，当天重复运行时跳过已签到的账号
+# 可通过 --force 或环境变量 IKUUU_FORCE=1 强制执行，IKUUU_LEDGER=0 关闭记录
+INFO_CACHE_TTL = 6 * 3600  # 强制重跑时账户信息缓存的有效期（秒），过期后发送条件请求
+
+# 运行历史配置
+# 每次运行后把各账号的签到结果和账户信息追加到 SQLite 数据库，可用 python main.py history 查询
+# 可通过环境变量 IKUUU_HISTORY_DB 指定数据库路径，IKUUU_HISTORY=0 关闭记录
+LOCAL_HISTORY_DB = ""  # 本地测试时可填入数据库路径，默认为缓存目录下的 history.sqlite3
+
+# 常驻模式配置
+# python main.py daemon 常驻运行，每天在服务器时间（北京时间）DAEMON_RUN_AT 之后的随机时刻为每个账号签到
+# 可通过环境变量 IKUUU_DAEMON_RUN_AT（HH:MM）和 IKUUU_DAEMON_WINDOW（随机分散的分钟数）覆盖
+DAEMON_RUN_AT = "00:10"     # 每日开始签到的时间
+DAEMON_WINDOW = 60          # 各账号签到时刻在开始时间后随机分散的分钟数
+DAEMON_RETRY_DELAY = 1800   # 签到失败后多少秒再试
+DAEMON_MAX_ATTEMPTS = 3     # 每个账号每天最多尝试次数
+DAEMON_MAX_SLEEP = 300      # 单次等待的最长秒数
+
+# 日切签到配置
+# --at-reset 或 IKUUU_AT_RESET=1 时，根据响应的 Date 头估算服务器时钟，提前登录，在服务器日切换（北京时间 0 点）后
+# 把各账号的签到分散到一个时间窗口内；距离日切太远时直接签到。可通过 IKUUU_RESET_WINDOW（分钟）调整分散窗口
+RESET_DELAY = 30          # 日切后至少等待的秒数，避开服务器切换日期的瞬间
+RESET_WINDOW = 10         # 各账号签到时刻在日切后分散的分钟数
+RESET_MAX_WAIT = 3600     # 距离日切超过该秒数时不等待，直接签到
+CLOCK_SYNC_SAMPLES = 3    # 估算服务器时钟偏差时发送的请求数
+
+# 批量模式配置
+# python main.py batch 把账号列表分片，由多个进程并行处理（每个进程内仍按 IKUUU_CONCURRENCY 并发请求），
+# 每完成一个分片写入检查点，中断后重新运行时从未完成的分片继续
+BATCH_SHARD_SIZE = 50   # 每个分片的账号数
+
+# 指标导出配置
+# IKUUU_METRICS_JSONL：追加写入每个阶段耗时和本次运行计数器的 JSON Lines 文件
+# IKUUU_METRICS_PROM：Prometheus textfile 路径，供 node exporter 的 textfile collector 采集
+LOCAL_METRICS_JSONL = ""  # 本地测试时可填入 JSON Lines 文件路径
+LOCAL_METRICS_PROM = ""   # 本地测试时可填入 Prometheus textfile 路径
+
+# 通知配置
+# IKUUU_WEBHOOK_URL：每次运行结束后把所有账号的结果（含剩余流量、余额等）汇总为一条 JSON 消息 POST 到该地址；
+#   由后台线程发送，失败时重试，不占用签到流程的时间，程序退出前等待发送完成
+LOCAL_WEBHOOK_URL = ""      # 本地测试时可填入 Webhook 地址
+NOTIFY_QUEUE_SIZE = 16      # 待发送消息的队列上限，队列满时丢弃新消息
+NOTIFY_MAX_ATTEMPTS = 3     # 每条消息最多发送次数
+NOTIFY_TIMEOUT = 10         # 单次发送超时（秒）
+NOTIFY_FLUSH_TIMEOUT = 30   # 退出时最多等待发送完成的秒数
+
+# 性能分析配置
+# --profile [文件] 或 IKUUU_PROFILE=文件：用 cProfile 分析每个阶段（METRICS.phase 统计的阶段，包括
+#   step_login / step_checkin / step_user_info 以及其中的 base64_decode、extract_info 等），输出各阶段耗时最多的函数，
+#   并把所有阶段合并保存为 pstats 文件（可用 python -m pstats、snakeviz 等查看）
+# --profile-memory 或 IKUUU_PROFILE_MEMORY=1：用 tracemalloc 统计每个阶段的内存峰值和阶段结束时仍存活的分配最多的代码行，
+#   内存分析时按单并发运行
+# 未启用时不替换任何函数，没有额外开销
+PROFILE_TOP_FUNCTIONS = 10    # 每个阶段显示的函数数
+PROFILE_TOP_ALLOCATIONS = 5   # 每个阶段显示的分配代码行数
+
+# 录制与回放配置
+# IKUUU_RECORD：把所有HTTP响应（状态、头、原始压缩字节和耗时）追加录制到 gzip 压缩的 JSON Lines 文件，
+#   账号邮箱替换为 userN@example.com，Set-Cookie 的值替换为 REDACTED，请求体（含密码）不录制
+# IKUUU_REPLAY：不访问网络，按 方法 + 路径 依次返回录制文件中的响应，用完后循环使用
+# IKUUU_REPLAY_LATENCY：回放时按录制耗时乘以该系数等待（默认 0 不等待，1 为录制时的速度）
+LOCAL_RECORD_FILE = ""   # 本地测试时可填入录制文件路径
+LOCAL_REPLAY_FILE = ""   # 本地测试时可填入回放文件路径
+RECORD_FLUSH_ENTRIES = 32  # 录制的响应达到该数量时追加写入文件
+
+# 日志配置
+# IKUUU_LOG_LEVEL：最低输出级别 DEBUG / INFO / WARNING / ERROR（默认 DEBUG，与旧版本一致）
+# IKUUU_LOG_FORMAT：text 为带时间和图标的可读格式（默认），json 为每行一个带账号标签的 JSON 对象
+# IKUUU_LOG_FILE：追加写入的日志文件，默认输出到标准输出
+LOCAL_LOG_LEVEL = ""     # 本地测试时可填入日志级别
+LOCAL_LOG_FORMAT = ""    # 本地测试时可填入日志格式
+LOCAL_LOG_FILE = ""      # 本地测试时可填入日志文件路径
+LOG_BUFFER_SIZE = 8192   # 缓冲的日志达到该字节数时写出（输出到终端时逐行写出）
+LOG_FLUSH_INTERVAL = 1   # 距上次写出超过该秒数时写出
+
+# 线程本地的日志上下文，多账号并发时为每行日志加上账号标签
+_log_context = threading.local()
+
+# 线程本地的账号请求上下文，保存当前账号的截止时间
+_request_context = threading.local()
+
+LOG_LEVELS = {"DEBUG": 10, "INFO": 20, "SUCCESS": 20, "WARNING": 30, "ERROR": 40}
+LOG_LEVEL_EMOJI = {
+    "INFO": "ℹ️",
+    "SUCCESS": "✅",
+    "WARNING": "⚠️",
+    "ERROR": "❌",
+    "DEBUG": "🔍"
+}
+
+class Logger:
+    """日志输出：先按级别过滤再格式化，渲染为可读文本或 JSON Lines，缓冲后整块写出"""
+    
+    def __init__(self, level="DEBUG", structured=False, path=None):
+        self.threshold = LOG_LEVELS.get(level.upper(), LOG_LEVELS["DEBUG"])
+        self.structured = structured
+        self.path = path
+        self.file = None
+        # 输出到终端时逐行写出，重定向到管道或文件（如 GitHub Actions）时缓冲
+        self.immediate = not path and sys.stdout.isatty()
+        self.buffer = []
+        self.buffered = 0
+        self.last_flush = time.monotonic()
+        self.clock = (None, '')  # (整秒, 格式化后的时间)，同一秒内的日志复用
+        self.lock = threading.Lock()
+    
+    @classmethod
+    def from_env(cls):
+        level = os.getenv('IKUUU_LOG_LEVEL') or LOCAL_LOG_LEVEL or "DEBUG"
+        if level.upper() not in LOG_LEVELS:
+            sys.stdout.write(f"⚠️  IKUUU_LOG_LEVEL 无效: {level}，使用 DEBUG\n")
+            level = "DEBUG"
+        fmt = (os.getenv('IKUUU_LOG_FORMAT') or LOCAL_LOG_FORMAT or 'text').lower()
+        return cls(level, structured=fmt == 'json', path=os.getenv('IKUUU_LOG_FILE') or LOCAL_LOG_FILE or None)
+    
+    def enabled(self, level):
+        """该级别的日志是否会输出；拼接开销大的调试信息前先检查"""
+        return LOG_LEVELS.get(level, LOG_LEVELS["INFO"]) >= self.threshold
+    
+    def timestamp(self, now):
+        second = int(now)
+        if self.clock[0] != second:
+            self.clock = (second, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second)))
+        return self.clock[1]
+    
+    def log(self, message, level="INFO"):
+        """带时间、级别和账号标签的日志"""
+        if not self.enabled(level):
+            return
+        tag = getattr(_log_context, 'tag', None)
+        now = time.time()
+        if self.structured:
+            line = json.dumps({'ts': round(now, 3), 'level': level, 'account': tag, 'msg': message},
+                              ensure_ascii=False)
+        else:
+            if tag:
+                message = f"[{tag}] {message}"
+            line = f"[{self.timestamp(now)}] {LOG_LEVEL_EMOJI.get(level, 'ℹ️')} {message}"
+        self.write(line, urgent=LOG_LEVELS.get(level, 0) >= LOG_LEVELS["WARNING"])
+    
+    def line(self, text, level="INFO"):
+        """不带时间和图标的原样输出（分隔线、汇总、账户信息），与日志共用缓冲以保持先后顺序"""
+        if not self.enabled(level):
+            return
+        if self.structured:
+            if not text.strip():
+                return
+            self.log(text.strip(), level)
+            return
+        self.write(text)
+    
+    def write(self, line, urgent=False):
+        with self.lock:
+            self.buffer.append(line)
+            self.buffered += len(line) + 1
+            if (urgent or self.immediate or self.buffered >= LOG_BUFFER_SIZE
+                    or time.monotonic() - self.last_flush >= LOG_FLUSH_INTERVAL):
+                self._flush()
+    
+    def flush(self):
+        with self.lock:
+            self._flush()
+    
+    def _flush(self):
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return
+        # 整块一次写出，多线程输出时行与行不会交错
+        data = '\n'.join(self.buffer) + '\n'
+        self.buffer = []
+        self.buffered = 0
+        try:
+            if self.path and self.file is None:
+                self.file = open(self.path, 'a', encoding='utf-8')
+            stream = self.file or sys.stdout
+            stream.write(data)
+            stream.flush()
+        except (OSError, ValueError):
+            pass
+
+LOGGER = Logger.from_env()
+atexit.register(LOGGER.flush)
+
 def print_with_time(message, level="INFO"):
-    """带时间戳和级别的打印"""
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    level_emoji = {
-        "INFO": "ℹ️",
-        "SUCCESS": "✅", 
-        "WARNING": "⚠️",
-        "ERROR": "❌",
-        "DEBUG": "🔍"
-    }
-    emoji = level_emoji.get(level, "ℹ️")
-    print(f"[{current_time}] {emoji} {message}")
+    """带时间戳和级别的日志，低于配置级别时不做任何格式化"""
+    LOGGER.log(message, level)
+
+def print_line(text="", level="INFO"):
+    """不带时间戳的原样输出"""
+    LOGGER.line(text, level)
 
 def print_separator(char="=", length=60):
-    """打印分隔线"""
-    print(char * length)
+    """打印分隔线，JSON 日志中省略"""
+    if not LOGGER.structured:
+        LOGGER.line(char * length)
+
+class Metrics:
+    """线程安全的阶段耗时与计数器，记录每次运行的性能数据"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.phases = {}     # 阶段 -> [次数, 总耗时, 最大耗时]
+        self.counters = {}   # (指标名, 标签元组) -> 值
+        self.events = []     # 每次阶段观测的明细，用于 JSON Lines 导出
+    
+    def observe(self, phase, seconds):
+        """记录一次阶段耗时"""
+        tag = getattr(_log_context, 'tag', None)
+        with self.lock:
+            stats = self.phases.setdefault(phase, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            self.events.append((time.time(), tag, phase, seconds))
+    
+    def incr(self, name, value=1, **labels):
+        """累加计数器，标签以关键字参数传入"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+    
+    @contextmanager
+    def phase(self, name):
+        """统计代码块耗时的上下文管理器"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+    
+    def snapshot(self):
+        """返回当前所有阶段统计和计数器的副本"""
+        with self.lock:
+            phases = {
+                phase: {'count': count, 'total_s': round(total, 6), 'max_s': round(peak, 6)}
+                for phase, (count, total, peak) in self.phases.items()
+            }
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+        return {'phases': phases, 'counters': counters}
+    
+    def take_events(self):
+        """取出并清空已记录的阶段观测明细"""
+        with self.lock:
+            events, self.events = self.events, []
+        return events
+    
+    def merge(self, snapshot):
+        """合并其他进程的 snapshot() 结果（批量模式的工作进程）"""
+        with self.lock:
+            for phase, stats in snapshot['phases'].items():
+                merged = self.phases.setdefault(phase, [0, 0.0, 0.0])
+                merged[0] += stats['count']
+                merged[1] += stats['total_s']
+                merged[2] = max(merged[2], stats['max_s'])
+            for counter in snapshot['counters']:
+                key = (counter['name'], tuple(sorted(counter['labels'].items())))
+                self.counters[key] = self.counters.get(key, 0) + counter['value']
+    
+    def reset(self):
+        """清空所有统计"""
+        with self.lock:
+            self.phases, self.counters, self.events = {}, {}, []
+    
+    def export_jsonl(self, path, summary):
+        """追加写入上次导出以来的阶段耗时明细和本次运行汇总"""
+        events = self.take_events()
+        snapshot = self.snapshot()
+        lines = [
+            json.dumps({'type': 'phase', 'ts': round(ts, 3), 'account': tag, 'phase': phase,
+                        'seconds': round(seconds, 6)}, ensure_ascii=False)
+            for ts, tag, phase, seconds in events
+        ]
+        lines.append(json.dumps({'type': 'run', 'ts': round(time.time(), 3), **summary, **snapshot},
+                                ensure_ascii=False))
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+    
+    def export_prometheus(self, path, summary):
+        """原子写入 Prometheus textfile"""
+        snapshot = self.snapshot()
+        
+        def fmt_labels(labels):
+            if not labels:
+                return ''
+            escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                       for k, v in sorted(labels.items()))
+            return '{' + ','.join(escaped) + '}'
+        
+        lines = [
+            '# HELP ikuuu_phase_duration_seconds Time spent in each pipeline phase.',
+            '# TYPE ikuuu_phase_duration_seconds summary',
+        ]
+        for phase, stats in sorted(snapshot['phases'].items()):
+            lines.append(f'ikuuu_phase_duration_seconds_sum{fmt_labels({"phase": phase})} {stats["total_s"]}')
+            lines.append(f'ikuuu_phase_duration_seconds_count{fmt_labels({"phase": phase})} {stats["count"]}')
+        lines.append('# HELP ikuuu_phase_duration_seconds_max Slowest single observation of each phase.')
+        lines.append('# TYPE ikuuu_phase_duration_seconds_max gauge')
+        for phase, stats in sorted(snapshot['phases'].items()):
+            lines.append(f'ikuuu_phase_duration_seconds_max{fmt_labels({"phase": phase})} {stats["max_s"]}')
+        
+        declared = set()
+        for counter in snapshot['counters']:
+            metric = f"ikuuu_{counter['name']}"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f'# TYPE {metric} counter')
+            lines.append(f"{metric}{fmt_labels(counter['labels'])} {counter['value']}")
+        
+        for name, value in summary.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f'# TYPE ikuuu_run_{name} gauge')
+                lines.append(f'ikuuu_run_{name} {value}')
+        lines.append('# TYPE ikuuu_run_last_timestamp_seconds gauge')
+        lines.append(f'ikuuu_run_last_timestamp_seconds {int(time.time())}')
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        write_file_atomic(os.path.abspath(path), ('\n'.join(lines) + '\n').encode('utf-8'))
+
+METRICS = Metrics()
+
+class PhaseProfiler:
+    """按阶段的 CPU（cProfile）和内存（tracemalloc）分析，启用时替换 METRICS.phase，停止后恢复
+    
+    同一线程中阶段嵌套时只分析最内层阶段，外层阶段的函数和留存分配不包含内层阶段；
+    内存分析在阶段边界清空 tracemalloc 的记录，每个阶段只需统计自己分配的内存块，代价与进程内已有对象数无关，
+    但记录是整个进程共享的，因此内存分析时按单并发运行
+    """
+    
+    def __init__(self, metrics, output=None, memory=False):
+        import cProfile, pstats, tracemalloc  # 只有启用分析时才需要
+        self.cProfile, self.pstats, self.tracemalloc = cProfile, pstats, tracemalloc
+        self.metrics = metrics
+        self.output = output
+        self.memory = memory
+        self.ignored_files = (tracemalloc.__file__, pstats.__file__, cProfile.__file__)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.stats = {}        # 阶段 -> pstats.Stats
+        self.counts = {}       # 阶段 -> 次数
+        self.skipped = {}      # 阶段 -> 因其他线程占用分析器而未做CPU分析的次数（Python 3.12+）
+        self.peaks = {}        # 阶段 -> 单次运行的最大内存峰值（字节，含内层阶段）
+        self.allocations = {}  # 阶段 -> {代码行: [留存字节, 留存块数]}，各次运行合计
+    
+    @classmethod
+    def from_env(cls, output=None, memory=False):
+        """命令行参数 > 环境变量，都未启用时返回 None"""
+        output = output or os.getenv('IKUUU_PROFILE') or None
+        memory = memory or os.getenv('IKUUU_PROFILE_MEMORY', '0') in ('1', 'true', 'yes')
+        if not (output or memory):
+            return None
+        if memory:
+            print_with_time("内存分析已启用，按单并发运行", "INFO")
+            os.environ['IKUUU_CONCURRENCY'] = '1'
+        return cls(METRICS, output, memory).start()
+    
+    def start(self):
+        if self.memory:
+            self.tracemalloc.start()
+        phase = self.metrics.phase
+        
+        @contextmanager
+        def profiled_phase(name):
+            # 分析本身的开销不计入阶段耗时
+            with self.profile(name), phase(name):
+                yield
+        # 实例属性覆盖 Metrics.phase，停止时删除即恢复
+        self.metrics.phase = profiled_phase
+        return self
+    
+    @contextmanager
+    def profile(self, name):
+        stack = self.local.__dict__.setdefault('stack', [])
+        outer = stack[-1] if stack else None
+        if outer is not None:
+            if outer['profiler'] is not None:
+                outer['profiler'].disable()
+            if self.memory:
+                self._take(outer)
+        elif self.memory:
+            self.tracemalloc.clear_traces()
+        frame = {'profiler': None, 'peak': 0, 'retained': 0, 'lines': {}}
+        if self.output:
+            frame['profiler'] = self.cProfile.Profile()
+            try:
+                frame['profiler'].enable()
+            except ValueError:
+                # Python 3.12+ 同一时间只能有一个 cProfile 在运行
+                frame['profiler'] = None
+                with self.lock:
+                    self.skipped[name] = self.skipped.get(name, 0) + 1
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            stack.pop()
+            if frame['profiler'] is not None:
+                frame['profiler'].disable()
+            if self.memory:
+                self._take(frame)
+            self._collect(name, frame)
+            if outer is not None:
+                if self.memory:
+                    self.tracemalloc.clear_traces()  # 汇总结果时的分配不计入外层阶段
+                outer['peak'] = max(outer['peak'], outer['retained'] + frame['peak'])
+                if outer['profiler'] is not None:
+                    try:
+                        outer['profiler'].enable()
+                    except ValueError:
+                        outer['profiler'] = None
+    
+    def _take(self, frame):
+        """把上次清空以来分配且仍存活的内存块计入 frame，然后清空记录"""
+        snapshot = self.tracemalloc.take_snapshot()
+        current, peak = self.tracemalloc.get_traced_memory()
+        frame['peak'] = max(frame['peak'], frame['retained'] + peak)
+        frame['retained'] += current
+        for stat in snapshot.statistics('lineno'):
+            location = stat.traceback[0]
+            if location.filename in self.ignored_files:
+                continue
+            totals = frame['lines'].setdefault(f"{location.filename}:{location.lineno}", [0, 0])
+            totals[0] += stat.size
+            totals[1] += stat.count
+        self.tracemalloc.clear_traces()
+    
+    def _collect(self, name, frame):
+        stats = self.pstats.Stats(frame['profiler']) if frame['profiler'] is not None else None
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            if stats is not None:
+                if name in self.stats:
+                    self.stats[name].add(stats)
+                else:
+                    self.stats[name] = stats
+            if self.memory:
+                self.peaks[name] = max(self.peaks.get(name, 0), frame['peak'])
+                allocations = self.allocations.setdefault(name, {})
+                for location, (size, count) in frame['lines'].items():
+                    totals = allocations.setdefault(location, [0, 0])
+                    totals[0] += size
+                    totals[1] += count
+    
+    def stop(self):
+        """恢复 METRICS.phase，输出各阶段报告并保存 pstats 文件"""
+        self.metrics.__dict__.pop('phase', None)
+        if self.memory:
+            self.tracemalloc.stop()
+        self.report()
+        if self.output and self.stats:
+            merged = self.pstats.Stats()
+            for stats in self.stats.values():
+                merged.add(stats)
+            try:
+                merged.dump_stats(self.output)
+                print_with_time(f"性能分析结果已保存: {self.output}（python -m pstats {self.output}）", "INFO")
+            except OSError as e:
+                print_with_time(f"保存性能分析结果失败: {str(e)}", "WARNING")
+    
+    def report(self):
+        def phase_time(name):
+            stats = self.stats.get(name)
+            return stats.total_tt if stats is not None else 0.0
+        
+        print_separator("-", 60)
+        print_line("📈 分阶段性能分析（函数和留存只计入最内层阶段，内存峰值包含内层阶段）")
+        for name in sorted(self.counts, key=lambda item: (-phase_time(item), -self.peaks.get(item, 0))):
+            parts = [f"[{name}] {self.counts[name]} 次"]
+            if name in self.stats:
+                parts.append(f"分析耗时 {phase_time(name) * 1000:.1f} ms")
+            if self.skipped.get(name):
+                parts.append(f"{self.skipped[name]} 次未分析（其他线程占用分析器）")
+            if name in self.peaks:
+                retained = sum(size for size, _ in self.allocations.get(name, {}).values())
+                parts.append(f"单次内存峰值 {self.peaks[name] / 1024:.1f} KB，留存合计 {retained / 1024:.1f} KB")
+            print_line("  ".join(parts))
+            stats = self.stats.get(name)
+            if stats is not None:
+                top = sorted(stats.stats.items(), key=lambda item: -item[1][3])[:PROFILE_TOP_FUNCTIONS]
+                for (filename, lineno, function), (_, calls, own, cumulative, _) in top:
+                    location = f"{os.path.basename(filename)}:{lineno}" if lineno else filename
+                    print_line(f"    {calls:>7} 次  自身 {own * 1000:>8.2f} ms  累计 {cumulative * 1000:>8.2f} ms  "
+                               f"{function} ({location})")
+            allocations = self.allocations.get(name)
+            if allocations:
+                top = sorted(allocations.items(), key=lambda item: -item[1][0])[:PROFILE_TOP_ALLOCATIONS]
+                for location, (size, count) in top:
+                    print_line(f"    留存 {size / 1024:>9.1f} KB  {count:>6} 块  {location}")
+        print_separator("-", 60)
+
+def concurrency_summary(limits):
+    """运行汇总中的并发上限字段"""
+    return {
+        'concurrency_limit': limits['limit'],
+        'concurrency_limit_lowest': limits['lowest'],
+        'concurrency_limit_highest': limits['highest'],
+        'concurrency_decreases': limits['decreases'],
+    }
+
+def export_metrics(summary):
+    """按配置导出本次运行的指标"""
+    jsonl_path = os.getenv('IKUUU_METRICS_JSONL') or LOCAL_METRICS_JSONL
+    prom_path = os.getenv('IKUUU_METRICS_PROM') or LOCAL_METRICS_PROM
+    try:
+        if jsonl_path:
+            METRICS.export_jsonl(jsonl_path, summary)
+        else:
+            METRICS.take_events()  # 常驻模式下明细不导出时也不能无限累积
+        if prom_path:
+            METRICS.export_prometheus(prom_path, summary)
+    except OSError as e:
+        print_with_time(f"导出指标失败: {str(e)}", "WARNING")
+
+def print_phase_summary():
+    """以DEBUG级别输出各阶段耗时汇总"""
+    phases = METRICS.snapshot()['phases'] if LOGGER.enabled("DEBUG") else None
+    if not phases:
+        return
+    parts = [f"{phase} {stats['total_s'] * 1000:.0f}ms/{stats['count']}次"
+             for phase, stats in sorted(phases.items(), key=lambda item: -item[1]['total_s'])]
+    print_with_time(f"阶段耗时: {', '.join(parts)}", "DEBUG")
 
 def decode_base64_safe(encoded_str):
     """安全地解码Base64字符串"""
     try:
-        decoded = base64.b64decode(encoded_str).decode('utf-8')
+        with METRICS.phase('base64_decode'):
+            decoded = base64.b64decode(encoded_str).decode('utf-8')
         print_with_time("成功解码Base64内容", "SUCCESS")
         return decoded
     except Exception as e:
         print_with_time(f"Base64解码失败: {str(e)}", "ERROR")
         return None
 
-def parse_json_response(response, context="响应"):
-    """安全地解析JSON响应，处理BOM、Brotli/gzip压缩和特殊字符"""
-    import json
-    import gzip
-    import re
+# JSON恢复时最多扫描/解压的字节数，避免异常大的响应占用过多CPU和内存
+JSON_SCAN_LIMIT = 256 * 1024
+JSON_MAX_CANDIDATES = 16   # 最多尝试多少个 { 作为JSON起点
+_JSON_DECODER = json.JSONDecoder()
+_UTF8_BOM = b'\xef\xbb\xbf'
+
+def _looks_like_text_json(data):
+    """去掉BOM和空白后是否以 { 开头，即已经是解压后的文本"""
+    head = data[:64]
+    if head.startswith(_UTF8_BOM):
+        head = head[len(_UTF8_BOM):]
+    return head.lstrip()[:1] == b'{'
+
+_brotli_module = None
+
+def get_brotli():
+    """按需导入 brotli（或 brotlicffi），只在收到 br 压缩的响应体时加载，未安装时返回 None"""
+    global _brotli_module
+    if _brotli_module is None:
+        try:
+            import brotli as module
+        except ImportError:
+            try:
+                import brotlicffi as module
+            except ImportError:
+                return None
+        _brotli_module = module
+    return _brotli_module
+
+def _decompress_bounded(content, content_encoding, context):
+    """按需解压响应体，解压输出不超过 JSON_SCAN_LIMIT；返回 (字节, 解压方式)"""
+    # requests 已按 Content-Encoding 解压过时，内容本身就是文本，无需再尝试
+    if _looks_like_text_json(content):
+        return content, 'none'
+    
+    if content[:2] == b'\x1f\x8b':  # gzip magic number
+        print_with_time(f"{context}检测到gzip压缩，正在解压...", "DEBUG")
+        try:
+            return zlib.decompressobj(wbits=31).decompress(content, JSON_SCAN_LIMIT), 'gzip'
+        except zlib.error as gzip_err:
+            print_with_time(f"{context}gzip解压失败: {str(gzip_err)}", "DEBUG")
+            return content, 'gzip_failed'
+    
+    if content_encoding == 'br' or content[:2] == b'\xce\xb2' or content[:2] == b'\x1b\x4a':
+        print_with_time(f"{context}检测到Brotli压缩，正在解压...", "DEBUG")
+        brotli = get_brotli()
+        if brotli is None:
+            print_with_time(f"{context}警告：未安装brotli库，无法解压", "WARNING")
+            print_with_time("请运行: pip install brotli", "WARNING")
+            return content, 'brotli_missing'
+        try:
+            try:
+                data = brotli.Decompressor().process(content, output_buffer_limit=JSON_SCAN_LIMIT)
+            except TypeError:
+                # brotli < 1.2 不支持输出上限
+                data = brotli.decompress(content)[:JSON_SCAN_LIMIT]
+            return data, 'brotli'
+        except brotli.error as br_err:
+            print_with_time(f"{context}Brotli解压失败: {str(br_err)}", "DEBUG")
+            return content, 'brotli_failed'
+    
+    return content, 'none'
+
+def recover_json(data, limit=JSON_SCAN_LIMIT):
+    """从带BOM、前导噪声或尾部垃圾的字节中解析第一个完整的JSON对象
     
+    只在前 limit 字节内查找，从候选 { 开始分段解码UTF-8并用 raw_decode 解析，
+    字符串中的花括号和转义由JSON解析器正确处理；解析失败且未到上限时解析到上限再判断。
+    """
+    end_limit = min(len(data), limit)
+    start = data.find(b'{', 0, end_limit)
+    for _ in range(JSON_MAX_CANDIDATES):
+        if start < 0:
+            break
+        window = 4096
+        while True:
+            stop = min(start + window, end_limit)
+            # 增量解码器会保留窗口末尾不完整的多字节字符，不会报错
+            text = codecs.getincrementaldecoder('utf-8')('replace').decode(data[start:stop], final=stop >= len(data))
+            try:
+                result, _ = _JSON_DECODER.raw_decode(text)
+                return result
+            except json.JSONDecodeError:
+                # 窗口可能截断在字符串、true/false/null 或数字中间，错误位置无法可靠区分截断和真正的错误，
+                # 未到上限时直接解析到上限再判断，仍失败才尝试下一个 {
+                if stop < end_limit:
+                    window = end_limit - start
+                    continue
+                break
+        start = data.find(b'{', start + 1, end_limit)
+    raise ValueError(f"前 {end_limit} 字节内未找到完整的JSON对象")
+
+def parse_json_response(response, context="响应", phase=None):
+    """安全地解析JSON响应，处理BOM、Brotli/gzip压缩和特殊字符
+    
+    phase 为流式请求（stream=True）的阶段名：边读边尝试解析，读到完整的JSON对象即停止，最多读取 JSON_SCAN_LIMIT 字节
+    """
+    if phase:
+        content, result = _read_json_body(response, phase)
+        if result is not None:
+            METRICS.incr('json_decode_total', path='direct')
+            return result
+    else:
+        content = response.content
+    with METRICS.phase('json_parse'):
+        return _parse_json_response(content, response.headers.get('Content-Encoding', ''), context)
+
+def _read_json_body(response, phase):
+    """流式读取JSON响应体，返回 (已读取的字节, 已解析的结果或 None)"""
+    buffer = bytearray()
+    parsed = []
+    
+    def consume(chunk):
+        buffer.extend(chunk)
+        # 以 } 结尾时才尝试解析，通常第一块就是完整的响应
+        if chunk.rstrip()[-1:] == b'}':
+            with METRICS.phase('json_parse'):
+                try:
+                    parsed.append(json.loads(buffer))
+                    return True
+                except ValueError:
+                    pass
+        return False
+    
+    stream_body(response, consume, JSON_SCAN_LIMIT, phase)
+    return bytes(buffer), (parsed[0] if parsed else None)
+
+def _parse_json_response(content, encoding, context):
     try:
-        # 先尝试直接解析
-        return response.json()
-    except Exception as e:
+        # 先尝试直接解析字节，json.loads 会自动识别并跳过UTF-8 BOM
+        result = json.loads(content)
+        METRICS.incr('json_decode_total', path='direct')
+        return result
+    except ValueError as e:
         # JSON解析失败，尝试清理响应内容后再解析
         print_with_time(f"{context}JSON解析失败，尝试清理: {str(e)}", "DEBUG")
+    
+    try:
+        # 检查Content-Encoding
+        if encoding:
+            print_with_time(f"{context}Content-Encoding: {encoding}", "DEBUG")
+        
+        data, decompress_path = _decompress_bounded(content, encoding, context)
+        METRICS.incr('decompress_total', path=decompress_path)
         
+        result = recover_json(data)
+        print_with_time(f"清理后成功解析{context}（{len(data)} 字节）", "DEBUG")
+        METRICS.incr('json_decode_total', path='cleaned')
+        return result
+        
+    except Exception as e2:
+        METRICS.incr('json_decode_total', path='failed')
+        print_with_time(f"清理后仍无法解析{context}: {str(e2)}", "DEBUG")
+        # 显示原始内容的hex前20字节
+        hex_preview = content[:20].hex() if len(content) > 0 else "empty"
+        print_with_time(f"{context}内容hex前20字节: {hex_preview}", "DEBUG")
+        raise
+
+class SessionExpiredError(Exception):
+    """服务器返回登录页或非JSON签到响应，说明当前会话已失效"""
+
+def get_cache_dir():
+    """获取缓存目录：环境变量 > 本地变量 > 脚本目录下的 .ikuuu_cache"""
+    cache_dir = os.getenv('IKUUU_CACHE_DIR') or LOCAL_CACHE_DIR or \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), '.ikuuu_cache')
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    return cache_dir
+
+def write_file_atomic(path, data):
+    """原子写入文件：先写临时文件再替换，避免中断时留下损坏的缓存"""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, path)
+    except BaseException:
         try:
-            # 获取原始内容
-            content = response.content
-            
-            # 检查Content-Encoding
-            encoding = response.headers.get('Content-Encoding', '')
-            if encoding:
-                print_with_time(f"{context}Content-Encoding: {encoding}", "DEBUG")
-            
-            # 处理Brotli压缩
-            if encoding == 'br' or content[:2] == b'\xce\xb2' or content[:2] == b'\x1b\x4a':
-                print_with_time(f"{context}检测到Brotli压缩，正在解压...", "DEBUG")
-                try:
-                    import brotli
-                    text = brotli.decompress(content).decode('utf-8')
-                    print_with_time(f"{context}Brotli解压成功", "DEBUG")
-                except ImportError:
-                    print_with_time(f"{context}警告：未安装brotli库，无法解压", "WARNING")
-                    print_with_time("请运行: pip install brotli", "WARNING")
-                    # 尝试使用response.text作为备选
-                    text = response.text
-                except Exception as br_err:
-                    print_with_time(f"{context}Brotli解压失败: {str(br_err)}", "DEBUG")
-                    text = response.text
-            # 处理gzip压缩
-            elif content[:2] == b'\x1f\x8b':  # gzip magic number
-                print_with_time(f"{context}检测到gzip压缩，正在解压...", "DEBUG")
-                try:
-                    text = gzip.decompress(content).decode('utf-8')
-                    print_with_time(f"{context}gzip解压成功", "DEBUG")
-                except Exception as gzip_err:
-                    print_with_time(f"{context}gzip解压失败: {str(gzip_err)}", "DEBUG")
-                    text = response.text
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def session_cache_enabled():
+    """是否启用会话缓存"""
+    return os.getenv('IKUUU_SESSION_CACHE', '1') not in ('0', 'false', 'no')
+
+def _session_cache_path(email):
+    """会话缓存文件路径，以 域名+账号 的哈希命名，不暴露邮箱"""
+    digest = hashlib.sha256(f"{get_domain_pool().current()}\n{email.lower()}".encode('utf-8')).hexdigest()
+    directory = os.path.join(get_cache_dir(), 'sessions')
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    return os.path.join(directory, f"{digest[:32]}.json")
+
+def _derive_keys(email, password, salt):
+    """由账号密码派生加密密钥和校验密钥"""
+    material = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'),
+                                   salt + email.lower().encode('utf-8'), 20000, dklen=64)
+    return material[:32], material[32:]
+
+def _keystream_xor(key, nonce, data):
+    """以 HMAC-SHA256 计数器模式生成密钥流并与数据异或"""
+    output = bytearray()
+    for offset in range(0, len(data), 32):
+        block = hmac.new(key, nonce + (offset // 32).to_bytes(8, 'big'), hashlib.sha256).digest()
+        chunk = data[offset:offset + 32]
+        output.extend(a ^ b for a, b in zip(chunk, block))
+    return bytes(output)
+
+def save_session_cookies(email, password, cookies):
+    """加密保存登录 Cookie，有效期取自 Cookie 自身的过期时间"""
+    if not session_cache_enabled():
+        return
+    
+    cookie_list = [
+        {'name': c.name, 'value': c.value, 'domain': c.domain, 'path': c.path, 'expires': c.expires}
+        for c in cookies
+    ]
+    if not cookie_list:
+        return
+    
+    declared = [c['expires'] for c in cookie_list if c['expires']]
+    expires = min(declared) if declared else int(time.time()) + DEFAULT_SESSION_TTL
+    
+    try:
+        salt = os.urandom(16)
+        nonce = os.urandom(16)
+        enc_key, mac_key = _derive_keys(email, password, salt)
+        plaintext = json.dumps(cookie_list, separators=(',', ':')).encode('utf-8')
+        ciphertext = _keystream_xor(enc_key, nonce, plaintext)
+        tag = hmac.new(mac_key, nonce + ciphertext, hashlib.sha256).digest()
+        record = {
+            'v': 1,
+            'expires': expires,
+            'salt': base64.b64encode(salt).decode('ascii'),
+            'nonce': base64.b64encode(nonce).decode('ascii'),
+            'data': base64.b64encode(ciphertext).decode('ascii'),
+            'tag': base64.b64encode(tag).decode('ascii'),
+        }
+        write_file_atomic(_session_cache_path(email), json.dumps(record).encode('utf-8'))
+        print_with_time("已缓存登录状态", "DEBUG")
+    except Exception as e:
+        print_with_time(f"缓存登录状态失败: {str(e)}", "WARNING")
+
+def cookie_fingerprint(cookies):
+    """Cookie 的内容指纹，用于判断服务器是否更新了 Cookie"""
+    return sorted((c.name, c.value, c.domain, c.path, c.expires or 0) for c in cookies)
+
+def load_session_cookie(email, password, session):
+    """将未过期的缓存 Cookie 恢复到会话中，成功返回 True"""
+    if not session_cache_enabled():
+        return False
+    
+    try:
+        path = _session_cache_path(email)
+        if not os.path.exists(path):
+            return False
+        with open(path, 'rb') as f:
+            record = json.loads(f.read())
+        
+        if record.get('v') != 1 or record['expires'] - SESSION_EXPIRY_MARGIN <= time.time():
+            print_with_time("缓存的登录状态已过期", "DEBUG")
+            return False
+        
+        salt = base64.b64decode(record['salt'])
+        nonce = base64.b64decode(record['nonce'])
+        ciphertext = base64.b64decode(record['data'])
+        enc_key, mac_key = _derive_keys(email, password, salt)
+        expected = hmac.new(mac_key, nonce + ciphertext, hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, base64.b64decode(record['tag'])):
+            # 密码变更或文件被篡改
+            print_with_time("缓存的登录状态校验失败，忽略缓存", "DEBUG")
+            return False
+        
+        cookie_list = json.loads(_keystream_xor(enc_key, nonce, ciphertext))
+        for c in cookie_list:
+            session.cookies.set_cookie(requests.cookies.create_cookie(
+                c['name'], c['value'], domain=c['domain'], path=c['path'], expires=c['expires']))
+        return bool(cookie_list)
+    except Exception as e:
+        print_with_time(f"读取登录状态缓存失败: {str(e)}", "DEBUG")
+        return False
+
+def invalidate_session_cookie(email):
+    """删除失效的缓存 Cookie"""
+    try:
+        os.unlink(_session_cache_path(email))
+    except OSError:
+        pass
+
+class ServerClock:
+    """根据响应的 Date 头估算服务器时钟与本机时钟的偏差
+    
+    Date 只精确到秒：服务器生成响应的时刻在 [Date, Date+1) 内，对应的本机时刻在 [发出请求, 收到响应] 内，
+    每个响应给出偏差的一个区间，取所有区间的交集，以交集中点作为偏差估计
+    """
+    
+    def __init__(self):
+        self.low = None
+        self.high = None
+        self.lock = threading.Lock()
+    
+    def observe(self, date_header, sent, received):
+        """记录一个响应的 Date 头，sent / received 为发出请求和收到响应时的本机时间"""
+        if not date_header:
+            return
+        try:
+            server_time = parsedate_to_datetime(date_header).timestamp()
+        except (TypeError, ValueError):
+            return
+        low, high = server_time - received, server_time + 1 - sent
+        with self.lock:
+            if self.low is None or low > self.high or high < self.low:
+                # 第一个样本，或与已有区间矛盾（本机时钟被调整过），以新样本为准
+                self.low, self.high = low, high
             else:
-                text = response.text
-            
-            # 移除BOM（Byte Order Mark）
-            if text.startswith('\ufeff'):
-                text = text[1:]
-            
-            # 移除开头的不可见字符（使用正则找到第一个{）
-            match = re.search(r'\{', text)
-            if match:
-                text = text[match.start():]
+                self.low, self.high = max(self.low, low), min(self.high, high)
+    
+    def offset(self):
+        """服务器时钟减本机时钟（秒），没有样本时为 0"""
+        with self.lock:
+            return 0.0 if self.low is None else (self.low + self.high) / 2
+    
+    def uncertainty(self):
+        """偏差估计的误差范围（秒），没有样本时为 None"""
+        with self.lock:
+            return None if self.low is None else (self.high - self.low) / 2
+    
+    def now(self):
+        """按服务器时钟的当前时间戳"""
+        return time.time() + self.offset()
+
+SERVER_CLOCK = ServerClock()
+
+class DNSCache:
+    """进程内DNS缓存：同一主机在有效期内只解析一次，多个线程同时解析同一主机时只有一个真正发起查询"""
+    
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.entries = {}    # (主机, 端口) -> (过期时间, getaddrinfo 结果)
+        self.inflight = {}   # (主机, 端口) -> 正在解析时其他线程等待的事件
+        self.lock = threading.Lock()
+    
+    def resolve(self, host, port):
+        """返回 getaddrinfo 结果，优先使用缓存"""
+        key = (host, port)
+        while True:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry and entry[0] > time.monotonic():
+                    METRICS.incr('dns_lookups_total', result='hit')
+                    return entry[1]
+                event = self.inflight.get(key)
+                owner = event is None
+                if owner:
+                    event = self.inflight[key] = threading.Event()
+            if not owner:
+                event.wait()
+                continue
+            try:
+                METRICS.incr('dns_lookups_total', result='miss')
+                with METRICS.phase('dns'):
+                    infos = socket.getaddrinfo(host, port, allowed_gai_family(), socket.SOCK_STREAM)
+                with self.lock:
+                    self.entries[key] = (time.monotonic() + self.ttl, infos)
+                return infos
+            finally:
+                with self.lock:
+                    self.inflight.pop(key).set()
+    
+    def invalidate(self, host, port):
+        """连接失败时丢弃缓存，下次重新解析"""
+        with self.lock:
+            self.entries.pop((host, port), None)
+
+DNS_CACHE = DNSCache(DNS_CACHE_TTL)
+
+class CachedDNSConnectionMixin:
+    """新建连接时使用进程内DNS缓存解析主机名，按解析结果依次尝试各个地址"""
+    
+    def _new_conn(self):
+        host = self._dns_host
+        try:
+            infos = DNS_CACHE.resolve(host, self.port)
+        except socket.gaierror as e:
+            raise urllib3.exceptions.NameResolutionError(self.host, self, e) from e
+        
+        error = None
+        for family, socktype, proto, _, address in infos:
+            try:
+                sock = urllib3.util.connection.create_connection(
+                    address[:2], self.timeout, source_address=self.source_address,
+                    socket_options=self.socket_options)
+                sys.audit("http.client.connect", self, self.host, self.port)
+                return sock
+            except socket.timeout as e:
+                error = urllib3.exceptions.ConnectTimeoutError(
+                    self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})")
+                error.__cause__ = e
+            except OSError as e:
+                error = urllib3.exceptions.NewConnectionError(self, f"Failed to establish a new connection: {e}")
+                error.__cause__ = e
+        DNS_CACHE.invalidate(host, self.port)
+        raise error or urllib3.exceptions.NewConnectionError(self, "Failed to establish a new connection: no address")
+
+class TimedHTTPConnection(CachedDNSConnectionMixin, HTTPConnection):
+    """统计新建连接（DNS解析 + TCP握手）耗时的连接"""
+    
+    def connect(self):
+        with METRICS.phase('connect'):
+            super().connect()
+        METRICS.incr('connections_total', scheme='http')
+
+class TimedHTTPSConnection(CachedDNSConnectionMixin, HTTPSConnection):
+    """统计新建连接（DNS解析 + TCP握手 + TLS握手）耗时的连接"""
+    
+    def connect(self):
+        with METRICS.phase('connect'):
+            super().connect()
+        METRICS.incr('connections_total', scheme='https')
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class SharedHTTPAdapter(requests.adapters.HTTPAdapter):
+    """多个会话共享的连接适配器，单个会话关闭时保留连接池中的长连接"""
+    
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        # 使用带耗时统计的连接类，区分建连耗时和请求耗时
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+    
+    def close(self):
+        pass
+    
+    def close_pool(self):
+        """真正关闭连接池"""
+        super().close()
+
+class _RecordedOrigin:
+    """录制响应的原始响应替身，requests 从其 msg 中提取 Set-Cookie"""
+    
+    def __init__(self, headers):
+        self.msg = http.client.parse_headers(io.BytesIO(
+            b''.join(f'{name}: {value}\r\n'.encode('latin-1', 'replace') for name, value in headers) + b'\r\n'))
+    
+    def isclosed(self):
+        return True
+
+def _fixture_raw(status, reason, headers, body, method, original=None):
+    """用内存中的原始（未解压）响应体构造 urllib3 响应，解压仍由 urllib3 按 Content-Encoding 完成"""
+    headers = [(name, value) for name, value in headers if name.lower() != 'transfer-encoding']
+    return urllib3.HTTPResponse(
+        body=io.BytesIO(body), headers=urllib3.HTTPHeaderDict(headers), status=status, reason=reason,
+        preload_content=False, decode_content=True, request_method=method,
+        original_response=original or _RecordedOrigin(headers))
+
+class FixtureScrubber:
+    """去除录制内容中的账号信息：邮箱替换为 userN@example.com，订阅链接令牌、CSRF 令牌和邀请码替换为 REDACTED；
+    同时处理 URL 编码形式和 originBody 中的 Base64 内容"""
+    
+    _ORIGIN_BODY_BYTES_RE = re.compile(rb'(var originBody = ")([^"]+)(")')
+    # (模式, 替换)：订阅链接 /link/<令牌> 与账号代理服务的权限相同；邀请链接 ?code=<邀请码>；URL 编码参数或 JSON 中的 _token
+    _SECRET_PATTERNS = (
+        (re.compile(rb'((?:/|%2F|\\/)link(?:/|%2F|\\/))[A-Za-z0-9_-]+', re.IGNORECASE), rb'\1REDACTED'),
+        (re.compile(rb'((?:[?&]|&amp;|%3F|%26)(?:invite_?)?code(?:=|%3D))[A-Za-z0-9_-]+', re.IGNORECASE), rb'\1REDACTED'),
+        (re.compile(rb'((?:^|[?&\s"\'])_token(?:=|%3D|"\s*:\s*"))[^&\s"\'<>]+', re.IGNORECASE), rb'\1REDACTED'),
+    )
+    # 登录页 <input name="_token" value="..."> 和 <meta name="csrf-token" content="...">
+    _CSRF_TAG_RE = re.compile(rb'<(?:input|meta)\b[^>]*>', re.IGNORECASE)
+    _CSRF_VALUE_RE = re.compile(rb'''(\b(?:value|content)\s*=\s*)(?:"[^"]*"|'[^']*'|[^\s>]+)''', re.IGNORECASE)
+    
+    def __init__(self, emails):
+        self.replacements = {}
+        for index, email in enumerate(emails):
+            fake = f'user{index}@example.com'
+            for form, fake_form in ((email, fake), (quote(email, safe=''), quote(fake, safe='')),
+                                    (html.escape(email), fake)):
+                self.replacements[form.lower().encode('utf-8')] = fake_form.encode('utf-8')
+        forms = sorted(self.replacements, key=len, reverse=True)
+        self.pattern = re.compile(b'|'.join(re.escape(form) for form in forms), re.IGNORECASE) if forms else None
+    
+    def scrub(self, data):
+        """替换字节串中的邮箱和令牌，包括 originBody 解码后的内容"""
+        data = self._scrub_text(data)
+        return self._ORIGIN_BODY_BYTES_RE.sub(self._scrub_origin_body, data)
+    
+    def _scrub_text(self, data):
+        if self.pattern is not None:
+            data = self.pattern.sub(lambda match: self.replacements[match.group(0).lower()], data)
+        for pattern, replacement in self._SECRET_PATTERNS:
+            data = pattern.sub(replacement, data)
+        return self._CSRF_TAG_RE.sub(self._scrub_csrf_tag, data)
+    
+    def _scrub_csrf_tag(self, match):
+        tag = match.group(0)
+        if b'_token' not in tag and b'csrf' not in tag.lower():
+            return tag
+        return self._CSRF_VALUE_RE.sub(rb'\1"REDACTED"', tag)
+    
+    def _scrub_origin_body(self, match):
+        try:
+            decoded = base64.b64decode(match.group(2), validate=True)
+        except ValueError:
+            return match.group(0)
+        scrubbed = self._scrub_text(decoded)
+        if scrubbed == decoded:
+            return match.group(0)
+        return match.group(1) + base64.b64encode(scrubbed) + match.group(3)
+    
+    def scrub_header(self, name, value):
+        if name.lower() == 'set-cookie':
+            cookie_name, _, rest = value.partition('=')
+            attributes = rest.partition(';')[2]
+            return f"{cookie_name}=REDACTED{';' + attributes if attributes else ''}"
+        return self.scrub(value.encode('latin-1', 'replace')).decode('latin-1')
+    
+    def scrub_body(self, body, content_encoding):
+        """按 Content-Encoding 解压后替换，有改动时按原方式重新压缩；无法解压时返回 None"""
+        if not body:
+            return body
+        encoding = (content_encoding or 'identity').strip().lower()
+        try:
+            if encoding == 'gzip':
+                data = zlib.decompress(body, 47)
+            elif encoding == 'deflate':
+                try:
+                    data = zlib.decompress(body)
+                except zlib.error:
+                    data = zlib.decompress(body, -15)
+            elif encoding == 'br':
+                brotli = get_brotli()
+                if brotli is None:
+                    return None
+                data = brotli.decompress(body)
+            elif encoding == 'identity':
+                data = body
             else:
-                # 没找到{，直接strip
-                text = text.strip()
-            
-            # 找到第一个完整的JSON对象
-            # 使用简单的花括号计数来找到JSON结束位置
-            brace_count = 0
-            json_end = -1
-            for i, char in enumerate(text):
-                if char == '{':
-                    brace_count += 1
-                elif char == '}':
-                    brace_count -= 1
-                    if brace_count == 0:
-                        json_end = i + 1
-                        break
-            
-            if json_end > 0:
-                text = text[:json_end]
-            
-            print_with_time(f"清理后的{context}: {text}", "DEBUG")
-            result = json.loads(text)
-            return result
-            
-        except Exception as e2:
-            print_with_time(f"清理后仍无法解析{context}: {str(e2)}", "DEBUG")
-            # 显示原始内容的hex前20字节
-            hex_preview = content[:20].hex() if len(content) > 0 else "empty"
-            print_with_time(f"{context}内容hex前20字节: {hex_preview}", "DEBUG")
-            raise
+                return None
+        except Exception:
+            return None
+        scrubbed = self.scrub(data)
+        if scrubbed == data:
+            return body
+        if encoding == 'gzip':
+            compressor = zlib.compressobj(wbits=31)
+            return compressor.compress(scrubbed) + compressor.flush()
+        if encoding == 'deflate':
+            return zlib.compress(scrubbed)
+        if encoding == 'br':
+            return get_brotli().compress(scrubbed)
+        return scrubbed
+
+class HTTPRecorder:
+    """收集录制的响应，分批以独立 gzip 成员追加写入同一文件（多进程批量模式下各进程可以写同一个文件）"""
+    
+    def __init__(self, path, emails):
+        self.path = path
+        self.scrubber = FixtureScrubber(emails)
+        self.entries = []
+        self.lock = threading.Lock()
+    
+    def record(self, request, raw, body, elapsed):
+        headers = [(name, self.scrubber.scrub_header(name, value)) for name, value in raw.headers.items()
+                   if name.lower() != 'transfer-encoding']
+        scrubbed = self.scrubber.scrub_body(body, raw.headers.get('Content-Encoding'))
+        if scrubbed is None:
+            print_with_time(f"无法解压 {request.method} {urlsplit(request.url).path} 的响应体，不录制响应体", "WARNING")
+            scrubbed = b''
+        headers = [(name, str(len(scrubbed)) if name.lower() == 'content-length' else value)
+                   for name, value in headers]
+        split = urlsplit(request.url)
+        entry = {
+            'method': request.method,
+            'path': split.path + (f'?{split.query}' if split.query else ''),
+            'status': raw.status,
+            'reason': raw.reason,
+            'headers': headers,
+            'body': base64.b64encode(scrubbed).decode('ascii'),
+            'elapsed': round(elapsed, 4),
+        }
+        with self.lock:
+            self.entries.append(entry)
+            if len(self.entries) >= RECORD_FLUSH_ENTRIES:
+                self._flush_locked()
+    
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+    
+    def _flush_locked(self):
+        if not self.entries:
+            return
+        lines = ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in self.entries)
+        compressor = zlib.compressobj(wbits=31)
+        data = compressor.compress(lines.encode('utf-8')) + compressor.flush()
+        self.entries = []
+        try:
+            # 一次 write 追加一个完整的 gzip 成员，文件包含账户信息，仅所有者可读
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            print_with_time(f"写入录制文件失败: {str(e)}", "WARNING")
+
+class RecordingHTTPAdapter(SharedHTTPAdapter):
+    """录制模式的适配器：正常请求，读完原始响应体后录制一份，再把同样的字节交给 requests 处理"""
+    
+    def __init__(self, recorder, **kwargs):
+        self.recorder = recorder
+        super().__init__(**kwargs)
+    
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        start = time.perf_counter()
+        response = super().send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+        raw = response.raw
+        try:
+            body = raw.read(decode_content=False)
+        except urllib3.exceptions.ReadTimeoutError as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+        except urllib3.exceptions.ProtocolError as e:
+            raise requests.exceptions.ChunkedEncodingError(e, request=request)
+        self.recorder.record(request, raw, body, time.perf_counter() - start)
+        response.raw = _fixture_raw(raw.status, raw.reason, list(raw.headers.items()), body,
+                                    request.method, raw._original_response)
+        return response
+    
+    def close_pool(self):
+        self.recorder.flush()
+        super().close_pool()
+
+class ReplayHTTPAdapter(SharedHTTPAdapter):
+    """回放模式的适配器：不访问网络，按 方法 + 路径 依次返回录制的响应（忽略域名），用完后循环使用"""
+    
+    def __init__(self, path, latency_scale=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.latency_scale = latency_scale
+        self.entries = {}
+        self.positions = {}
+        self.lock = threading.Lock()
+        import gzip  # 只有回放时才需要
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.entries.setdefault((entry['method'], entry['path']), []).append(entry)
+    
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        split = urlsplit(request.url)
+        key = (request.method, split.path + (f'?{split.query}' if split.query else ''))
+        with self.lock:
+            entries = self.entries.get(key)
+            if not entries:
+                raise requests.exceptions.ConnectionError(f"回放文件中没有 {key[0]} {key[1]} 的响应", request=request)
+            position = self.positions.get(key, 0)
+            self.positions[key] = position + 1
+        entry = entries[position % len(entries)]
+        if self.latency_scale > 0:
+            time.sleep(entry['elapsed'] * self.latency_scale)
+        # Date 改为当前时间，录制时的时间会让服务器时钟估算和"今天"的判断出错
+        headers = [(name, formatdate(usegmt=True) if name.lower() == 'date' else value)
+                   for name, value in entry['headers']]
+        raw = _fixture_raw(entry['status'], entry['reason'], headers, base64.b64decode(entry['body']), request.method)
+        return self.build_response(request, raw)
+
+def get_replay_latency():
+    """回放延迟系数：环境变量 IKUUU_REPLAY_LATENCY > 0（不等待）"""
+    try:
+        return max(0.0, float(os.getenv('IKUUU_REPLAY_LATENCY') or 0))
+    except ValueError:
+        print_with_time("IKUUU_REPLAY_LATENCY 不是有效的数字，不等待", "WARNING")
+        return 0.0
+
+def create_adapter(pool_size):
+    """按录制 / 回放配置创建共享适配器：环境变量 > 本地变量"""
+    replay_path = os.getenv('IKUUU_REPLAY') or LOCAL_REPLAY_FILE
+    record_path = os.getenv('IKUUU_RECORD') or LOCAL_RECORD_FILE
+    if replay_path:
+        return ReplayHTTPAdapter(replay_path, get_replay_latency(), pool_connections=POOL_HOSTS, pool_maxsize=pool_size)
+    if record_path:
+        recorder = HTTPRecorder(record_path, [email for email, _ in load_accounts()])
+        return RecordingHTTPAdapter(recorder, pool_connections=POOL_HOSTS, pool_maxsize=pool_size)
+    return SharedHTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=pool_size)
+
+_shared_adapter = None
+_shared_adapter_lock = threading.Lock()
+
+def configure_connection_pool(pool_size):
+    """按并发数创建共享连接池，已存在且大小一致时直接复用"""
+    global _shared_adapter
+    with _shared_adapter_lock:
+        if _shared_adapter is not None and _shared_adapter._pool_maxsize == pool_size:
+            return _shared_adapter
+        if _shared_adapter is not None:
+            _shared_adapter.close_pool()
+        _shared_adapter = create_adapter(pool_size)
+        return _shared_adapter
+
+def get_shared_adapter():
+    """获取共享连接适配器，未配置时按单并发创建"""
+    return _shared_adapter or configure_connection_pool(1)
+
+def close_connection_pool():
+    """关闭共享连接池中的所有连接"""
+    global _shared_adapter
+    with _shared_adapter_lock:
+        if _shared_adapter is not None:
+            _shared_adapter.close_pool()
+            _shared_adapter = None
 
 def create_session():
-    """创建配置完整的会话对象"""
+    """创建配置完整的会话对象，每个会话有独立的Cookie，连接池全局共享"""
     session = requests.Session()
     session.headers.update({
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36 Edg/138.0.0.0',
@@ -175,106 +1409,1068 @@ def create_session():
         'Upgrade-Insecure-Requests': '1'
     })
     
-    # 设置适配器，避免连接池问题
-    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=1)
+    # 挂载共享适配器，复用已建立的 TCP/TLS 连接
+    adapter = get_shared_adapter()
     session.mount('http://', adapter)
     session.mount('https://', adapter)
     
     return session
 
-def safe_request(method, url, **kwargs):
-    """安全的网络请求，包含重试和超时控制"""
-    max_retries = 2
-    base_timeout = 8  # 降低超时时间
+def _connection_pool_for(url):
+    """取得 requests 请求该地址时使用的 urllib3 连接池（verify=False 的连接池与默认连接池不同）"""
+    adapter = get_shared_adapter()
+    if hasattr(adapter, 'build_connection_pool_key_attributes'):
+        request = requests.Request('GET', url).prepare()
+        host_params, pool_kwargs = adapter.build_connection_pool_key_attributes(request, False)
+        return adapter.poolmanager.connection_from_host(**host_params, pool_kwargs=pool_kwargs)
+    # requests < 2.32
+    pool = adapter.get_connection(url)
+    adapter.cert_verify(pool, url, False, None)
+    return pool
+
+# 预热进行中时清除，请求发出前等待预热完成，以便直接使用预热好的连接而不是各自再建新连接
+_prewarm_done = threading.Event()
+_prewarm_done.set()
+
+def wait_for_prewarm():
+    """等待后台预热完成（最多 PROBE_TIMEOUT 秒）"""
+    if not _prewarm_done.is_set():
+        with METRICS.phase('prewarm_wait'):
+            _prewarm_done.wait(PROBE_TIMEOUT)
+
+def drain_session_tickets(sock, wait=0.05):
+    """读掉 TLS 1.3 握手后服务器发来的会话票据
+    
+    未读取的票据让空闲连接看起来可读，urllib3 取用连接时会误判为已断开而丢弃重建
+    """
+    if not isinstance(sock, ssl.SSLSocket):
+        return
+    timeout = sock.gettimeout()
+    sock.setblocking(False)
+    try:
+        # 服务器通常连发两张票据，每次读取只处理一条记录
+        for attempt in range(4):
+            if not wait_for_read(sock, timeout=wait if attempt == 0 else 0.005):
+                break
+            try:
+                sock.recv(1)
+            except (ssl.SSLWantReadError, BlockingIOError):
+                pass
+    finally:
+        sock.settimeout(timeout)
+
+def prewarm_connections(count):
+    """在后台解析当前域名并建立 count 个 TCP/TLS 连接放入共享连接池，与读取缓存、派生密钥等本地工作重叠
+    
+    返回后台线程，预热失败不影响后续请求（请求会自行建立连接）
+    """
+    count = min(count, PREWARM_CONNECTIONS)
+    if count <= 0 or isinstance(get_shared_adapter(), ReplayHTTPAdapter):
+        return None
+    url = get_domain_pool().base_url()
+    _prewarm_done.clear()
+    
+    def open_connection(conn):
+        try:
+            if conn.sock is None:
+                conn.timeout = PROBE_TIMEOUT
+                conn.connect()
+                drain_session_tickets(conn.sock)
+        except Exception:
+            conn.close()
+    
+    def warm():
+        conns = []
+        pool = None
+        try:
+            pool = _connection_pool_for(url)
+            DNS_CACHE.resolve(urlsplit(url).hostname, pool.port)
+            # 先取出 count 个连接再一起建连：连接池后进先出，逐个取还会反复拿到同一个已建好的连接
+            conns = [pool._get_conn() for _ in range(count)]
+            with METRICS.phase('prewarm'):
+                threads = [threading.Thread(target=open_connection, args=(conn,), daemon=True) for conn in conns]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        except Exception as e:
+            print_with_time(f"连接预热失败: {str(e)}", "DEBUG")
+        finally:
+            for conn in conns:
+                pool._put_conn(conn)
+            _prewarm_done.set()
+    
+    thread = threading.Thread(target=warm, name='prewarm', daemon=True)
+    thread.start()
+    return thread
+
+def domain_to_url(domain):
+    """将域名转换为站点根URL，允许直接写带协议的地址（如本地测试服务器）"""
+    if '://' in domain:
+        return domain.rstrip('/')
+    return f"https://{domain}"
+
+def load_candidate_domains():
+    """按优先级收集候选域名：主域名 > IKUUU_DOMAINS > 本地备用域名，都未配置时使用默认域名
+    
+    配置了域名时不加入默认域名，避免明确指定的域名在测速中被默认域名取代
+    """
+    candidates = [os.getenv('IKUUU_DOMAIN') or LOCAL_DOMAIN]
+    candidates.extend(re.split(r'[,\s]+', os.getenv('IKUUU_DOMAINS', '')))
+    candidates.extend(LOCAL_DOMAINS)
+    if not any(domain.strip() for domain in candidates):
+        candidates.append(DEFAULT_DOMAIN)
+    
+    unique = []
+    for domain in candidates:
+        domain = domain.strip()
+        if domain and domain not in unique:
+            unique.append(domain)
+    return unique
+
+def get_account_deadline():
+    """获取单账号时间预算：环境变量 IKUUU_ACCOUNT_DEADLINE > 默认值"""
+    try:
+        return max(1.0, float(os.getenv('IKUUU_ACCOUNT_DEADLINE') or ACCOUNT_DEADLINE))
+    except ValueError:
+        print_with_time("IKUUU_ACCOUNT_DEADLINE 不是有效的数字，使用默认值", "WARNING")
+        return float(ACCOUNT_DEADLINE)
+
+def start_deadline(seconds=None):
+    """为当前线程（账号）设置截止时间"""
+    _request_context.deadline = time.monotonic() + (seconds if seconds is not None else get_account_deadline())
+
+def clear_deadline():
+    """清除当前线程的截止时间"""
+    _request_context.deadline = None
+
+def time_remaining():
+    """当前账号剩余的时间预算（秒），未设置截止时间时返回 None"""
+    deadline = getattr(_request_context, 'deadline', None)
+    return None if deadline is None else deadline - time.monotonic()
+
+def classify_error(error):
+    """将请求异常归类：connect 为请求未发出，read_timeout 为已发出但未等到响应，aborted 为连接中途断开"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return 'connect'
+    if isinstance(error, requests.exceptions.Timeout):
+        return 'read_timeout'
+    if isinstance(error, requests.exceptions.ConnectionError):
+        reason = error.args[0] if error.args else None
+        reason = getattr(reason, 'reason', reason)  # MaxRetryError 包装了真正的原因
+        if isinstance(reason, urllib3.exceptions.NewConnectionError):
+            return 'connect'
+        return 'aborted'
+    return 'other'
+
+class RetryPolicy:
+    """请求重试策略：按请求方法决定哪些失败可以重试，指数退避加随机抖动，并受账号时间预算约束"""
+    
+    # 幂等请求任何网络错误都可重试；POST 只在请求确定未发出或服务器明确拒绝时重试，
+    # 读超时或连接中途断开时服务器可能已处理（如签到已生效），重试只会浪费时间预算
+    RETRYABLE_ERRORS = {
+        'GET': {'connect', 'read_timeout', 'aborted'},
+        'POST': {'connect'},
+    }
+    RETRYABLE_STATUSES = {
+        'GET': {429, 500, 502, 503, 504},
+        'POST': {429, 503},
+    }
+    
+    def __init__(self, max_attempts=MAX_ATTEMPTS, timeout=REQUEST_TIMEOUT,
+                 base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY, idempotent=False):
+        self.max_attempts = max_attempts
+        self.idempotent = idempotent  # 为 True 时所有方法都按幂等请求处理
+        self.timeout = timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+    
+    def should_retry_error(self, method, kind):
+        """该请求方法遇到此类网络错误时是否重试"""
+        return kind in self.RETRYABLE_ERRORS.get('GET' if self.idempotent else method.upper(), self.RETRYABLE_ERRORS['GET'])
+    
+    def should_retry_status(self, method, status_code):
+        """该请求方法收到此状态码时是否重试"""
+        return status_code in self.RETRYABLE_STATUSES.get('GET' if self.idempotent else method.upper(), self.RETRYABLE_STATUSES['GET'])
+    
+    def backoff(self, attempt, retry_after=None):
+        """第 attempt 次重试前的等待时间：在 [0, base*2^attempt] 内随机（full jitter），服务器给出 Retry-After 时取较大值"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+    
+    def request_timeout(self):
+        """本次请求的超时时间，不超过账号剩余的时间预算"""
+        remaining = time_remaining()
+        return self.timeout if remaining is None else max(0.1, min(self.timeout, remaining))
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+# 重复提交登录表单只会多生成一个会话，可以按幂等请求重试
+LOGIN_RETRY_POLICY = RetryPolicy(idempotent=True)
+
+def parse_retry_after(response):
+    """解析 Retry-After 响应头（秒数形式），无法解析时返回 None"""
+    try:
+        return max(0.0, float(response.headers.get('Retry-After', '')))
+    except ValueError:
+        return None
+
+class CircuitBreaker:
+    """单个域名的熔断器：连续失败达到阈值后打开，冷却期内直接拒绝请求，冷却结束后放行一个探测请求（半开）"""
+    
+    def __init__(self, threshold=BREAKER_FAILURE_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None      # 熔断打开的时间，None 表示闭合
+        self.probe_started = None  # 半开状态下在途探测请求的开始时间
+    
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if time.monotonic() - self.opened_at >= self.cooldown else 'open'
+    
+    def allow(self):
+        """是否允许向该域名发起请求；半开状态下只放行一个探测请求"""
+        state = self.state()
+        if state == 'closed':
+            return True
+        # 探测请求没有回报结果（如被其他异常中断）时，超过冷却时间后再放行一个
+        now = time.monotonic()
+        if state == 'half_open' and (self.probe_started is None or now - self.probe_started >= self.cooldown):
+            self.probe_started = now
+            return True
+        return False
+    
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+    
+    def record_failure(self):
+        """记录一次失败，返回熔断器是否因此（重新）打开"""
+        self.failures += 1
+        if self.probe_started is not None or (self.opened_at is None and self.failures >= self.threshold):
+            self.opened_at = time.monotonic()
+            self.probe_started = None
+            return True
+        return False
+
+class TokenBucket:
+    """令牌桶限速器：按固定速率补充令牌，桶容量内允许短时突发，多线程共享"""
+    
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self, timeout=None):
+        """取走一个令牌，令牌不足时等待；等待时间会超过 timeout 时返回 False"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    break
+                wait = (1 - self.tokens) / self.rate
+            if timeout is not None and waited + wait > timeout:
+                return False
+            time.sleep(wait)
+            waited += wait
+        if waited:
+            METRICS.observe('rate_limit_wait', waited)
+        return True
+
+def get_rate_limit():
+    """获取限速配置 (每秒请求数, 突发数)：环境变量 > 默认值，速率为 0 时不限速"""
+    try:
+        rate = float(os.getenv('IKUUU_RATE_LIMIT') or DEFAULT_RATE_LIMIT)
+        burst = float(os.getenv('IKUUU_RATE_BURST') or DEFAULT_RATE_BURST)
+    except ValueError:
+        print_with_time("IKUUU_RATE_LIMIT / IKUUU_RATE_BURST 不是有效的数字，使用默认值", "WARNING")
+        rate, burst = DEFAULT_RATE_LIMIT, DEFAULT_RATE_BURST
+    return max(0.0, rate), max(1.0, burst)
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(host):
+    """获取指定域名共享的令牌桶，未启用限速时返回 None"""
+    with _rate_limiters_lock:
+        if host not in _rate_limiters:
+            rate, burst = get_rate_limit()
+            _rate_limiters[host] = TokenBucket(rate, burst) if rate > 0 else None
+        return _rate_limiters[host]
+
+class ConcurrencyLimiter:
+    """AIMD 自适应并发：限制同时在途的请求数，请求耗时正常且上限被用满时每轮加 1，遇到过载信号时减半，多线程共享"""
+    
+    REASON_LABELS = {'connect': '连接失败', 'read_timeout': '请求超时', 'aborted': '连接中断', 'anti_bot': '反爬虫页面'}
+    
+    def __init__(self, initial=DEFAULT_CONCURRENCY, maximum=DEFAULT_CONCURRENCY):
+        self.condition = threading.Condition()
+        self.configure(initial, maximum)
+    
+    def configure(self, initial, maximum):
+        """设置初始上限和最大上限，并清空之前的状态"""
+        with self.condition:
+            self.maximum = max(ADAPTIVE_MIN_CONCURRENCY, maximum)
+            self.limit = float(max(ADAPTIVE_MIN_CONCURRENCY, min(initial, self.maximum)))
+            self.in_flight = 0
+            self.last_decrease = float('-inf')
+            self.lowest = self.highest = int(self.limit)
+            self.decreases = 0
+            self.condition.notify_all()
+    
+    def acquire(self, timeout=None):
+        """占用一个在途名额，返回开始时间；等待会超过 timeout 时返回 None"""
+        start = time.monotonic()
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                remaining = None if timeout is None else timeout - (time.monotonic() - start)
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+            self.in_flight += 1
+        now = time.monotonic()
+        if now - start > 0.001:
+            METRICS.observe('concurrency_wait', now - start)
+        return now
+    
+    def release(self, started, reason=None):
+        """释放名额并调整上限；reason 为 None 表示成功，'other' 表示与站点状态无关的失败，其余为过载信号"""
+        latency = time.monotonic() - started
+        with self.condition:
+            utilized = self.in_flight * 2 >= self.limit
+            self.in_flight -= 1
+            if reason is None:
+                # 只有上限确实被用到时才说明可以承受更多，避免空闲时上限无限增长
+                if latency <= ADAPTIVE_LATENCY_TARGET and utilized and self.limit < self.maximum:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                    self.highest = max(self.highest, int(self.limit))
+            elif reason != 'other':
+                self._decrease(reason, started)
+            self.condition.notify_all()
+    
+    def overload(self, reason, started=None):
+        """请求本身成功但页面表明被限制（如反爬虫页面）时降低上限"""
+        with self.condition:
+            self._decrease(reason, started)
+    
+    def _decrease(self, reason, started):
+        # 同一批在途请求一起失败时只减半一次：上次减半之前发出的请求不再触发
+        if started is not None and started < self.last_decrease:
+            return
+        previous = int(self.limit)
+        self.limit = max(ADAPTIVE_MIN_CONCURRENCY, self.limit * ADAPTIVE_DECREASE_FACTOR)
+        self.last_decrease = time.monotonic()
+        self.decreases += 1
+        self.lowest = min(self.lowest, int(self.limit))
+        METRICS.incr('concurrency_decrease_total', reason=reason)
+        if int(self.limit) < previous:
+            label = self.REASON_LABELS.get(reason, f"服务器返回 {reason}")
+            print_with_time(f"{label}，并发上限从 {previous} 降至 {int(self.limit)}", "WARNING")
+    
+    def snapshot(self):
+        """当前、最低、最高上限和减半次数，写入运行汇总"""
+        with self.condition:
+            return {'limit': int(self.limit), 'lowest': self.lowest, 'highest': self.highest,
+                    'maximum': self.maximum, 'decreases': self.decreases}
+
+CONCURRENCY_LIMITER = ConcurrencyLimiter()
+
+def adaptive_concurrency_enabled():
+    return (os.getenv('IKUUU_CONCURRENCY') or '').strip().lower() == 'auto'
+
+def configure_concurrency_limit(concurrency):
+    """按并发线程数设置在途请求上限：自适应模式从默认并发数开始增长，否则上限即线程数，只在站点异常时降低"""
+    initial = min(DEFAULT_CONCURRENCY, concurrency) if adaptive_concurrency_enabled() else concurrency
+    CONCURRENCY_LIMITER.configure(initial, concurrency)
+
+class DomainPool:
+    """候选域名池：并行测速选出最快的可用域名，运行中连续失败时切换到下一个"""
+    
+    def __init__(self, domains):
+        self.domains = list(domains)
+        self.latencies = {}   # 域名 -> 测速延迟（秒），None 表示不可用
+        self.failures = {}    # 域名 -> 连续失败次数
+        self.breakers = {}    # 域名 -> 熔断器
+        self.index = 0
+        self.lock = threading.Lock()
+    
+    def current(self):
+        """当前使用的域名"""
+        with self.lock:
+            return self.domains[self.index]
+    
+    def _breaker(self, domain):
+        breaker = self.breakers.get(domain)
+        if breaker is None:
+            breaker = self.breakers[domain] = CircuitBreaker()
+        return breaker
+    
+    def acquire(self):
+        """获取可以发起请求的域名：当前域名熔断时切换到下一个未熔断的候选域名，全部熔断时返回 None"""
+        with self.lock:
+            for offset in range(len(self.domains)):
+                index = (self.index + offset) % len(self.domains)
+                domain = self.domains[index]
+                if self._breaker(domain).allow():
+                    switched_from = self.domains[self.index] if index != self.index else None
+                    self.index = index
+                    break
+            else:
+                return None
+        if switched_from:
+            print_with_time(f"域名 {switched_from} 已熔断，切换到 {domain}", "WARNING")
+        return domain
+    
+    def base_url(self):
+        """当前域名的站点根URL"""
+        return domain_to_url(self.current())
+    
+    def report_success(self, domain):
+        """记录一次成功请求，清零连续失败计数"""
+        with self.lock:
+            self.failures[domain] = 0
+            self._breaker(domain).record_success()
+    
+    def report_failure(self, domain):
+        """记录一次失败请求，当前域名连续失败达到阈值时切换到下一个候选域名
+        
+        返回当前使用的域名是否已不同于失败的域名（即后续请求应改用新域名重试）
+        """
+        with self.lock:
+            self.failures[domain] = self.failures.get(domain, 0) + 1
+            opened = self._breaker(domain).record_failure()
+        if opened:
+            METRICS.incr('circuit_open_total', domain=domain)
+            print_with_time(f"域名 {domain} 连续失败，熔断 {BREAKER_COOLDOWN} 秒", "WARNING")
+        with self.lock:
+            if domain != self.domains[self.index]:
+                return True
+            if self.failures[domain] < FAILOVER_THRESHOLD or self.index + 1 >= len(self.domains):
+                return False
+            self.index += 1
+            self.latencies[domain] = None
+            next_domain = self.domains[self.index]
+        print_with_time(f"域名 {domain} 连续请求失败，切换到 {next_domain}", "WARNING")
+        return True
+    
+    def _record_probe(self, domain, latency):
+        with self.lock:
+            self.latencies[domain] = latency
+    
+    def _probe(self, domain):
+        """请求登录页测速，连接保留在共享连接池中供后续请求复用"""
+        session = create_session()
+        start = time.perf_counter()
+        try:
+            response = session.get(f"{domain_to_url(domain)}/auth/login", timeout=PROBE_TIMEOUT,
+                                   verify=False, allow_redirects=False)
+            response.content  # 读完响应体，连接才会归还连接池
+            latency = time.perf_counter() - start if response.status_code < 400 else None
+        except Exception:
+            latency = None
+        self._record_probe(domain, latency)
+        return domain, latency
+    
+    def race(self):
+        """并行测速所有候选域名，选用最先返回的可用域名，其余测速在后台完成"""
+        if len(self.domains) < 2:
+            return
+        
+        print_with_time(f"正在测速 {len(self.domains)} 个候选域名...", "INFO")
+        executor = ThreadPoolExecutor(max_workers=len(self.domains), thread_name_prefix='probe')
+        futures = [executor.submit(self._probe, domain) for domain in self.domains]
+        winner = None
+        try:
+            for future in as_completed(futures, timeout=PROBE_TIMEOUT + 1):
+                domain, latency = future.result()
+                if latency is not None:
+                    winner = domain
+                    break
+        except TimeoutError:
+            pass
+        executor.shutdown(wait=False)
+        
+        with self.lock:
+            self.domains = self._ranked()
+            if winner:
+                self.domains.remove(winner)
+                self.domains.insert(0, winner)
+            self.index = 0
+        
+        if winner:
+            print_with_time(f"选用最快域名: {winner} ({self.latencies[winner] * 1000:.0f} ms)", "SUCCESS")
+        else:
+            print_with_time("所有候选域名测速失败，按原顺序尝试", "WARNING")
+    
+    def _ranked(self):
+        """按延迟排序：可用域名在前，尚未返回的次之，不可用的最后"""
+        def sort_key(domain):
+            if domain not in self.latencies:
+                return (1, 0)
+            latency = self.latencies[domain]
+            return (0, latency) if latency is not None else (2, 0)
+        return sorted(self.domains, key=sort_key)
+    
+    def load_cache(self):
+        """读取上次运行的域名排名，候选列表未变且未过期时直接使用，返回是否命中"""
+        if len(self.domains) < 2:
+            return False
+        try:
+            with open(os.path.join(get_cache_dir(), 'domains.json'), encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if sorted(record.get('ranking', [])) != sorted(self.domains):
+            return False
+        if time.time() - record.get('updated', 0) > DOMAIN_CACHE_TTL:
+            return False
+        with self.lock:
+            self.domains = list(record['ranking'])
+            self.latencies = {d: (ms / 1000 if ms is not None else None)
+                              for d, ms in record.get('latencies', {}).items()}
+            self.index = 0
+        print_with_time(f"使用缓存的域名测速结果，当前域名: {self.domains[0]}", "INFO")
+        return True
+    
+    def save_cache(self):
+        """保存域名排名和测速延迟，供下次运行直接使用"""
+        if len(self.domains) < 2:
+            return
+        with self.lock:
+            ranking = self.domains[self.index:] + self.domains[:self.index]
+            latencies = {d: (round(l * 1000, 1) if l is not None else None)
+                         for d, l in self.latencies.items()}
+        record = {'updated': int(time.time()), 'ranking': ranking, 'latencies': latencies}
+        try:
+            write_file_atomic(os.path.join(get_cache_dir(), 'domains.json'),
+                              json.dumps(record, ensure_ascii=False).encode('utf-8'))
+        except OSError as e:
+            print_with_time(f"保存域名测速结果失败: {str(e)}", "WARNING")
+
+_domain_pool = None
+
+def get_domain_pool():
+    """获取全局域名池，未初始化时使用候选域名的原始顺序"""
+    global _domain_pool
+    if _domain_pool is None:
+        _domain_pool = DomainPool(load_candidate_domains())
+    return _domain_pool
+
+def init_domain_pool():
+    """初始化域名池：优先使用缓存的测速结果，否则并行测速"""
+    pool = get_domain_pool()
+    if not pool.load_cache():
+        pool.race()
+    return pool
+
+def record_response_metrics(phase, response, streamed=False):
+    """记录响应状态、传输字节数和传输层解压方式；流式响应的字节数在读取完成后由 stream_body 记录"""
+    METRICS.incr('requests_total', phase=phase, status=response.status_code)
+    METRICS.incr('content_encoding_total', phase=phase,
+                 encoding=response.headers.get('Content-Encoding', 'identity') or 'identity')
+    if streamed:
+        return
+    # raw.tell() 为实际从网络读取的字节数（压缩后），content 为解压后的字节数
+    try:
+        wire_bytes = response.raw.tell()
+    except Exception:
+        wire_bytes = 0
+    METRICS.incr('bytes_received_total', wire_bytes or len(response.content), phase=phase)
+    METRICS.incr('bytes_decoded_total', len(response.content), phase=phase)
+
+class _WireCounter:
+    """包装 http.client 响应的底层文件对象，统计实际读取的传输字节数（分块传输时 raw.tell() 不计数）"""
+    
+    def __init__(self, fp):
+        self.fp = fp
+        self.count = 0
+    
+    def read(self, *args):
+        data = self.fp.read(*args)
+        self.count += len(data)
+        return data
+    
+    def read1(self, *args):
+        data = self.fp.read1(*args)
+        self.count += len(data)
+        return data
     
-    for attempt in range(max_retries):
+    def readline(self, *args):
+        data = self.fp.readline(*args)
+        self.count += len(data)
+        return data
+    
+    def readinto(self, buffer):
+        size = self.fp.readinto(buffer)
+        self.count += size or 0
+        return size
+    
+    def __getattr__(self, name):
+        return getattr(self.fp, name)
+
+def _wire_bytes_reader(raw):
+    """返回读取当前传输字节数的函数：分块传输时包装底层文件对象自行统计，否则使用 raw.tell()"""
+    original = getattr(raw, '_fp', None)
+    if getattr(raw, 'chunked', False) and getattr(original, 'fp', None) is not None:
+        counter = _WireCounter(original.fp)
+        original.fp = counter
+        return lambda: counter.count
+    return raw.tell
+
+def _drain_stream(response, chunks, wire_bytes):
+    """提前停止后读完剩余内容并丢弃，让连接回到连接池；剩余传输字节超过 STREAM_DRAIN_LIMIT 时返回 False"""
+    raw = response.raw
+    length = response.headers.get('Content-Length', '')
+    if length.isdigit() and not getattr(raw, 'chunked', False):
+        if int(length) - raw.tell() > STREAM_DRAIN_LIMIT:
+            return False
+        raw.drain_conn()
+        raw.release_conn()
+        return True
+    # 分块传输或没有 Content-Length 时不知道剩余长度，边读边数，读到结尾才能复用连接
+    start = wire_bytes()
+    try:
+        for _ in chunks:
+            if wire_bytes() - start > STREAM_DRAIN_LIMIT:
+                return False
+    except requests.exceptions.RequestException:
+        return False
+    raw.release_conn()
+    return True
+
+def stream_body(response, consume, limit, phase):
+    """流式读取已按 Content-Encoding 增量解压的响应体，每块交给 consume(chunk)，返回 True 时提前停止
+    
+    解压后超过 limit 字节时停止读取；返回是否读完了整个响应体。
+    提前停止时剩余内容不多则读完丢弃，让连接回到连接池，否则直接关闭连接
+    """
+    raw = response.raw
+    wire_bytes = _wire_bytes_reader(raw)
+    decoded = 0
+    finished = False
+    released = False
+    try:
+        chunks = response.iter_content(STREAM_CHUNK_SIZE)
+        for chunk in chunks:
+            decoded += len(chunk)
+            if consume(chunk):
+                break
+            if decoded >= limit:
+                METRICS.incr('body_truncated_total', phase=phase)
+                print_with_time(f"响应体超过 {limit // 1024} KB，停止读取", "WARNING")
+                break
+        else:
+            finished = True
+        if not finished:
+            released = _drain_stream(response, chunks, wire_bytes)
+    finally:
+        if not (finished or released):
+            METRICS.incr('stream_aborted_total', phase=phase)
+            response.close()
+        METRICS.incr('bytes_received_total', wire_bytes(), phase=phase)
+        METRICS.incr('bytes_decoded_total', decoded, phase=phase)
+    return finished
+
+def wait_before_retry(policy, attempt, retry_after=None):
+    """按退避策略等待后返回 True；剩余时间预算不够等待时返回 False"""
+    delay = policy.backoff(attempt, retry_after)
+    remaining = time_remaining()
+    if remaining is not None and remaining <= delay:
+        print_with_time("账号剩余时间预算不足，停止重试", "WARNING")
+        return False
+    print_with_time(f"{delay:.1f} 秒后重试...", "WARNING")
+    with METRICS.phase('retry_backoff'):
+        time.sleep(delay)
+    return True
+
+def safe_request(method, url, session=None, referer=None, phase=None, policy=None, **kwargs):
+    """安全的网络请求，包含重试和超时控制；传入会话时使用其Cookie并接收Set-Cookie更新
+    
+    url 以 / 开头时视为站点路径，每次尝试都基于当前域名拼接，域名切换或熔断后自动使用新域名；
+    referer 为站点路径，会同时设置 Origin 和 Referer 请求头；
+    phase 为指标中的阶段名，默认使用 请求方法+路径；
+    policy 为重试策略，默认 DEFAULT_RETRY_POLICY，超时和退避等待都不超过当前账号剩余的时间预算
+    """
+    phase = phase or f"{method.lower()} {url}"
+    policy = policy or DEFAULT_RETRY_POLICY
+    pool = get_domain_pool()
+    max_attempts = policy.max_attempts
+    
+    attempt = 0
+    while attempt < max_attempts:
+        attempt += 1
+        remaining = time_remaining()
+        if remaining is not None and remaining <= 0:
+            METRICS.incr('request_errors_total', phase=phase, error='deadline')
+            print_with_time("账号时间预算已用尽，放弃请求", "ERROR")
+            return None
+        if attempt > 1:
+            METRICS.incr('retries_total', phase=phase)
+        
+        domain = None
         try:
-            if attempt > 0:
-                wait_time = attempt * 2
-                print_with_time(f"第 {attempt + 1} 次重试，等待 {wait_time} 秒...", "WARNING")
-                time.sleep(wait_time)
+            # 未传入会话时使用临时会话，连接仍来自共享连接池
+            request_session = session or create_session()
             
-            # 使用新的session
-            session = create_session()
+            # 按当前可用域名拼接地址，所有候选域名都熔断时直接失败
+            if url.startswith('/'):
+                domain = pool.acquire()
+                if domain is None:
+                    METRICS.incr('request_errors_total', phase=phase, error='circuit_open')
+                    print_with_time("所有候选域名均已熔断，跳过请求", "ERROR")
+                    return None
+            request_url = f"{domain_to_url(domain)}{url}" if domain else url
+            wait_for_prewarm()
+            
+            # 按域名限速，等待不超过账号剩余的时间预算
+            limiter = get_rate_limiter(domain or urlsplit(url).netloc)
+            if limiter and not limiter.acquire(time_remaining()):
+                METRICS.incr('request_errors_total', phase=phase, error='deadline')
+                print_with_time("等待限速令牌将超出账号时间预算，放弃请求", "ERROR")
+                return None
+            # 在途请求数达到自适应上限时等待，同样不超过账号剩余的时间预算
+            started = CONCURRENCY_LIMITER.acquire(time_remaining())
+            if started is None:
+                METRICS.incr('request_errors_total', phase=phase, error='deadline')
+                print_with_time("等待并发名额将超出账号时间预算，放弃请求", "ERROR")
+                return None
+            if referer and domain:
+                headers = dict(kwargs.get('headers') or {})
+                headers['Origin'] = domain_to_url(domain)
+                headers['Referer'] = f"{domain_to_url(domain)}{referer}"
+                kwargs['headers'] = headers
             
             # 设置超时
-            kwargs['timeout'] = base_timeout
+            kwargs['timeout'] = policy.request_timeout()
             kwargs['verify'] = False  # 跳过SSL验证
             
-            response = session.request(method, url, **kwargs)
-            session.close()  # 主动关闭连接
+            sent = time.time()
+            overload = 'other'
+            try:
+                with METRICS.phase(phase):
+                    response = request_session.request(method, request_url, **kwargs)
+                status = response.status_code
+                overload = str(status) if status == 429 or status >= 500 else None
+            except requests.exceptions.RequestException as e:
+                overload = classify_error(e)
+                raise
+            finally:
+                CONCURRENCY_LIMITER.release(started, overload)
+            SERVER_CLOCK.observe(response.headers.get('Date'), sent, time.time())
+            record_response_metrics(phase, response, streamed=kwargs.get('stream', False))
+            if domain:
+                if response.status_code >= 500:
+                    pool.report_failure(domain)
+                else:
+                    pool.report_success(domain)
+            
+            # 服务器过载或限流时按策略重试，最后一次仍返回响应由调用方处理
+            if attempt < max_attempts and policy.should_retry_status(method, response.status_code):
+                print_with_time(f"服务器返回 {response.status_code} (尝试 {attempt}/{max_attempts})", "WARNING")
+                if wait_before_retry(policy, attempt, parse_retry_after(response)):
+                    response.close()
+                    continue
             return response
             
-        except requests.exceptions.Timeout:
-            print_with_time(f"请求超时 (尝试 {attempt + 1}/{max_retries})", "WARNING")
-            if attempt == max_retries - 1:
-                print_with_time("所有重试均超时，请检查网络连接", "ERROR")
+        except requests.exceptions.RequestException as e:
+            kind = classify_error(e)
+            METRICS.incr('request_errors_total', phase=phase, error=kind)
+            label = {'connect': '连接失败', 'read_timeout': '请求超时', 'aborted': '连接中断'}.get(kind, '请求异常')
+            print_with_time(f"{label}: {str(e)} (尝试 {attempt}/{max_attempts})", "WARNING")
+            # 域名刚切换时额外给新域名一次机会，不必重启整个流程
+            if domain and pool.report_failure(domain):
+                max_attempts += 1
+            if not policy.should_retry_error(method, kind):
+                print_with_time(f"{method.upper()} 请求可能已被服务器处理，不再重试", "ERROR")
+                return None
+            if attempt >= max_attempts:
+                print_with_time("所有重试均失败，请检查网络连接", "ERROR")
                 return None
-        except requests.exceptions.ConnectionError as e:
-            print_with_time(f"连接错误: {str(e)} (尝试 {attempt + 1}/{max_retries})", "WARNING")
-            if attempt == max_retries - 1:
-                print_with_time("网络连接失败，请检查网络状态", "ERROR")
+            if not wait_before_retry(policy, attempt):
                 return None
         except KeyboardInterrupt:
             print_with_time("用户中断操作", "WARNING")
             raise
         except Exception as e:
-            print_with_time(f"请求异常: {str(e)} (尝试 {attempt + 1}/{max_retries})", "WARNING")
-            if attempt == max_retries - 1:
+            print_with_time(f"请求异常: {str(e)} (尝试 {attempt}/{max_attempts})", "WARNING")
+            if attempt >= max_attempts or not wait_before_retry(policy, attempt):
                 return None
     
     return None
 
-def login_and_get_cookie():
-    """登录 SSPanel 并获取 Cookie"""
-    # 按优先级获取账户信息：环境变量 > 本地变量
-    email = os.getenv('IKUUU_EMAIL') or LOCAL_EMAIL
-    password = os.getenv('IKUUU_PASSWORD') or LOCAL_PASSWORD
+# 快速扫描使用的正则，避免为了一个字段构建整棵DOM树
+# 与 html.parser 一致：注释和 <script>/<style> 的内容不是标签，先作为整体匹配掉，其中的 <input>/<title> 不会被误认
+_SKIPPED_SOURCE = r'<!--.*?-->|<(?P<raw>script|style)\b[^>]*>.*?</(?P=raw)\s*>'
+_INPUT_TAG_RE = re.compile(_SKIPPED_SOURCE + r'''|<input\b(?P<attrs>(?:[^>"']|"[^"]*"|'[^']*')*)>''',
+                           re.IGNORECASE | re.DOTALL)
+_ATTR_RE = re.compile(r'''([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?''')
+_TITLE_RE = re.compile(_SKIPPED_SOURCE + r'|<title\b[^>]*>(?P<title>.*?)</title\s*>', re.IGNORECASE | re.DOTALL)
+_SCRIPT_RE = re.compile(r'<!--.*?-->|<style\b[^>]*>.*?</style\s*>|<script\b[^>]*>(?P<script>.*?)</script\s*>',
+                        re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]*>')
+_ORIGIN_BODY_RE = re.compile(r'var originBody = "([^"]+)"')
+
+_lxml_available = None
+_beautiful_soup = None
+
+def get_beautiful_soup():
+    """按需导入 BeautifulSoup，只有真正需要构建DOM树时才加载 bs4"""
+    global _beautiful_soup
+    if _beautiful_soup is None:
+        from bs4 import BeautifulSoup
+        _beautiful_soup = BeautifulSoup
+    return _beautiful_soup
+
+def get_html_parser_mode():
+    """获取HTML解析方式：环境变量 > 本地变量 > auto"""
+    mode = (os.getenv('IKUUU_HTML_PARSER') or LOCAL_HTML_PARSER or 'auto').lower()
+    return mode if mode in ('auto', 'fast', 'soup') else 'auto'
+
+def get_tree_builder():
+    """选择构建DOM树的后端：已安装 lxml 时使用C实现，否则使用 html.parser"""
+    global _lxml_available
+    if get_html_parser_mode() == 'soup':
+        return 'html.parser'
+    if _lxml_available is None:
+        _lxml_available = importlib.util.find_spec('lxml') is not None
+    return 'lxml' if _lxml_available else 'html.parser'
+
+def parse_html(html_text):
+    """构建DOM树，用于需要遍历页面结构的场景"""
+    with METRICS.phase('html_parse'):
+        return get_beautiful_soup()(html_text, get_tree_builder())
+
+def _parse_attrs(attr_text):
+    """解析标签属性，属性名小写、值做实体反转义，重复属性保留最后一个（与 BeautifulSoup 一致）"""
+    attrs = {}
+    for match in _ATTR_RE.finditer(attr_text):
+        name = match.group(1).lower()
+        value = next((v for v in match.group(2, 3, 4) if v is not None), '')
+        attrs[name] = html.unescape(value)
+    return attrs
+
+def find_csrf_token(html_text):
+    """查找登录页中 name="_token" 的 input 的 value"""
+    if get_html_parser_mode() == 'soup':
+        csrf_input = get_beautiful_soup()(html_text, 'html.parser').find('input', {'name': '_token'})
+        return csrf_input.get('value') if csrf_input else None
+    
+    if '_token' not in html_text:
+        return None
+    for match in _INPUT_TAG_RE.finditer(html_text):
+        if not match.group('attrs') or '_token' not in match.group('attrs'):
+            continue
+        attrs = _parse_attrs(match.group('attrs'))
+        if attrs.get('name') == '_token':
+            return attrs.get('value')
+    return None
+
+def find_page_title(html_text):
+    """获取页面 <title> 的文本，没有标题时返回 None"""
+    if get_html_parser_mode() == 'soup':
+        title = get_beautiful_soup()(html_text, 'html.parser').find('title')
+        return title.get_text(strip=True) if title else None
+    
+    title = next((match.group('title') for match in _TITLE_RE.finditer(html_text)
+                  if match.group('title') is not None), None)
+    if title is None:
+        return None
+    # 与 get_text(strip=True) 一致：去掉内部标签，各文本片段分别去除首尾空白后拼接
+    pieces = (html.unescape(piece).strip() for piece in _TAG_RE.split(title))
+    return ''.join(pieces)
+
+def find_origin_body(html_text):
+    """在同时引用 originBody 和 decodeBase64 的脚本中查找Base64编码的页面内容"""
+    if get_html_parser_mode() == 'soup':
+        for script in get_beautiful_soup()(html_text, 'html.parser').find_all('script'):
+            script_content = script.get_text()
+            if 'originBody' in script_content and 'decodeBase64' in script_content:
+                match = _ORIGIN_BODY_RE.search(script_content)
+                if match:
+                    return match.group(1)
+        return None
+    
+    if 'originBody' not in html_text:
+        return None
+    for script in _SCRIPT_RE.finditer(html_text):
+        script_content = script.group('script')
+        if script_content and 'originBody' in script_content and 'decodeBase64' in script_content:
+            match = _ORIGIN_BODY_RE.search(script_content)
+            if match:
+                return match.group(1)
+    return None
+
+# 流式扫描用户页使用的字节正则，规则与 _SCRIPT_RE 一致：注释、<style> 和 <script> 的内容整体跳过
+_SPAN_OPEN_RE = re.compile(rb'<!--|<(?P<raw>script|style)\b', re.IGNORECASE)
+_SPAN_CLOSE_RES = {
+    None: re.compile(rb'-->'),
+    b'script': re.compile(rb'</script\s*>', re.IGNORECASE),
+    b'style': re.compile(rb'</style\s*>', re.IGNORECASE),
+}
+_SPAN_OPEN_TAIL = len(b'<script') - 1  # 块末尾可能是被截断的开始标记
+_ORIGIN_BODY_BYTES_RE = re.compile(_ORIGIN_BODY_RE.pattern.encode('ascii'))
+
+class UserPageReader:
+    """边读边扫描用户页，读到包含 originBody 的完整脚本后即可停止读取
+    
+    与 find_origin_body 的规则一致：跳过注释和 <style>，只在同时引用 decodeBase64 的脚本中查找 originBody。
+    只保留页面开头 retain 字节（标题检查和没有 originBody 时的直接解析）和当前未闭合的片段，其余内容扫描后即丢弃
+    """
+    
+    def __init__(self, retain=USER_PAGE_RETAIN_BYTES, early_stop=True):
+        self.retain = retain
+        self.early_stop = early_stop
+        self.head = bytearray()
+        self.pending = bytearray()  # 未扫描完的内容：块末尾的半个标记，或当前片段（脚本）的内容
+        self.in_span = False        # 是否在注释、<script> 或 <style> 中
+        self.span = None            # 当前片段的标签名 b'script' / b'style'，注释为 None
+        self.scan_from = 0          # 在 pending 中查找结束标记的起点
+        self.origin_body = None     # 已读到的 originBody 内容
+        self.complete = False       # 是否已在脚本中读到完整的 originBody
+    
+    def feed(self, chunk):
+        """处理一块解压后的内容，读到完整的 originBody 后返回 True"""
+        if len(self.head) < self.retain:
+            self.head += chunk[:self.retain - len(self.head)]
+        if self.complete:
+            return self.early_stop
+        self.pending += chunk
+        self._scan()
+        if self.complete:
+            self.pending = bytearray()
+            return self.early_stop
+        return False
+    
+    def _scan(self):
+        pending = self.pending
+        pos = 0
+        while not self.complete:
+            if not self.in_span:
+                opener = _SPAN_OPEN_RE.search(pending, pos)
+                if opener is None:
+                    pos = max(pos, len(pending) - _SPAN_OPEN_TAIL)
+                    break
+                raw = opener.group('raw')
+                if raw is None:
+                    self.span = None
+                    pos = opener.end()
+                else:
+                    # 标签名之后还没有读到内容，或开始标签还没结束，等下一块
+                    tag_end = pending.find(b'>', opener.end())
+                    if opener.end() == len(pending) or tag_end < 0:
+                        pos = opener.start()
+                        break
+                    self.span = raw.lower()
+                    pos = tag_end + 1
+                self.in_span = True
+                self.scan_from = pos
+                continue
+            
+            closing = _SPAN_CLOSE_RES[self.span].search(pending, self.scan_from)
+            if closing is None:
+                if self.span is None:
+                    self.scan_from = max(pos, len(pending) - 2)
+                else:
+                    # 未结束的结束标签只可能从最后一个 < 开始，之前查找过的部分不再重复查找
+                    last = pending.rfind(b'<', max(pos, self.scan_from))
+                    self.scan_from = last if last >= 0 else len(pending)
+                if self.span != b'script':
+                    pos = self.scan_from
+                break
+            if self.span == b'script':
+                self._check_script(pending[pos:closing.start()])
+            self.in_span = False
+            pos = closing.end()
+        del pending[:pos]
+        self.scan_from = max(self.scan_from - pos, 0)
+    
+    def _check_script(self, script):
+        if b'originBody' in script and b'decodeBase64' in script:
+            match = _ORIGIN_BODY_BYTES_RE.search(script)
+            if match:
+                self.origin_body = match.group(1)
+                self.complete = True
+    
+    def text(self, encoding=None):
+        """保留部分的页面文本"""
+        return self.head.decode(encoding or 'utf-8', 'replace')
+    
+    def encoded_content(self):
+        """Base64编码的页面内容，没有读到完整的 originBody 时返回 None"""
+        return self.origin_body.decode('ascii', 'replace') if self.complete and self.origin_body else None
+
+def print_config_help():
+    """打印账户和域名的配置说明"""
+    print_with_time("请设置账户信息", "ERROR")
+    print_with_time("可选配置方式:", "INFO")
+    print_line("   🔧 1. 设置环境变量 IKUUU_EMAIL 和 IKUUU_PASSWORD（推荐）")
+    print_line("   👥 2. 多账号：设置环境变量 IKUUU_ACCOUNTS 或 IKUUU_ACCOUNTS_FILE（每行一个 邮箱:密码）")
+    print_line("   📝 3. 在代码中设置 LOCAL_EMAIL 和 LOCAL_PASSWORD")
+    print_line("")
+    print_with_time("可选域名配置:", "INFO")
+    print_line("   🔧 1. 设置环境变量 IKUUU_DOMAIN（推荐）")
+    print_line("   📝 2. 在代码中设置 LOCAL_DOMAIN")
+    print_line(f"   ⚙️  当前使用域名: {get_domain_pool().current()}")
+
+def mask_email(email):
+    """隐藏邮箱中间部分，用于日志输出"""
+    if '@' not in email:
+        return f"{email[:3]}***"
+    return f"{email[:3]}***{email.split('@')[1]}"
+
+def login_and_get_cookie(email=None, password=None, session=None):
+    """登录 SSPanel 并获取 Cookie，传入会话时登录后的Cookie保存在该会话中"""
+    # 未显式传入账户时，按优先级获取账户信息：环境变量 > 本地变量
+    if email is None:
+        email = os.getenv('IKUUU_EMAIL') or LOCAL_EMAIL
+        password = os.getenv('IKUUU_PASSWORD') or LOCAL_PASSWORD
     
     if not email or not password:
-        print_with_time("请设置账户信息", "ERROR")
-        print_with_time("可选配置方式:", "INFO")
-        print("   🔧 1. 设置环境变量 IKUUU_EMAIL 和 IKUUU_PASSWORD（推荐）")
-        print("   📝 2. 在代码中设置 LOCAL_EMAIL 和 LOCAL_PASSWORD")
-        print("")
-        print_with_time("可选域名配置:", "INFO")
-        print("   🔧 1. 设置环境变量 IKUUU_DOMAIN（推荐）")
-        print("   📝 2. 在代码中设置 LOCAL_DOMAIN")
-        print(f"   ⚙️  当前使用域名: {BASE_DOMAIN}")
+        print_config_help()
         return None
     
     # 判断使用的配置方式
-    config_source = "环境变量" if os.getenv('IKUUU_EMAIL') else "本地变量"
+    if os.getenv('IKUUU_EMAIL') == email:
+        config_source = "环境变量"
+    elif LOCAL_EMAIL == email:
+        config_source = "本地变量"
+    else:
+        config_source = "多账号"
     domain_source = "环境变量" if os.getenv('IKUUU_DOMAIN') else ("本地变量" if LOCAL_DOMAIN else "默认值")
-    masked_email = f"{email[:3]}***{email.split('@')[1]}"
-    print_with_time(f"使用{config_source}配置，账号: {masked_email}", "INFO")
-    print_with_time(f"使用{domain_source}域名: {BASE_DOMAIN}", "INFO")
+    print_with_time(f"使用{config_source}配置，账号: {mask_email(email)}", "INFO")
+    print_with_time(f"使用{domain_source}域名: {get_domain_pool().current()}", "INFO")
     
     # 创建持久session来保持Cookie
-    session = create_session()
+    owns_session = session is None
+    if owns_session:
+        session = create_session()
     
     try:
         # 获取登录页面
         print_with_time("正在获取登录页面...", "INFO")
-        login_page_url = f"{BASE_URL}/auth/login"
-        
-        try:
-            response = session.get(login_page_url, timeout=8, verify=False)
-        except Exception as e:
-            print_with_time(f"获取登录页面失败: {str(e)}", "ERROR")
+        response = safe_request('GET', '/auth/login', session=session, phase='login_page')
+        if response is None:
+            print_with_time("获取登录页面失败", "ERROR")
             return None
         
         if response.status_code != 200:
             print_with_time(f"无法访问登录页面，状态码: {response.status_code}", "ERROR")
             return None
             
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
         # 查找 CSRF token
-        csrf_token = None
-        csrf_input = soup.find('input', {'name': '_token'})
-        if csrf_input:
-            csrf_token = csrf_input.get('value')
+        with METRICS.phase('html_scan'):
+            csrf_token = find_csrf_token(response.text)
+        if csrf_token:
             print_with_time("已获取CSRF令牌", "DEBUG")
         
         # 准备登录数据
@@ -288,31 +2484,30 @@ def login_and_get_cookie():
         
         # 发送登录请求
         print_with_time("正在发送登录请求...", "INFO")
-        login_url = f"{BASE_URL}/auth/login"
-        
         headers = {
-            'Origin': BASE_URL,
-            'Referer': f"{BASE_URL}/auth/login",
             'Content-Type': 'application/x-www-form-urlencoded'
         }
         
-        try:
-            response = session.post(login_url, data=login_data, headers=headers, timeout=8, verify=False, allow_redirects=False)
-        except Exception as e:
-            print_with_time(f"登录请求失败: {str(e)}", "ERROR")
+        response = safe_request('POST', '/auth/login', session=session, referer='/auth/login', phase='login_post',
+                                policy=LOGIN_RETRY_POLICY, data=login_data, headers=headers, allow_redirects=False)
+        if response is None:
+            print_with_time("登录请求失败", "ERROR")
             return None
         
-        print_with_time(f"登录响应状态码: {response.status_code}", "DEBUG")
-        print_with_time(f"登录响应URL: {response.url}", "DEBUG")
-        print_with_time(f"登录响应Content-Type: {response.headers.get('Content-Type', 'unknown')}", "DEBUG")
+        debug = LOGGER.enabled("DEBUG")
+        if debug:
+            print_with_time(f"登录响应状态码: {response.status_code}", "DEBUG")
+            print_with_time(f"登录响应URL: {response.url}", "DEBUG")
+            print_with_time(f"登录响应Content-Type: {response.headers.get('Content-Type', 'unknown')}", "DEBUG")
         
         # 获取所有Cookie（包括session中的）
         all_cookies = session.cookies
         cookie_string = '; '.join([f"{cookie.name}={cookie.value}" for cookie in all_cookies])
-        print_with_time(f"获取到的Cookie数量: {len(all_cookies)}", "DEBUG")
-        if len(all_cookies) > 0:
-            cookie_names = [cookie.name for cookie in all_cookies]
-            print_with_time(f"Cookie名称: {', '.join(cookie_names)}", "DEBUG")
+        if debug:
+            print_with_time(f"获取到的Cookie数量: {len(all_cookies)}", "DEBUG")
+            if len(all_cookies) > 0:
+                cookie_names = [cookie.name for cookie in all_cookies]
+                print_with_time(f"Cookie名称: {', '.join(cookie_names)}", "DEBUG")
         
         # 检查登录结果
         if response.status_code in [200, 302]:
@@ -327,7 +2522,8 @@ def login_and_get_cookie():
             # 尝试解析JSON响应
             try:
                 result = parse_json_response(response, "登录")
-                print_with_time(f"登录响应JSON: {result}", "DEBUG")
+                if debug:
+                    print_with_time(f"登录响应JSON: {result}", "DEBUG")
                 if result.get('ret') == 1:
                     print_with_time("登录成功！", "SUCCESS")
                     return cookie_string if cookie_string else None
@@ -355,38 +2551,44 @@ def login_and_get_cookie():
         raise
     except Exception as e:
         print_with_time(f"登录过程中发生错误: {str(e)}", "ERROR")
-        import traceback
-        print_with_time(f"错误详情: {traceback.format_exc()}", "DEBUG")
+        if LOGGER.enabled("DEBUG"):
+            import traceback
+            print_with_time(f"错误详情: {traceback.format_exc()}", "DEBUG")
         return None
     finally:
-        session.close()
+        if owns_session:
+            session.close()
 
-def checkin(cookie):
-    """执行签到操作"""
+def checkin(session):
+    """执行签到操作，使用会话中保存的登录Cookie"""
     print_with_time("开始执行签到...", "INFO")
     
     headers = {
-        'Origin': BASE_URL,
-        'Referer': f"{BASE_URL}/user",
-        'Cookie': cookie,
         'X-Requested-With': 'XMLHttpRequest',
         'Content-Type': 'application/x-www-form-urlencoded'
     }
-    url = f"{BASE_URL}/user/checkin"
     
     try:
         print_with_time("正在发送签到请求...", "DEBUG")
-        response = safe_request('POST', url, headers=headers)
+        response = safe_request('POST', '/user/checkin', session=session, referer='/user', phase='checkin',
+                                headers=headers, stream=True)
         
         if not response:
             print_with_time("签到请求失败", "ERROR")
+            if response is not None:
+                response.close()
             return False
         
         try:
-            data = parse_json_response(response, "签到")
+            data = parse_json_response(response, "签到", phase='checkin')
+        except requests.exceptions.RequestException as e:
+            # 读取响应体时连接中断或解压失败，不代表会话失效
+            print_with_time(f"读取签到响应失败: {str(e)}", "ERROR")
+            return False
         except Exception as e:
             print_with_time(f"无法解析签到响应: {str(e)}", "ERROR")
-            return False
+            # 非JSON响应（通常是被重定向到登录页）说明会话已失效
+            raise SessionExpiredError("签到响应不是JSON") from e
         
         if data.get('ret') == 1:
             print_with_time(f"签到成功: {data.get('msg', '获得奖励')}", "SUCCESS")
@@ -398,6 +2600,8 @@ def checkin(cookie):
             print_with_time(f"签到失败: {data.get('msg', '未知错误')}", "ERROR")
             return False
             
+    except SessionExpiredError:
+        raise
     except KeyboardInterrupt:
         print_with_time("用户中断签到操作", "WARNING")
         raise
@@ -405,197 +2609,1503 @@ def checkin(cookie):
         print_with_time(f"签到请求失败: {str(e)}", "ERROR")
         return False
 
+@dataclass(slots=True)
+class Quantity:
+    """带单位的数值，如 123.45 GB、¥ 12.80、2 / 5；text 保留页面上的原始文本"""
+    text: str
+    value: float | None = None
+    unit: str = ''
+    limit: float | None = None  # 形如 已用 / 上限 时的上限
+
+@dataclass(slots=True)
+class AccountInfo:
+    """从用户页面提取的账户信息"""
+    membership: Quantity | None = None      # 会员时长
+    traffic_left: Quantity | None = None    # 剩余流量
+    traffic_today: Quantity | None = None   # 今日已用流量
+    devices: Quantity | None = None         # 在线设备
+    balance: Quantity | None = None         # 钱包余额
+    rebate: Quantity | None = None          # 累计返利
+    others: dict = field(default_factory=dict)         # 其他卡片：标题 -> Quantity
+    loose_numbers: list = field(default_factory=list)  # 没有识别到卡片时从页面文本中找到的数值
+    order: list = field(default_factory=list)          # 卡片在页面中的顺序：字段名或其他卡片的标题
+    
+    def found(self):
+        """是否提取到了任何卡片信息"""
+        return bool(self.others) or any(getattr(self, f.name) is not None for f in ACCOUNT_INFO_FIELDS)
+    
+    def to_dict(self):
+        return asdict(self)
+    
+    @classmethod
+    def from_dict(cls, data):
+        """从 to_dict() 的结果还原"""
+        fields = {name: Quantity(**value) if isinstance(value, dict) else value
+                  for name, value in data.items() if name not in ('others', 'loose_numbers')}
+        return cls(**fields,
+                   others={title: Quantity(**value) for title, value in data.get('others', {}).items()},
+                   loose_numbers=[Quantity(**value) for value in data.get('loose_numbers', [])])
+
+@dataclass(frozen=True, slots=True)
+class InfoField:
+    """账户信息字段：卡片标题包含任一关键词时，卡片正文即为该字段的值"""
+    name: str
+    icon: str
+    label: str
+    keywords: tuple
+    extra: str | None = None    # 卡片副标题对应的附加字段
+    extra_icon: str = ''
+    extra_label: str = ''
+    extra_keywords: tuple = ()  # 副标题需包含其中一个关键词，为空时不限
+    extra_prefixes: tuple = ()  # 副标题中需要去掉的前缀
+
+# 账户信息字段表，按顺序匹配，标题同时命中多个字段时取靠前的
+ACCOUNT_INFO_FIELDS = (
+    InfoField('membership', '👑', '会员状态', ('会员时长', '时长', '到期')),
+    InfoField('traffic_left', '📊', '剩余流量', ('剩余流量', '流量', '可用'),
+              extra='traffic_today', extra_icon='📈', extra_label='今日使用',
+              extra_keywords=('今日', '已用', 'today'), extra_prefixes=('今日已用 :', '今日已用:')),
+    InfoField('devices', '📱', '在线设备', ('在线设备', '设备', '连接')),
+    InfoField('balance', '💰', '账户余额', ('钱包', '余额', '积分'),
+              extra='rebate', extra_icon='💎', extra_label='累计返利',
+              extra_prefixes=('累计获得返利金额:', '累计获得返利金额')),
+)
+
+# 所有字段关键词合并为一个正则，长关键词优先，一次扫描标题即可找到命中的字段
+_FIELD_BY_KEYWORD = {keyword: index for index, info_field in reversed(list(enumerate(ACCOUNT_INFO_FIELDS)))
+                     for keyword in info_field.keywords}
+_FIELD_KEYWORD_RE = re.compile('|'.join(map(re.escape, sorted(_FIELD_BY_KEYWORD, key=len, reverse=True))))
+_QUANTITY_RE = re.compile(r'([¥￥$])?\s*(-?\d+(?:,\d{3})*(?:\.\d+)?)\s*([A-Za-z]+|[^\s\d/.,:：-]+)?(?:\s*/\s*(\d+(?:\.\d+)?))?')
+_DATE_RE = re.compile(r'\d{4}[-/]\d{1,2}[-/]\d{1,2}')
+_LOOSE_NUMBER_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(GB|MB|天|个|USD|CNY)')
+_CARD_CLASSES = ('card-statistic-2', 'card-statistic', 'card')
+
+def parse_quantity(text):
+    """解析页面上的数值文本，取第一个数字及其单位（货币符号前缀也视为单位），日期不解析为数值"""
+    quantity = Quantity(text=text)
+    match = None if _DATE_RE.search(text) else _QUANTITY_RE.search(text)
+    if match:
+        currency, number, unit, limit = match.groups()
+        quantity.value = float(number.replace(',', ''))
+        quantity.unit = currency or unit or ''
+        quantity.limit = float(limit) if limit else None
+    return quantity
+
+def _match_field(title):
+    """返回标题命中的字段，未命中时返回 None"""
+    indexes = [_FIELD_BY_KEYWORD[keyword] for keyword in _FIELD_KEYWORD_RE.findall(title)]
+    return ACCOUNT_INFO_FIELDS[min(indexes)] if indexes else None
+
+def _scan_card(card):
+    """遍历一次卡片，按优先级取标题（h4 > h3 > h5）、正文和副标题元素"""
+    found = {}
+    for node in card.descendants:
+        name = getattr(node, 'name', None)
+        if name in ('h4', 'h3', 'h5'):
+            found.setdefault(name, node)
+        elif name == 'div':
+            for cls in node.get('class') or ():
+                if cls in ('card-body', 'card-content', 'card-stats-title', 'card-stats'):
+                    found.setdefault(cls, node)
+    header = found.get('h4') or found.get('h3') or found.get('h5')
+    body = found.get('card-body') or found.get('card-content')
+    stats = found.get('card-stats-title') or found.get('card-stats')
+    return header, body, stats
+
+def _clean_text(element):
+    return re.sub(r'\s+', ' ', element.get_text(strip=True))
+
 def extract_account_info(soup):
-    """从解析的HTML中提取账户信息"""
-    info_found = False
+    """从解析的HTML中提取账户信息，返回 AccountInfo"""
+    with METRICS.phase('extract_info'):
+        return _extract_account_info(soup)
+
+def _extract_account_info(soup):
+    info = AccountInfo()
     
-    # 查找统计卡片
-    stat_cards = soup.find_all('div', class_='card-statistic-2')
-    if not stat_cards:
-        stat_cards = soup.find_all('div', class_='card-statistic')
-    if not stat_cards:
-        stat_cards = soup.find_all('div', class_='card')
+    # 一次遍历收集统计卡片，按 card-statistic-2 > card-statistic > card 的优先级选用
+    buckets = {cls: [] for cls in _CARD_CLASSES}
+    for div in soup.find_all('div'):
+        classes = div.get('class') or ()
+        for cls in _CARD_CLASSES:
+            if cls in classes:
+                buckets[cls].append(div)
+    stat_cards = next((buckets[cls] for cls in _CARD_CLASSES if buckets[cls]), [])
     
     print_with_time(f"找到 {len(stat_cards)} 个信息卡片", "DEBUG")
     
-    for i, card in enumerate(stat_cards, 1):
-        # 尝试找到标题
-        header = card.find('h4') or card.find('h3') or card.find('h5')
+    for card in stat_cards:
+        header, body, stats = _scan_card(card)
+        if not header or not body:
+            continue
+        title = header.get_text(strip=True)
+        value_text = _clean_text(body).strip()
         
-        if header:
-            title = header.get_text(strip=True)
-            
-            # 获取主要数值
-            body = card.find('div', class_='card-body') or card.find('div', class_='card-content')
-            
-            if body:
-                value_text = re.sub(r'\s+', ' ', body.get_text(strip=True))
-                
-                # 根据标题分类显示信息
-                if any(keyword in title for keyword in ['会员时长', '时长', '到期']):
-                    # 清理会员状态显示
-                    clean_value = value_text.replace('天', '天').strip()
-                    print(f"👑 会员状态: {clean_value}")
-                    info_found = True
-                    
-                elif any(keyword in title for keyword in ['剩余流量', '流量', '可用']):
-                    # 清理流量显示
-                    clean_value = value_text.strip()
-                    print(f"📊 剩余流量: {clean_value}")
-                    info_found = True
-                    
-                    # 查找今日使用量并清理格式
-                    stats = card.find('div', class_='card-stats-title') or card.find('div', class_='card-stats')
-                    if stats:
-                        extra_info = re.sub(r'\s+', ' ', stats.get_text(strip=True))
-                        if any(keyword in extra_info for keyword in ['今日', '已用', 'today']):
-                            # 清理今日使用量格式，移除重复的冒号
-                            clean_extra = extra_info.replace('今日已用 :', '').replace('今日已用:', '').strip()
-                            if clean_extra:
-                                print(f"📈 今日使用: {clean_extra}")
-                                
-                elif any(keyword in title for keyword in ['在线设备', '设备', '连接']):
-                    # 清理设备数显示
-                    clean_value = value_text.strip()
-                    print(f"📱 在线设备: {clean_value}")
-                    info_found = True
-                    
-                elif any(keyword in title for keyword in ['钱包', '余额', '积分']):
-                    # 清理余额显示
-                    clean_value = value_text.strip()
-                    print(f"💰 账户余额: {clean_value}")
-                    info_found = True
-                    
-                    # 查找累计返利并清理格式
-                    stats = card.find('div', class_='card-stats-title') or card.find('div', class_='card-stats')
-                    if stats:
-                        extra_info = re.sub(r'\s+', ' ', stats.get_text(strip=True))
-                        if extra_info and extra_info != value_text:
-                            # 清理返利信息格式，移除重复的冒号和文字
-                            clean_extra = extra_info.replace('累计获得返利金额:', '').replace('累计获得返利金额', '').strip()
-                            if clean_extra and clean_extra != clean_value:
-                                print(f"💎 累计返利: {clean_extra}")
-                else:
-                    # 显示其他有效信息，清理格式
-                    if value_text and len(value_text) > 3 and not value_text.isspace():
-                        clean_title = title.replace(':', '').strip()
-                        clean_value = value_text.strip()
-                        print(f"📋 {clean_title}: {clean_value}")
-                        info_found = True
+        info_field = _match_field(title)
+        if info_field is None:
+            # 其他有效信息
+            if value_text and len(value_text) > 3:
+                title = title.replace(':', '').strip()
+                info.others[title] = parse_quantity(value_text)
+                if title not in info.order:
+                    info.order.append(title)
+            continue
+        
+        setattr(info, info_field.name, parse_quantity(value_text))
+        if info_field.name not in info.order:
+            info.order.append(info_field.name)
+        if not (info_field.extra and stats):
+            continue
+        extra_text = _clean_text(stats)
+        if info_field.extra_keywords and not any(keyword in extra_text for keyword in info_field.extra_keywords):
+            continue
+        if extra_text == value_text:
+            continue
+        for prefix in info_field.extra_prefixes:
+            extra_text = extra_text.replace(prefix, '')
+        extra_text = extra_text.strip()
+        if extra_text and extra_text != value_text:
+            setattr(info, info_field.extra, parse_quantity(extra_text))
+    
+    return info
+
+def find_loose_numbers(text, limit=5):
+    """从页面文本中查找带单位的数值，作为没有识别到卡片时的备用信息"""
+    unique = list(dict.fromkeys(_LOOSE_NUMBER_RE.findall(text)))[:limit]
+    return [Quantity(text=f"{value} {unit}", value=float(value), unit=unit) for value, unit in unique]
+
+def render_account_info(info):
+    """按卡片在页面中的顺序打印账户信息"""
+    fields = {info_field.name: info_field for info_field in ACCOUNT_INFO_FIELDS}
+    # 旧版本缓存的信息没有记录顺序，按字段表顺序打印，其他卡片放在最后
+    order = info.order or [*fields, *info.others]
+    for key in order:
+        info_field = fields.get(key)
+        if info_field is None:
+            if key in info.others:
+                print_line(f"📋 {key}: {info.others[key].text}")
+            continue
+        quantity = getattr(info, info_field.name)
+        if quantity is not None:
+            print_line(f"{info_field.icon} {info_field.label}: {quantity.text}")
+        extra = getattr(info, info_field.extra) if info_field.extra else None
+        if extra is not None:
+            print_line(f"{info_field.extra_icon} {info_field.extra_label}: {extra.text}")
+    
+    if info.found():
+        return
+    print_with_time("未能提取到详细账户信息", "WARNING")
+    if info.loose_numbers:
+        print_with_time("发现以下数值信息:", "INFO")
+        for quantity in info.loose_numbers:
+            print_line(f"📊 {quantity.text}")
+    else:
+        print_with_time("页面可能使用了高级反爬虫保护", "WARNING")
+
+def ledger_enabled():
+    """是否启用本地签到记录"""
+    return os.getenv('IKUUU_LEDGER', '1') not in ('0', 'false', 'no')
+
+class CheckinLedger:
+    """本地签到记录：各账号最近一次成功签到的服务器日期，以及账户信息页的缓存和条件请求校验值"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.records = {}  # 账号标识 -> {'checkin_day', 'info', 'info_fetched', 'etag', 'last_modified'}
+        self.lock = threading.Lock()
+        self.dirty = False
+    
+    @classmethod
+    def load(cls, path=None):
+        ledger = cls(path or os.path.join(get_cache_dir(), 'ledger.json'))
+        try:
+            with open(ledger.path, encoding='utf-8') as f:
+                ledger.records = json.load(f).get('accounts', {})
+        except (OSError, ValueError):
+            pass
+        return ledger
+    
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            data = json.dumps({'accounts': self.records}, ensure_ascii=False).encode('utf-8')
+            self.dirty = False
+        try:
+            write_file_atomic(self.path, data)
+        except OSError as e:
+            print_with_time(f"保存签到记录失败: {str(e)}", "WARNING")
+    
+    def checked_in(self, key, day):
+        """账号在该服务器日是否已成功签到"""
+        with self.lock:
+            return self.records.get(key, {}).get('checkin_day') == day
+    
+    def record_checkin(self, key, day):
+        with self.lock:
+            self.records.setdefault(key, {})['checkin_day'] = day
+            self.dirty = True
+    
+    def cached_info(self, key):
+        """缓存的账户信息和校验值，没有缓存时返回 None"""
+        with self.lock:
+            record = self.records.get(key, {})
+            if not record.get('info'):
+                return None
+            return {
+                'info': AccountInfo.from_dict(record['info']),
+                'fetched': record.get('info_fetched', 0),
+                'etag': record.get('etag'),
+                'last_modified': record.get('last_modified'),
+            }
+    
+    def export(self, keys):
+        """指定账号的记录副本，用于从工作进程传回主进程"""
+        with self.lock:
+            return {key: dict(self.records[key]) for key in keys if key in self.records}
+    
+    def merge(self, records):
+        """合并工作进程传回的记录"""
+        if not records:
+            return
+        with self.lock:
+            self.records.update(records)
+            self.dirty = True
     
-    return info_found
+    def record_info(self, key, info, etag=None, last_modified=None):
+        """保存账户信息；info 为 None 时只刷新获取时间（服务器返回 304）"""
+        with self.lock:
+            record = self.records.setdefault(key, {})
+            if info is not None:
+                record.update(info=info.to_dict(), etag=etag, last_modified=last_modified)
+            record['info_fetched'] = time.time()
+            self.dirty = True
 
-def get_user_info(cookie):
-    """获取用户信息和流量数据"""
+_ledger = None
+_ledger_lock = threading.Lock()
+
+def get_ledger():
+    """获取全局签到记录，未启用时返回 None"""
+    global _ledger
+    if not ledger_enabled():
+        return None
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = CheckinLedger.load()
+        return _ledger
+
+def save_ledger():
+    """保存签到记录"""
+    if _ledger is not None:
+        _ledger.save()
+
+def get_user_info(session, key=None, max_age=0):
+    """获取用户信息和流量数据，使用会话中保存的登录Cookie；返回 AccountInfo，失败时返回 None
+    
+    传入账号标识时使用本地缓存：缓存未超过 max_age 秒时直接使用，否则带上 ETag/Last-Modified 发送条件请求
+    """
     print_separator("─", 50)
     print_with_time("正在获取账户信息...", "INFO")
     
-    headers = {
-        'Cookie': cookie
-    }
-    url = f"{BASE_URL}/user"
-    
     try:
-        response = safe_request('GET', url, headers=headers)
+        ledger = get_ledger() if key else None
+        cached = ledger.cached_info(key) if ledger else None
+        if cached and max_age and time.time() - cached['fetched'] < max_age:
+            print_with_time("账户信息在有效期内，使用本地缓存", "INFO")
+            render_account_info(cached['info'])
+            print_separator("─", 50)
+            return cached['info']
+        
+        headers = {}
+        if cached and cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        if cached and cached['last_modified']:
+            headers['If-Modified-Since'] = cached['last_modified']
+        requested = time.monotonic()
+        response = safe_request('GET', '/user', session=session, phase='user_page', headers=headers, stream=True)
         
         if not response:
             print_with_time("获取账户信息失败", "ERROR")
-            return False
-            
-        soup = BeautifulSoup(response.text, 'html.parser')
+            if response is not None:
+                response.close()
+            return None
+        
+        if response.status_code == 304 and cached:
+            response.close()
+            print_with_time("账户信息未变化，使用本地缓存", "INFO")
+            ledger.record_info(key, None)
+            render_account_info(cached['info'])
+            print_separator("─", 50)
+            return cached['info']
+        
+        # 边读边查找 originBody，读到后不再读取页面其余部分；soup 模式读取完整页面，与旧版本一致
+        soup_mode = get_html_parser_mode() == 'soup'
+        reader = UserPageReader(USER_PAGE_MAX_BYTES if soup_mode else USER_PAGE_RETAIN_BYTES, early_stop=not soup_mode)
+        stream_body(response, reader.feed, USER_PAGE_MAX_BYTES, 'user_page')
+        html_text = reader.text(response.encoding)
         
         # 检查页面标题确认登录状态
-        page_title = soup.find('title')
-        if page_title:
-            title_text = page_title.get_text(strip=True)
+        with METRICS.phase('html_scan'):
+            title_text = find_page_title(html_text)
+        if title_text:
             if any(keyword in title_text.lower() for keyword in ['login', '登录']):
+                # 已登录却返回登录页也可能是反爬虫拦截，按过载信号降低并发
+                CONCURRENCY_LIMITER.overload('anti_bot', requested)
                 print_with_time("登录状态已失效，请检查账户信息", "ERROR")
-                return False
+                raise SessionExpiredError("用户页面返回了登录页")
         
         # 检查是否有Base64编码的内容
-        scripts = soup.find_all('script')
         decoded_html = None
-        
-        for script in scripts:
-            script_content = script.get_text()
-            if 'originBody' in script_content and 'decodeBase64' in script_content:
-                # 提取Base64编码的内容
-                match = re.search(r'var originBody = "([^"]+)"', script_content)
-                if match:
-                    encoded_content = match.group(1)
-                    decoded_html = decode_base64_safe(encoded_content)
-                    break
-        
-        info_extracted = False
+        with METRICS.phase('html_scan'):
+            encoded_content = None if soup_mode else reader.encoded_content()
+            encoded_content = encoded_content or find_origin_body(html_text)
+        if encoded_content:
+            decoded_html = decode_base64_safe(encoded_content)
         
         if decoded_html:
             # 解析解码后的HTML
             print_with_time("正在解析解码后的页面内容...", "DEBUG")
-            decoded_soup = BeautifulSoup(decoded_html, 'html.parser')
-            info_extracted = extract_account_info(decoded_soup)
+            info = extract_account_info(parse_html(decoded_html))
         else:
             # 尝试直接解析原始页面
             print_with_time("尝试直接解析页面内容...", "DEBUG")
-            info_extracted = extract_account_info(soup)
+            soup = parse_html(html_text)
+            info = extract_account_info(soup)
         
-        if not info_extracted:
-            print_with_time("未能提取到详细账户信息", "WARNING")
+        if not info.found():
             # 尝试查找页面中的数值信息作为备用
-            all_text = soup.get_text() if not decoded_html else decoded_html
-            numbers = re.findall(r'(\d+(?:\.\d+)?)\s*(GB|MB|天|个|USD|CNY)', all_text)
-            if numbers:
-                print_with_time("发现以下数值信息:", "INFO")
-                unique_numbers = list(set(numbers))[:5]  # 去重并限制数量
-                for value, unit in unique_numbers:
-                    print(f"📊 {value} {unit}")
-            else:
-                print_with_time("页面可能使用了高级反爬虫保护", "WARNING")
+            info.loose_numbers = find_loose_numbers(soup.get_text() if not decoded_html else decoded_html)
+        render_account_info(info)
+        if ledger and info.found():
+            ledger.record_info(key, info, response.headers.get('ETag'), response.headers.get('Last-Modified'))
         
         print_separator("─", 50)
-        return True
+        return info
         
+    except SessionExpiredError:
+        raise
     except KeyboardInterrupt:
         print_with_time("用户中断信息获取操作", "WARNING")
         raise
     except Exception as e:
         print_with_time(f"获取用户信息失败: {str(e)}", "ERROR")
+        return None
+
+def parse_accounts(text):
+    """解析账号列表文本，每行一个 邮箱:密码，# 开头为注释"""
+    accounts = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if ':' not in line:
+            print_with_time(f"忽略格式错误的账号行: {line[:3]}***", "WARNING")
+            continue
+        # 邮箱中不含冒号，按第一个冒号切分，密码中允许出现冒号
+        email, password = line.split(':', 1)
+        accounts.append((email.strip(), password))
+    return accounts
+
+def load_accounts():
+    """按优先级加载账号列表：账号文件 + IKUUU_ACCOUNTS > 单账号配置"""
+    accounts = []
+    
+    accounts_file = os.getenv('IKUUU_ACCOUNTS_FILE') or LOCAL_ACCOUNTS_FILE
+    if accounts_file:
+        try:
+            with open(accounts_file, encoding='utf-8') as f:
+                accounts.extend(parse_accounts(f.read()))
+        except OSError as e:
+            print_with_time(f"无法读取账号文件 {accounts_file}: {str(e)}", "ERROR")
+    
+    if os.getenv('IKUUU_ACCOUNTS'):
+        accounts.extend(parse_accounts(os.getenv('IKUUU_ACCOUNTS')))
+    
+    # 未配置多账号时回退到单账号配置：环境变量 > 本地变量
+    if not accounts:
+        email = os.getenv('IKUUU_EMAIL') or LOCAL_EMAIL
+        password = os.getenv('IKUUU_PASSWORD') or LOCAL_PASSWORD
+        if email and password:
+            accounts.append((email, password))
+    
+    # 按邮箱去重，保持配置顺序
+    seen = set()
+    unique_accounts = []
+    for email, password in accounts:
+        if email.lower() in seen:
+            continue
+        seen.add(email.lower())
+        unique_accounts.append((email, password))
+    return unique_accounts
+
+def get_concurrency(account_count):
+    """获取并发数：环境变量 IKUUU_CONCURRENCY > 默认值，且不超过账号数；auto 时为自适应并发的上限"""
+    try:
+        if adaptive_concurrency_enabled():
+            concurrency = ADAPTIVE_MAX_CONCURRENCY
+        else:
+            concurrency = int(os.getenv('IKUUU_CONCURRENCY') or DEFAULT_CONCURRENCY)
+    except ValueError:
+        print_with_time("IKUUU_CONCURRENCY 不是有效的整数，使用默认值", "WARNING")
+        concurrency = DEFAULT_CONCURRENCY
+    return max(1, min(concurrency, account_count))
+
+def run_account(email, password, tag=None, session=None, force=False, checkin_at=None, on_checkin=None):
+    """执行单个账号的 登录 → 签到 → 获取信息 流程，返回结果字典；传入常驻会话时复用其中的登录Cookie
+    
+    本地记录显示今天已签到时跳过整个流程，force 为 True 时仍然执行；
+    checkin_at 为计划的签到时刻（本机时间戳），登录后等到该时刻再签到，"今天"按签到时刻所在的服务器日期计算；
+    on_checkin(email) 在签到成功后、获取账户信息前调用（在工作线程中），供常驻模式立即持久化状态
+    """
+    _log_context.tag = tag
+    start_deadline()
+    start_time = time.time()
+    result = {
+        'account': mask_email(email),
+        'key': account_key(email),
+        'login': False,
+        'checkin': False,
+        'info': False,
+        'account_info': None,
+        'skipped': False,
+        'elapsed': 0.0,
+    }
+    
+    # 每个账号独立的会话（Cookie），连接来自共享连接池
+    session = session or create_session()
+    saved_cookies = None
+    ledger = get_ledger()
+    day = server_day(None if checkin_at is None else checkin_at + SERVER_CLOCK.offset())
+    already_done = ledger is not None and ledger.checked_in(result['key'], day)
+    
+    try:
+        if already_done and not force:
+            print_with_time("今日已签到（本地记录），跳过登录、签到和信息获取", "SUCCESS")
+            result.update(login=True, checkin=True, info=True, skipped=True)
+            return result
+        
+        # 优先使用缓存的登录状态，会话失效时重新登录一次
+        for attempt in range(2):
+            login_domain = get_domain_pool().current()
+            from_cache = attempt == 0 and (len(session.cookies) > 0 or load_session_cookie(email, password, session))
+            if from_cache:
+                print_with_time("使用缓存的登录状态，跳过登录", "INFO")
+                saved_cookies = cookie_fingerprint(session.cookies)
+            else:
+                # 登录获取 Cookie
+                session.cookies.clear()
+                with METRICS.phase('step_login'):
+                    logged_in = login_and_get_cookie(email, password, session)
+                if not logged_in:
+                    print_with_time("无法获取有效登录状态", "ERROR")
+                    return result
+                save_session_cookies(email, password, session.cookies)
+                saved_cookies = cookie_fingerprint(session.cookies)
+            result['login'] = True
+            if checkin_at is not None and attempt == 0:
+                wait_for_checkin(checkin_at)
+            
+            try:
+                # 执行签到（请求频率由按域名共享的令牌桶控制，步骤之间无需等待）
+                with METRICS.phase('step_checkin'):
+                    result['checkin'] = checkin(session)
+                if result['checkin'] and ledger is not None:
+                    ledger.record_checkin(result['key'], day)
+                if result['checkin'] and on_checkin is not None:
+                    on_checkin(email)
+                
+                # 获取用户信息；今天已经签到过（强制重跑）时账户信息不会变化，可以使用有效期内的缓存
+                with METRICS.phase('step_user_info'):
+                    account_info = get_user_info(session, result['key'], INFO_CACHE_TTL if already_done else 0)
+                result['info'] = account_info is not None
+                result['account_info'] = account_info
+                
+                # 服务器通过 Set-Cookie 刷新了会话时更新缓存
+                if cookie_fingerprint(session.cookies) != saved_cookies:
+                    save_session_cookies(email, password, session.cookies)
+                return result
+            except SessionExpiredError:
+                # 域名已切换时Cookie不适用于新域名，同样需要重新登录
+                domain_switched = get_domain_pool().current() != login_domain
+                if not domain_switched:
+                    invalidate_session_cookie(email)
+                saved_cookies = None
+                if not (from_cache or domain_switched):
+                    return result
+                print_with_time("登录状态已失效，重新登录", "WARNING")
+        return result
+    except Exception as e:
+        # 单个账号的异常不影响其他账号
+        print_with_time(f"账号处理异常: {str(e)}", "ERROR")
+        return result
+    finally:
+        result['elapsed'] = round(time.time() - start_time, 2)
+        METRICS.observe('account', time.time() - start_time)
+        clear_deadline()
+        _log_context.tag = None
+
+def run_accounts(accounts, concurrency, sessions=None, force=False, checkin_times=None, on_checkin=None):
+    """以有限并发执行多个账号，按配置顺序返回每个账号的结果；sessions 为 邮箱 -> 常驻会话，
+    checkin_times 为各账号计划的签到时刻（见 plan_reset_checkins），on_checkin 见 run_account"""
+    sessions = sessions or {}
+    checkin_times = checkin_times or [None] * len(accounts)
+    results = [None] * len(accounts)
+    # 按计划签到时刻提交，先到时刻的账号先占用线程
+    order = sorted(range(len(accounts)), key=lambda index: checkin_times[index] or 0)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='ikuuu') as executor:
+        futures = {
+            executor.submit(run_account, *accounts[index], mask_email(accounts[index][0]),
+                            sessions.get(accounts[index][0]), force, checkin_times[index], on_checkin): index
+            for index in order
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
+
+def print_summary(results, elapsed_time, limits=None):
+    """打印多账号执行汇总；limits 为 CONCURRENCY_LIMITER.snapshot()，记录本次运行的并发上限"""
+    print_separator("=", 60)
+    print_with_time("📋 多账号执行汇总", "INFO")
+    for result in results:
+        if result['checkin'] and result['info']:
+            status = "✅"
+        elif result['checkin']:
+            status = "⚠️"
+        else:
+            status = "❌"
+        if result.get('skipped'):
+            print_line(f"   {status} {result['account']}  今日已签到，已跳过")
+            continue
+        print_line(f"   {status} {result['account']}  登录:{'✓' if result['login'] else '✗'}  "
+              f"签到:{'✓' if result['checkin'] else '✗'}  信息:{'✓' if result['info'] else '✗'}  "
+              f"耗时 {result['elapsed']} 秒")
+    if limits:
+        print_line(f"   并发上限 {limits['limit']}（运行中最低 {limits['lowest']}、最高 {limits['highest']}，"
+                   f"因过载降低 {limits['decreases']} 次）")
+    succeeded = sum(1 for result in results if result['checkin'])
+    print_with_time(f"签到成功 {succeeded}/{len(results)} 个账号，总耗时 {elapsed_time} 秒",
+                    "SUCCESS" if succeeded == len(results) else "WARNING")
+
+# 服务器按北京时间（UTC+8）划分签到日
+SERVER_UTC_OFFSET = 8 * 3600
+
+def server_day(timestamp=None):
+    """时间戳对应的服务器日期（YYYY-MM-DD），默认为按服务器时钟的当前日期"""
+    timestamp = SERVER_CLOCK.now() if timestamp is None else timestamp
+    return time.strftime('%Y-%m-%d', time.gmtime(timestamp + SERVER_UTC_OFFSET))
+
+def account_key(email):
+    """账号的稳定标识：邮箱的哈希，历史记录中不保存邮箱原文"""
+    return hashlib.sha256(email.strip().lower().encode('utf-8')).hexdigest()[:16]
+
+def history_enabled():
+    """是否记录运行历史"""
+    return os.getenv('IKUUU_HISTORY', '1') not in ('0', 'false', 'no')
+
+def get_history_path():
+    """历史数据库路径：环境变量 > 本地变量 > 缓存目录下的 history.sqlite3"""
+    return os.getenv('IKUUU_HISTORY_DB') or LOCAL_HISTORY_DB or os.path.join(get_cache_dir(), 'history.sqlite3')
+
+# 流量单位换算为 GB
+_TRAFFIC_UNITS = {'KB': 1 / 1024 ** 2, 'K': 1 / 1024 ** 2, 'MB': 1 / 1024, 'M': 1 / 1024,
+                  'GB': 1, 'G': 1, 'TB': 1024, 'T': 1024}
+
+def _traffic_gb(quantity):
+    if quantity is None or quantity.value is None:
+        return None
+    factor = _TRAFFIC_UNITS.get(quantity.unit.upper())
+    return round(quantity.value * factor, 4) if factor else None
+
+def _quantity_value(quantity, units=None):
+    if quantity is None or quantity.value is None:
+        return None
+    if units is not None and quantity.unit not in units:
+        return None
+    return quantity.value
+
+class HistoryStore:
+    """运行历史：每个账号每次运行一行，只追加；SQLite WAL 模式，按账号和日期建索引"""
+    
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS accounts (
+        id INTEGER PRIMARY KEY,
+        key TEXT NOT NULL UNIQUE,
+        label TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS runs (
+        id INTEGER PRIMARY KEY,
+        account_id INTEGER NOT NULL,
+        day INTEGER NOT NULL,
+        ts INTEGER NOT NULL,
+        login INTEGER NOT NULL,
+        checkin INTEGER NOT NULL,
+        info INTEGER NOT NULL,
+        elapsed REAL,
+        membership_days REAL,
+        traffic_left_gb REAL,
+        traffic_today_gb REAL,
+        devices INTEGER,
+        device_limit INTEGER,
+        balance REAL,
+        rebate REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_runs_account_day ON runs (account_id, day);
+    CREATE INDEX IF NOT EXISTS idx_runs_day ON runs (day);
+    """
+    
+    def __init__(self, path):
+        import sqlite3
+        self.connection = sqlite3.connect(path, timeout=10)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(self.SCHEMA)
+        self.account_ids = {}
+    
+    def close(self):
+        self.connection.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    @staticmethod
+    def _day_number(day):
+        """日期字符串转为 YYYYMMDD 整数，存储更紧凑且可直接比较"""
+        return int(day.replace('-', ''))
+    
+    @staticmethod
+    def _day_text(number):
+        return f"{number // 10000:04d}-{number // 100 % 100:02d}-{number % 100:02d}"
+    
+    def _account_id(self, key, label):
+        account_id = self.account_ids.get(key)
+        if account_id is None:
+            self.connection.execute('INSERT OR IGNORE INTO accounts (key, label) VALUES (?, ?)', (key, label))
+            account_id = self.connection.execute('SELECT id FROM accounts WHERE key = ?', (key,)).fetchone()[0]
+            self.account_ids[key] = account_id
+        return account_id
+    
+    def append(self, results, timestamp=None):
+        """在一个事务中追加一批账号结果"""
+        timestamp = int(time.time() if timestamp is None else timestamp)
+        day = self._day_number(server_day(timestamp))
+        with self.connection:
+            rows = []
+            for result in results:
+                info = result.get('account_info')
+                devices = info.devices if info else None
+                rows.append((
+                    self._account_id(result['key'], result['account']), day, timestamp,
+                    int(result['login']), int(result['checkin']), int(result['info']), result['elapsed'],
+                    _quantity_value(info.membership, ('天',)) if info else None,
+                    _traffic_gb(info.traffic_left) if info else None,
+                    _traffic_gb(info.traffic_today) if info else None,
+                    int(devices.value) if devices and devices.value is not None else None,
+                    int(devices.limit) if devices and devices.limit is not None else None,
+                    _quantity_value(info.balance) if info else None,
+                    _quantity_value(info.rebate) if info else None,
+                ))
+            self.connection.executemany(
+                'INSERT INTO runs (account_id, day, ts, login, checkin, info, elapsed, membership_days, '
+                'traffic_left_gb, traffic_today_gb, devices, device_limit, balance, rebate) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        return len(rows)
+    
+    def _rows(self, cursor):
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor]
+        for row in rows:
+            for column in ('day', 'last_day'):
+                if column in row:
+                    row[column] = self._day_text(row[column])
+        return rows
+    
+    def series(self, key, days=30):
+        """单个账号最近 days 天的每日记录（每天取最后一次运行，签到状态取当天任意一次成功）"""
+        since = self._day_number(server_day(time.time() - days * 86400))
+        cursor = self.connection.execute(
+            """
+            SELECT r.day, a.label, d.checkin, r.traffic_left_gb, r.traffic_today_gb, r.membership_days,
+                   r.devices, r.device_limit, r.balance, r.rebate
+            FROM (SELECT day, MAX(id) AS last_id, MAX(checkin) AS checkin FROM runs
+                  WHERE account_id = (SELECT id FROM accounts WHERE key = ?) AND day >= ?
+                  GROUP BY day) d
+            JOIN runs r ON r.id = d.last_id
+            JOIN accounts a ON a.id = r.account_id
+            ORDER BY r.day
+            """, (key, since))
+        return self._rows(cursor)
+    
+    def summary(self, days=7):
+        """所有账号的概况：最近一次的流量与余额、最近 days 天的签到成功天数和日均用量，以及流量预计用尽的天数"""
+        since = self._day_number(server_day(time.time() - days * 86400))
+        cursor = self.connection.execute(
+            """
+            WITH recent AS (
+                SELECT account_id, MAX(id) AS last_id, COUNT(DISTINCT day) AS days,
+                       COUNT(DISTINCT CASE WHEN checkin THEN day END) AS checkin_days,
+                       AVG(traffic_today_gb) AS avg_today_gb
+                FROM runs WHERE day >= ? GROUP BY account_id
+            )
+            SELECT a.key AS account, a.label, r.day AS last_day, recent.days, recent.checkin_days,
+                   r.traffic_left_gb, recent.avg_today_gb, r.membership_days, r.balance
+            FROM recent
+            JOIN runs r ON r.id = recent.last_id
+            JOIN accounts a ON a.id = recent.account_id
+            ORDER BY a.label
+            """, (since,))
+        accounts = self._rows(cursor)
+        for record in accounts:
+            left, usage = record['traffic_left_gb'], record['avg_today_gb']
+            record['days_until_empty'] = round(left / usage, 1) if left is not None and usage else None
+        return accounts
+
+def record_history(results):
+    """把本次运行的结果追加到历史数据库，失败时只提示不影响签到结果"""
+    results = [result for result in results if not result.get('skipped')]
+    if not history_enabled() or not results:
+        return
+    try:
+        with HistoryStore(get_history_path()) as store:
+            store.append(results)
+    except Exception as e:
+        print_with_time(f"保存运行历史失败: {str(e)}", "WARNING")
+
+class Notifier:
+    """Webhook 通知：后台线程从有界队列取出消息发送，失败时指数退避重试，退出前等待队列发送完成"""
+    
+    def __init__(self, url, queue_size=NOTIFY_QUEUE_SIZE):
+        self.url = url
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.lock = threading.Lock()
+    
+    def submit(self, payload):
+        """加入发送队列，不等待发送；队列已满时丢弃并返回 False"""
+        try:
+            self.queue.put_nowait(payload)
+        except queue.Full:
+            METRICS.incr('notify_dropped_total')
+            print_with_time("通知队列已满，丢弃本次通知", "WARNING")
+            return False
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='notifier', daemon=True)
+                self.thread.start()
+        return True
+    
+    def _run(self):
+        # 独立的会话：共享连接池在签到结束后就会关闭，且通知不应受站点的限速和熔断影响
+        session = requests.Session()
+        try:
+            while True:
+                payload = self.queue.get()
+                try:
+                    if payload is None:
+                        return
+                    self._deliver(session, payload)
+                finally:
+                    self.queue.task_done()
+        finally:
+            session.close()
+    
+    def _deliver(self, session, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        error = None
+        for attempt in range(1, NOTIFY_MAX_ATTEMPTS + 1):
+            try:
+                response = session.post(self.url, data=body, timeout=NOTIFY_TIMEOUT,
+                                        headers={'Content-Type': 'application/json; charset=utf-8'})
+                response.close()
+                if response.status_code < 300:
+                    METRICS.incr('notify_sent_total')
+                    print_with_time(f"通知已发送（第 {attempt} 次尝试）", "DEBUG")
+                    return True
+                error = f"HTTP {response.status_code}"
+                # 除限流外的 4xx 重试也不会成功
+                if 400 <= response.status_code < 500 and response.status_code != 429:
+                    break
+            except requests.exceptions.RequestException as e:
+                error = str(e)
+            if attempt < NOTIFY_MAX_ATTEMPTS:
+                time.sleep(min(RETRY_BASE_DELAY * 2 ** attempt, RETRY_MAX_DELAY))
+        METRICS.incr('notify_failed_total')
+        print_with_time(f"通知发送失败: {error}", "WARNING")
         return False
+    
+    def close(self, timeout=NOTIFY_FLUSH_TIMEOUT):
+        """等待队列中的消息发送完成后停止后台线程，返回是否全部处理完"""
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is None:
+            return True
+        deadline = time.monotonic() + timeout
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        thread.join(max(0.0, deadline - time.monotonic()))
+        if thread.is_alive():
+            print_with_time(f"通知未能在 {timeout} 秒内发送完成，放弃剩余消息", "WARNING")
+            return False
+        return True
+
+_notifier = None
+
+def get_notifier():
+    """获取 Webhook 通知器：环境变量 IKUUU_WEBHOOK_URL > 本地变量，未配置时返回 None"""
+    global _notifier
+    if _notifier is None:
+        url = os.getenv('IKUUU_WEBHOOK_URL') or LOCAL_WEBHOOK_URL
+        if not url:
+            return None
+        _notifier = Notifier(url)
+        # 在 LOGGER.flush 之前执行（atexit 后注册先执行），发送结果的日志也能写出
+        atexit.register(_notifier.close)
+    return _notifier
+
+def build_digest(results, elapsed_time):
+    """把各账号的结果汇总为一条通知消息，text 为可直接展示的文本"""
+    accounts = []
+    lines = []
+    for result in results:
+        info = result.get('account_info')
+        entry = {key: result.get(key) for key in ('account', 'login', 'checkin', 'info', 'skipped', 'elapsed')}
+        if info is not None:
+            entry.update({
+                'traffic_left_gb': _traffic_gb(info.traffic_left),
+                'traffic_today_gb': _traffic_gb(info.traffic_today),
+                'balance': _quantity_value(info.balance),
+                'membership_days': _quantity_value(info.membership, ('天',)),
+            })
+        accounts.append(entry)
+        
+        status = "✅" if result['checkin'] and result['info'] else "⚠️" if result['checkin'] else "❌"
+        if result.get('skipped'):
+            details = "今日已签到，已跳过"
+        elif info is not None:
+            details = "  ".join(f"{label} {quantity.text}" for label, quantity in
+                                (("剩余", info.traffic_left), ("今日", info.traffic_today), ("余额", info.balance))
+                                if quantity is not None) or "未能提取账户信息"
+        else:
+            details = "签到成功，账户信息获取失败" if result['checkin'] else "签到失败"
+        lines.append(f"{status} {result['account']}  {details}")
+    
+    succeeded = sum(1 for result in results if result['checkin'])
+    # 标题使用本次运行实际使用的域名，只取主机名部分
+    domain = get_domain_pool().current()
+    host = urlsplit(domain_to_url(domain)).hostname or domain
+    title = f"{host.upper()} 签到 {succeeded}/{len(results)} 成功"
+    return {
+        'title': title,
+        'day': server_day(),
+        'succeeded': succeeded,
+        'total': len(results),
+        'elapsed': elapsed_time,
+        'accounts': accounts,
+        'text': '\n'.join([f"{title}（{server_day()}，耗时 {elapsed_time} 秒）"] + lines),
+    }
+
+def notify_results(results, elapsed_time):
+    """配置了 Webhook 时把本次运行的汇总交给后台线程发送"""
+    notifier = get_notifier()
+    if notifier is not None and results:
+        notifier.submit(build_digest(results, elapsed_time))
+
+def _format_number(value, digits=2):
+    return '-' if value is None else f"{value:.{digits}f}"
+
+def history_main(args):
+    """history 子命令：查询单个账号的时间序列或所有账号的概况"""
+    path = get_history_path()
+    if not os.path.exists(path):
+        print(f"没有历史记录: {path}")
+        return 1
+    start = time.perf_counter()
+    with HistoryStore(path) as store:
+        if args.account:
+            rows = store.series(account_key(args.account), args.days)
+        else:
+            rows = store.summary(args.days)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return 0
+    if args.account:
+        print(f"{mask_email(args.account)} 最近 {args.days} 天（{len(rows)} 条）")
+        print(f"{'日期':<12}{'签到':>6}{'剩余GB':>12}{'今日GB':>10}{'会员天数':>10}{'设备':>8}{'余额':>10}")
+        for row in rows:
+            devices = '-' if row['devices'] is None else f"{row['devices']}/{row['device_limit'] or '-'}"
+            print(f"{row['day']:<12}{'✓' if row['checkin'] else '✗':>6}{_format_number(row['traffic_left_gb']):>12}"
+                  f"{_format_number(row['traffic_today_gb']):>10}{_format_number(row['membership_days'], 0):>10}"
+                  f"{devices:>8}{_format_number(row['balance']):>10}")
+    else:
+        print(f"共 {len(rows)} 个账号，统计最近 {args.days} 天")
+        print(f"{'账号':<24}{'最近运行':<12}{'签到天数':>10}{'剩余GB':>12}{'日均GB':>10}{'预计用尽(天)':>14}")
+        for row in rows:
+            label = f"{row['label']}#{row['account'][:4]}"
+            print(f"{label:<24}{row['last_day']:<12}{row['checkin_days']:>5}/{row['days']:<4}"
+                  f"{_format_number(row['traffic_left_gb']):>12}{_format_number(row['avg_today_gb']):>10}"
+                  f"{_format_number(row['days_until_empty'], 1):>14}")
+    print(f"查询耗时 {elapsed_ms:.1f} ms")
+    return 0
+
+def server_clock(timestamp, fmt='%H:%M'):
+    """时间戳对应的服务器时间（默认 HH:MM）"""
+    return time.strftime(fmt, time.gmtime(timestamp + SERVER_UTC_OFFSET))
+
+def server_day_start(day):
+    """服务器日期当天 00:00 对应的时间戳"""
+    return calendar.timegm(time.strptime(day, '%Y-%m-%d')) - SERVER_UTC_OFFSET
+
+def get_daemon_schedule():
+    """获取常驻模式的每日开始时间（距服务器当天 00:00 的秒数）和随机分散窗口（秒）"""
+    run_at = os.getenv('IKUUU_DAEMON_RUN_AT') or DAEMON_RUN_AT
+    try:
+        hour, minute = (int(part) for part in run_at.split(':'))
+        offset = hour * 3600 + minute * 60
+    except ValueError:
+        print_with_time("IKUUU_DAEMON_RUN_AT 格式应为 HH:MM，使用默认值", "WARNING")
+        hour, minute = (int(part) for part in DAEMON_RUN_AT.split(':'))
+        offset = hour * 3600 + minute * 60
+    try:
+        window = float(os.getenv('IKUUU_DAEMON_WINDOW') or DAEMON_WINDOW) * 60
+    except ValueError:
+        print_with_time("IKUUU_DAEMON_WINDOW 不是有效的数字，使用默认值", "WARNING")
+        window = DAEMON_WINDOW * 60
+    return offset, max(0.0, window)
+
+def get_reset_window():
+    """获取日切签到的分散窗口（秒）：环境变量 IKUUU_RESET_WINDOW（分钟）> 默认值"""
+    try:
+        window = float(os.getenv('IKUUU_RESET_WINDOW') or RESET_WINDOW) * 60
+    except ValueError:
+        print_with_time("IKUUU_RESET_WINDOW 不是有效的数字，使用默认值", "WARNING")
+        window = RESET_WINDOW * 60
+    return max(0.0, window)
+
+def sync_server_clock():
+    """发送几个轻量请求，用响应的 Date 头估算服务器时钟偏差"""
+    for _ in range(CLOCK_SYNC_SAMPLES):
+        response = safe_request('HEAD', '/auth/login', phase='clock_sync', allow_redirects=False)
+        if response is not None:
+            response.close()
+    uncertainty = SERVER_CLOCK.uncertainty()
+    if uncertainty is None:
+        print_with_time("无法从响应获取服务器时间，按本机时钟计算", "WARNING")
+    else:
+        print_with_time(f"服务器时钟偏差 {SERVER_CLOCK.offset():+.1f} 秒（±{uncertainty:.1f}）", "INFO")
+
+def plan_reset_checkins(count):
+    """为 count 个账号计划日切后的签到时刻，返回本机时间戳列表；距离日切太远时返回 None（立即签到）
+    
+    签到时刻在服务器日切后 RESET_DELAY 秒起的窗口内均匀分散并打乱顺序，避免所有账号同时请求；
+    已过日切但仍在窗口内时（如定时任务启动延迟）从现在起分散到窗口结束
+    """
+    sync_server_clock()
+    offset = SERVER_CLOCK.offset()
+    now = time.time() + offset
+    window = get_reset_window()
+    reset = server_day_start(server_day(now))
+    if now - reset >= RESET_DELAY + window:
+        reset += 86400
+    start = max(now, reset + RESET_DELAY)
+    end = reset + RESET_DELAY + window
+    if start - now > RESET_MAX_WAIT:
+        print_with_time(f"距离服务器日切超过 {RESET_MAX_WAIT // 60} 分钟，立即签到", "INFO")
+        return None
+    slots = [start + (end - start) * (index + random.random()) / count for index in range(count)]
+    random.shuffle(slots)
+    print_with_time(f"计划在北京时间 {server_clock(min(slots), '%H:%M:%S')} 至 "
+                    f"{server_clock(max(slots), '%H:%M:%S')} 之间签到 {count} 个账号", "INFO")
+    return [slot - offset for slot in slots]
+
+def wait_for_checkin(checkin_at):
+    """等到计划的签到时刻（本机时间戳）；等待时间不计入账号的时间预算"""
+    delay = checkin_at - time.time()
+    if delay > 0:
+        print_with_time(f"已登录，{delay:.0f} 秒后签到", "INFO")
+        time.sleep(delay)
+    start_deadline()
+
+class DaemonState:
+    """常驻模式的账号状态：当天的计划时间、尝试次数和是否已完成，持久化到缓存目录，重启后不会重复签到"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.accounts = {}  # 账号标识 -> {'day', 'scheduled', 'attempts', 'done'}
+        self.digest = None  # 当天尚未发送的通知汇总 {'day', 'results': {账号标识: 结果}, 'elapsed'}
+        self.dirty = False
+    
+    @classmethod
+    def load(cls, path=None):
+        state = cls(path or os.path.join(get_cache_dir(), 'daemon_state.json'))
+        try:
+            with open(state.path, encoding='utf-8') as f:
+                data = json.load(f)
+            state.accounts = data.get('accounts', {})
+            state.digest = data.get('digest')
+        except (OSError, ValueError):
+            pass
+        return state
+    
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            write_file_atomic(self.path, json.dumps({'accounts': self.accounts, 'digest': self.digest},
+                                                    ensure_ascii=False).encode('utf-8'))
+            self.dirty = False
+        except OSError as e:
+            print_with_time(f"保存常驻模式状态失败: {str(e)}", "WARNING")
+    
+    def entry(self, key, day, schedule):
+        """账号当天的状态，新的一天按计划时间加随机偏移生成"""
+        entry = self.accounts.get(key)
+        if entry is None or entry['day'] != day:
+            offset, window = schedule
+            entry = self.accounts[key] = {
+                'day': day,
+                'scheduled': server_day_start(day) + offset + random.uniform(0, window),
+                'attempts': 0,
+                'done': False,
+            }
+            self.dirty = True
+        return entry
+    
+    def pending(self, entry):
+        return not entry['done'] and entry['attempts'] < DAEMON_MAX_ATTEMPTS
+    
+    def start_attempt(self, entry, now):
+        """开始运行前先记录尝试，进程中途退出后重启也不会立即重复运行"""
+        entry['attempts'] += 1
+        entry['scheduled'] = now + DAEMON_RETRY_DELAY
+        self.dirty = True
+    
+    def finish_attempt(self, entry, succeeded):
+        entry['done'] = bool(succeeded)
+        self.dirty = True
+    
+    def add_results(self, day, results, elapsed_time):
+        """把一批结果并入当天的通知汇总，同一账号重试后以最新结果为准"""
+        if self.digest is None or self.digest['day'] != day:
+            self.digest = {'day': day, 'results': {}, 'elapsed': 0.0}
+        for result in results:
+            self.digest['results'][result['key']] = serialize_result(result)
+        self.digest['elapsed'] = round(self.digest['elapsed'] + elapsed_time, 2)
+        self.dirty = True
+    
+    def take_digest(self, day, finished):
+        """当天所有账号都已完成或用尽重试（finished），或已进入新的一天时取出汇总，返回 (结果列表, 耗时)"""
+        digest = self.digest
+        if digest is None or (digest['day'] == day and not finished):
+            return None
+        self.digest = None
+        self.dirty = True
+        if not digest['results']:
+            return None
+        return [deserialize_result(result) for result in digest['results'].values()], digest['elapsed']
 
-def main():
-    """主程序入口"""
+def daemon_main():
+    """常驻模式：每天为每个账号在随机时刻签到，连接池和登录状态在多次运行之间保持"""
+    import signal
     print_separator("=", 60)
-    print_with_time(f"🚀 {BASE_DOMAIN.upper()} 自动签到程序启动", "INFO")
+    print_with_time(f"🚀 {BASE_DOMAIN.upper()} 自动签到常驻模式启动", "INFO")
     print_separator("=", 60)
     
-    # 检查依赖
     if not check_dependencies():
         print_with_time("程序终止：缺少必需的依赖库", "ERROR")
         return False
+    accounts = load_accounts()
+    if not accounts:
+        print_config_help()
+        print_with_time("程序终止：无法获取有效登录状态", "ERROR")
+        return False
     
-    start_time = time.time()
+    stop = threading.Event()
+    def request_stop(signum, frame):
+        print_with_time("收到退出信号，当前批次完成后退出", "WARNING")
+        stop.set()
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    
+    schedule = get_daemon_schedule()
+    concurrency = get_concurrency(len(accounts))
+    configure_connection_pool(concurrency)
+    configure_concurrency_limit(concurrency)
+    domain_pool = init_domain_pool()
+    # 计划时刻按服务器时钟计算，之后每次签到的响应都会继续校准
+    sync_server_clock()
+    raced_at = time.time()
+    state = DaemonState.load()
+    keys = {email: account_key(email) for email, _ in accounts}
+    # 每个账号的会话常驻内存，登录Cookie在多次运行之间复用
+    sessions = {email: create_session() for email, _ in accounts}
+    announced_day = None
+    state_lock = threading.Lock()
+    
+    def persist_checkin(email):
+        # 签到成功后立即写入，获取账户信息期间进程被终止，重启后也不会再次签到
+        with state_lock:
+            state.finish_attempt(entries[email], True)
+            state.save()
+            save_ledger()
+    
+    try:
+        while not stop.is_set():
+            now = SERVER_CLOCK.now()
+            today = server_day(now)
+            entries = {email: state.entry(keys[email], today, schedule) for email, _ in accounts}
+            # 每天只发送一条通知：所有账号都已完成或用尽重试，或者已经进入新的一天
+            digest = state.take_digest(today, not any(state.pending(entry) for entry in entries.values()))
+            state.save()
+            if digest:
+                notify_results(*digest)
+            
+            if announced_day != today:
+                announced_day = today
+                pending = [entry['scheduled'] for entry in entries.values() if state.pending(entry)]
+                if pending:
+                    print_with_time(f"{today} 计划签到 {len(pending)} 个账号，北京时间 "
+                                    f"{server_clock(min(pending))} 至 {server_clock(max(pending))}", "INFO")
+                else:
+                    print_with_time(f"{today} 所有账号均已完成签到", "INFO")
+            
+            due = [(email, password) for email, password in accounts
+                   if state.pending(entries[email]) and entries[email]['scheduled'] <= now]
+            if due:
+                for email, _ in due:
+                    state.start_attempt(entries[email], now)
+                state.save()
+                
+                # 域名测速结果过期时重新测速
+                if time.time() - raced_at > DOMAIN_CACHE_TTL:
+                    domain_pool.race()
+                    raced_at = time.time()
+                prewarm_connections(min(concurrency, len(due)))
+                print_with_time(f"开始签到 {len(due)} 个账号", "INFO")
+                start_time = time.time()
+                results = run_accounts(due, concurrency, sessions, on_checkin=persist_checkin)
+                with state_lock:
+                    for (email, _), result in zip(due, results):
+                        state.finish_attempt(entries[email], result['checkin'])
+                    state.save()
+                save_ledger()
+                domain_pool.save_cache()
+                
+                elapsed_time = round(time.time() - start_time, 2)
+                limits = CONCURRENCY_LIMITER.snapshot()
+                if len(results) > 1:
+                    print_summary(results, elapsed_time, limits)
+                record_history(results)
+                state.add_results(today, results, elapsed_time)
+                state.save()
+                export_metrics({
+                    'duration_seconds': elapsed_time,
+                    'accounts': len(results),
+                    'checkin_succeeded': sum(1 for result in results if result['checkin']),
+                    'info_succeeded': sum(1 for result in results if result['info']),
+                    'concurrency': concurrency,
+                    **concurrency_summary(limits),
+                })
+                continue
+            
+            # 等到下一个计划时刻或下一个服务器日，分段等待以便及时响应退出信号
+            upcoming = [entry['scheduled'] for entry in entries.values() if state.pending(entry)]
+            upcoming.append(server_day_start(today) + 86400)
+            LOGGER.flush()
+            stop.wait(min(max(min(upcoming) - now, 1), DAEMON_MAX_SLEEP))
+    finally:
+        state.save()
+        save_ledger()
+        domain_pool.save_cache()
+        close_connection_pool()
+        print_with_time("常驻模式已退出", "INFO")
+    return True
+
+def serialize_result(result):
+    """账号结果转为可写入 JSON 的字典"""
+    info = result.get('account_info')
+    return {**result, 'account_info': info.to_dict() if info is not None else None}
+
+def deserialize_result(data):
+    info = data.get('account_info')
+    return {**data, 'account_info': AccountInfo.from_dict(info) if info else None}
+
+class BatchCheckpoint:
+    """批量模式的进度：已完成分片的结果，持久化到缓存目录；账号列表、分片大小或服务器日变化后不再沿用"""
+    
+    def __init__(self, path, batch_id):
+        self.path = path
+        self.batch_id = batch_id
+        self.shards = {}  # 分片序号（字符串）-> run_shard() 的结果（不含指标）
+    
+    @classmethod
+    def load(cls, path, batch_id):
+        checkpoint = cls(path, batch_id)
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('batch') == batch_id:
+                checkpoint.shards = data.get('shards', {})
+        except (OSError, ValueError):
+            pass
+        return checkpoint
     
-    # 登录获取 Cookie
-    cookie_data = login_and_get_cookie()
+    def record(self, index, shard):
+        """记录一个完成的分片并立即写入，进程随时中断也不会丢失"""
+        self.shards[str(index)] = {'results': shard['results'], 'elapsed': shard['elapsed'],
+                                   'concurrency': shard.get('concurrency')}
+        try:
+            write_file_atomic(self.path, json.dumps({'batch': self.batch_id, 'shards': self.shards},
+                                                    ensure_ascii=False).encode('utf-8'))
+        except OSError as e:
+            print_with_time(f"保存批量进度失败: {str(e)}", "WARNING")
+    
+    def remove(self):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+def _init_batch_worker(rate, burst):
+    """工作进程初始化：各进程平分同一域名的限速配额；Ctrl+C 由主进程处理，进行中的分片正常完成"""
+    import signal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    os.environ['IKUUU_RATE_LIMIT'] = str(rate)
+    os.environ['IKUUU_RATE_BURST'] = str(burst)
+
+def run_shard(accounts, force=False):
+    """在工作进程中处理一个分片，返回可序列化的结果、签到记录和指标"""
+    start_time = time.time()
+    concurrency = get_concurrency(len(accounts))
+    configure_connection_pool(concurrency)
+    configure_concurrency_limit(concurrency)
+    init_domain_pool()
+    prewarm_connections(concurrency)
+    try:
+        results = run_accounts(accounts, concurrency, force=force)
+    finally:
+        close_connection_pool()
+    ledger = get_ledger()
+    # 同一进程会依次处理多个分片，取出本分片的指标后清零
+    metrics = METRICS.snapshot()
+    METRICS.reset()
+    LOGGER.flush()
+    return {
+        'results': [serialize_result(result) for result in results],
+        'ledger': ledger.export(result['key'] for result in results) if ledger is not None else {},
+        'metrics': metrics,
+        'elapsed': round(time.time() - start_time, 2),
+        'concurrency': CONCURRENCY_LIMITER.snapshot(),
+    }
+
+def batch_main(args, force=False):
+    """batch 子命令：账号分片后由进程池并行处理，支持中断后继续，最后合并输出汇总"""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    print_separator("=", 60)
+    print_with_time(f"🚀 {BASE_DOMAIN.upper()} 自动签到批量模式启动", "INFO")
+    print_separator("=", 60)
     
-    if not cookie_data:
+    if not check_dependencies():
+        print_with_time("程序终止：缺少必需的依赖库", "ERROR")
+        return False
+    accounts = load_accounts()
+    if not accounts:
+        print_config_help()
         print_with_time("程序终止：无法获取有效登录状态", "ERROR")
         return False
     
-    # 短暂延迟，避免请求过于频繁
-    time.sleep(1)
+    start_time = time.time()
+    force = force or os.getenv('IKUUU_FORCE', '0') in ('1', 'true', 'yes')
+    shard_size = max(1, args.shard_size)
+    shards = [accounts[i:i + shard_size] for i in range(0, len(accounts), shard_size)]
+    workers = max(1, min(args.workers or os.cpu_count() or 1, len(shards)))
+    
+    # 同一天、同一账号列表和分片方式的检查点才能继续使用
+    fingerprint = json.dumps([server_day(), shard_size, [account_key(email) for email, _ in accounts]])
+    batch_id = hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[:16]
+    checkpoint_path = args.checkpoint or os.path.join(get_cache_dir(), 'batch_checkpoint.json')
+    if args.restart:
+        checkpoint = BatchCheckpoint(checkpoint_path, batch_id)
+    else:
+        checkpoint = BatchCheckpoint.load(checkpoint_path, batch_id)
+    pending = [index for index in range(len(shards)) if str(index) not in checkpoint.shards]
+    if len(pending) < len(shards):
+        print_with_time(f"从检查点继续：{len(shards) - len(pending)}/{len(shards)} 个分片已完成", "INFO")
+    print_with_time(f"批量模式：共 {len(accounts)} 个账号，{len(shards)} 个分片，{workers} 个进程", "INFO")
+    
+    # 主进程先测速并保存结果，工作进程直接读取缓存，不再各自测速
+    domain_pool = init_domain_pool()
+    domain_pool.save_cache()
+    close_connection_pool()
+    rate, burst = get_rate_limit()
+    ledger = get_ledger()
+    fresh_results = []
+    
+    def collect(index, future):
+        """记录一个分片的结果并写入检查点"""
+        try:
+            shard = future.result()
+        except Exception as e:
+            print_with_time(f"分片 {index + 1} 执行失败: {str(e)}", "ERROR")
+            return
+        checkpoint.record(index, shard)
+        if ledger is not None:
+            ledger.merge(shard['ledger'])
+        METRICS.merge(shard['metrics'])
+        fresh_results.extend(shard['results'])
+        succeeded = sum(1 for result in shard['results'] if result['checkin'])
+        print_with_time(f"分片 {index + 1}/{len(shards)} 完成：签到成功 {succeeded}/{len(shard['results'])}，"
+                        f"耗时 {shard['elapsed']} 秒，并发上限 {shard['concurrency']['limit']}"
+                        f"（已完成 {len(checkpoint.shards)}/{len(shards)}）", "INFO")
+    
+    try:
+        if pending:
+            # spawn 启动的工作进程不继承主进程的连接、锁和线程
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_init_batch_worker,
+                                     initargs=(rate / workers, max(1.0, burst / workers))) as executor:
+                # 每个进程同时只分配一个分片，中断时不会有已分配但来不及记录的分片
+                queue = iter(pending)
+                futures = {}
+                
+                def submit_next():
+                    index = next(queue, None)
+                    if index is not None:
+                        futures[executor.submit(run_shard, shards[index], force)] = index
+                
+                for _ in range(workers):
+                    submit_next()
+                try:
+                    while futures:
+                        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            collect(futures.pop(future), future)
+                            submit_next()
+                except KeyboardInterrupt:
+                    # 不再分配新分片，等待进行中的分片完成并记录，避免已发出的签到结果丢失
+                    print_with_time("用户中断，等待进行中的分片完成后退出", "WARNING")
+                    for future, index in list(futures.items()):
+                        collect(index, future)
+    finally:
+        save_ledger()
+    
+    # 合并所有已完成分片（含之前运行完成的）的结果，按账号配置顺序输出
+    results = [deserialize_result(result)
+               for index in range(len(shards)) if str(index) in checkpoint.shards
+               for result in checkpoint.shards[str(index)]['results']]
+    complete = len(checkpoint.shards) == len(shards)
+    elapsed_time = round(time.time() - start_time, 2)
+    if results:
+        print_summary(results, elapsed_time)
+    # 之前运行完成的分片已经记录过历史
+    record_history([deserialize_result(result) for result in fresh_results])
+    notify_results(results, elapsed_time)
+    
+    if args.report:
+        report = {
+            'batch': batch_id,
+            'day': server_day(),
+            'accounts': len(accounts),
+            'complete': complete,
+            'elapsed': elapsed_time,
+            'workers': workers,
+            'shards': [{'index': int(index), 'accounts': len(shard['results']), 'elapsed': shard['elapsed'],
+                        'checkin_succeeded': sum(1 for result in shard['results'] if result['checkin']),
+                        'concurrency': shard.get('concurrency')}
+                       for index, shard in sorted(checkpoint.shards.items(), key=lambda item: int(item[0]))],
+            'results': [serialize_result(result) for result in results],
+        }
+        try:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print_with_time(f"批量报告已保存: {args.report}", "INFO")
+        except OSError as e:
+            print_with_time(f"保存批量报告失败: {str(e)}", "WARNING")
+    
+    if complete:
+        checkpoint.remove()
+    else:
+        print_with_time(f"{len(shards) - len(checkpoint.shards)} 个分片未完成，重新运行将继续处理", "WARNING")
+    
+    print_phase_summary()
+    export_metrics({
+        'duration_seconds': elapsed_time,
+        'accounts': len(fresh_results),
+        'checkin_succeeded': sum(1 for result in fresh_results if result['checkin']),
+        'info_succeeded': sum(1 for result in fresh_results if result['info']),
+        'workers': workers,
+    })
+    return complete and all(result['checkin'] for result in results)
+
+def main(force=False, at_reset=False):
+    """主程序入口；force 为 True 时忽略本地签到记录，重新执行今天已签到的账号；
+    at_reset 为 True 时提前登录，在服务器日切后分散签到"""
+    print_separator("=", 60)
+    print_with_time(f"🚀 {BASE_DOMAIN.upper()} 自动签到程序启动", "INFO")
+    print_separator("=", 60)
+    
+    # 检查依赖
+    if not check_dependencies():
+        print_with_time("程序终止：缺少必需的依赖库", "ERROR")
+        return False
     
-    # 执行签到
-    checkin_result = checkin(cookie_data)
+    accounts = load_accounts()
+    if not accounts:
+        print_config_help()
+        print_with_time("程序终止：无法获取有效登录状态", "ERROR")
+        return False
     
-    # 短暂延迟
-    time.sleep(1)
+    start_time = time.time()
     
-    # 获取用户信息
-    info_result = get_user_info(cookie_data)
+    concurrency = get_concurrency(len(accounts))
+    configure_connection_pool(concurrency)
+    configure_concurrency_limit(concurrency)
+    domain_pool = init_domain_pool()
+    # 后台预先建立连接，与各账号读取会话缓存等本地工作重叠
+    prewarm_connections(concurrency)
+    force = force or os.getenv('IKUUU_FORCE', '0') in ('1', 'true', 'yes')
+    at_reset = at_reset or os.getenv('IKUUU_AT_RESET', '0') in ('1', 'true', 'yes')
+    try:
+        checkin_times = plan_reset_checkins(len(accounts)) if at_reset else None
+        if len(accounts) == 1:
+            results = [run_account(*accounts[0], force=force, checkin_at=checkin_times and checkin_times[0])]
+        else:
+            print_with_time(f"多账号模式：共 {len(accounts)} 个账号，并发数 {concurrency}", "INFO")
+            results = run_accounts(accounts, concurrency, force=force, checkin_times=checkin_times)
+    finally:
+        domain_pool.save_cache()
+        save_ledger()
+        close_connection_pool()
     
     # 程序结束统计
     end_time = time.time()
     elapsed_time = round(end_time - start_time, 2)
+    limits = CONCURRENCY_LIMITER.snapshot()
+    
+    if len(results) > 1:
+        print_summary(results, elapsed_time, limits)
+    
+    record_history(results)
+    notify_results(results, elapsed_time)
+    
+    checkin_result = all(result['checkin'] for result in results)
+    info_result = all(result['info'] for result in results)
+    
+    print_phase_summary()
+    export_metrics({
+        'duration_seconds': elapsed_time,
+        'accounts': len(results),
+        'checkin_succeeded': sum(1 for result in results if result['checkin']),
+        'info_succeeded': sum(1 for result in results if result['info']),
+        'concurrency': concurrency,
+        **concurrency_summary(limits),
+    })
     
     print_separator("=", 60)
     if checkin_result and info_result:
@@ -608,6 +4118,48 @@ def main():
     
     return checkin_result
 
+def parse_args(argv=None):
+    """解析命令行参数，不带子命令时执行一次签到"""
+    import argparse
+    parser = argparse.ArgumentParser(description='IKUUU 自动签到程序')
+    parser.add_argument('--force', action='store_true', help='忽略本地签到记录，今天已签到的账号也重新执行')
+    parser.add_argument('--profile', nargs='?', const='ikuuu.prof', metavar='FILE',
+                        help='按阶段做 cProfile 分析，输出耗时最多的函数并保存 pstats 文件（默认 ikuuu.prof）')
+    parser.add_argument('--profile-memory', action='store_true', help='用 tracemalloc 统计每个阶段的内存峰值和分配最多的代码行')
+    parser.add_argument('--at-reset', action='store_true',
+                        help='提前登录，在服务器日切（北京时间 0 点）后分散签到；距离日切超过 1 小时时立即签到')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('run', help='执行一次签到（默认）')
+    history = subparsers.add_parser('history', help='查询本地运行历史')
+    history.add_argument('--account', help='账号邮箱，显示该账号的每日记录；不指定时显示所有账号的概况')
+    history.add_argument('--days', type=int, default=30, help='统计最近多少天（默认 30）')
+    history.add_argument('--json', action='store_true', help='以 JSON 输出')
+    subparsers.add_parser('daemon', help='常驻运行，每天在随机时刻为每个账号签到')
+    batch = subparsers.add_parser('batch', help='大量账号分片后多进程并行处理，中断后可继续')
+    batch.add_argument('--workers', type=int, default=0, help='进程数（默认 CPU 核数）')
+    batch.add_argument('--shard-size', type=int, default=BATCH_SHARD_SIZE,
+                       help=f'每个分片的账号数（默认 {BATCH_SHARD_SIZE}）')
+    batch.add_argument('--checkpoint', help='检查点文件路径（默认为缓存目录下的 batch_checkpoint.json）')
+    batch.add_argument('--restart', action='store_true', help='忽略已有检查点，从头开始')
+    batch.add_argument('--report', help='把合并后的结果写入 JSON 文件')
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    success = main()
-    exit(0 if success else 1)
\ No newline at end of file
+    args = parse_args()
+    # 批量模式的工作进程不做分析，只分析当前进程中运行的阶段
+    profiler = PhaseProfiler.from_env(args.profile, args.profile_memory)
+    try:
+        if args.command == 'history':
+            exit_code = history_main(args)
+        elif args.command == 'daemon':
+            exit_code = 0 if daemon_main() else 1
+        elif args.command == 'batch':
+            exit_code = 0 if batch_main(args, force=args.force) else 1
+        else:
+            success = main(force=args.force, at_reset=args.at_reset)
+            # 所有账号签到成功时退出码为 0，否则为 1
+            exit_code = 0 if success else 1
+    finally:
+        if profiler is not None:
+            profiler.stop()
+    sys.exit(exit_code)
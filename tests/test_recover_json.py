@@ -0,0 +1,47 @@
+"""recover_json 的正确性测试：BOM、前导垃圾、字符串中的花括号、窗口边界、尾部垃圾和超过扫描上限的输入
+
+  python -m pytest tests
+"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main  # noqa: E402
+
+SMALL = {'ret': 1, 'msg': '你获得了 512 MB流量'}
+BOUNDARY = {'ret': 1, 'msg': 'a' * 4066, 'ok': True, 'data': {'inner': 1}}
+LARGE = {'ret': 1, 'msg': 'ok', 'data': [{'id': i, 'name': f'节点{i}', 'remark': '{x}'} for i in range(4000)]}
+
+
+@pytest.mark.parametrize('data, expected', [
+    pytest.param(b'\xef\xbb\xbf\r\n  ' + json.dumps(SMALL, ensure_ascii=False).encode('utf-8'), SMALL, id='bom'),
+    pytest.param(b'\x00\x1b<!-- noise -->' * 4096 + json.dumps(SMALL).encode('utf-8'), SMALL, id='garbage_prefix_64k'),
+    pytest.param(json.dumps(LARGE, ensure_ascii=False).encode('utf-8') + b'\n<html>trailer</html>', LARGE,
+                 id='large_200k'),
+    pytest.param(b'\xef\xbb\xbf{"ret": 0, "msg": "\\"}{ \xe5\xb7\xb2\xe7\xbb\x8f\xe7\xad\xbe\xe5\x88\xb0 }"} }}',
+                 {'ret': 0, 'msg': '"}{ 已经签到 }'}, id='braces_in_string'),
+    pytest.param(b'{"ret": 1, "msg": "ok"}' + b'}' * 10000, {'ret': 1, 'msg': 'ok'}, id='trailing_garbage'),
+])
+def test_recovers_first_object(data, expected):
+    assert main.recover_json(data) == expected
+
+
+def test_window_split_inside_literal_does_not_fall_back_to_inner_object():
+    data = b'\xef\xbb\xbf' + json.dumps(BOUNDARY).encode('utf-8')
+    # 从 { 开始的首个窗口截断在 true 中间
+    assert data.index(b'true') < data.index(b'{') + 4096 < data.index(b'true') + len(b'true')
+    assert main.recover_json(data) == BOUNDARY
+
+
+def test_oversized_garbage_fails():
+    with pytest.raises(ValueError):
+        main.recover_json(b'{' * 64 + b'x' * (main.JSON_SCAN_LIMIT * 4))
+
+
+def test_object_beyond_limit_is_not_found():
+    data = b' ' * 64 + json.dumps(SMALL).encode('utf-8')
+    with pytest.raises(ValueError):
+        main.recover_json(data, limit=32)